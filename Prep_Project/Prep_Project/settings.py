@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
+import sys
 from pathlib import Path
 import dj_database_url
 
@@ -142,4 +143,64 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # Keyset pagination on every list endpoint; views set cursor_ordering / cursor_page_size,
+    # clients may pass ?page_size= (max 1000)
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetCursorPagination',
+    'PAGE_SIZE': 100,
+    # Per-view filter_allowlist / ordering_allowlist, restricted to indexed columns
+    'DEFAULT_FILTER_BACKENDS': ['core.filters.AllowlistFilterBackend'],
+}
+
+# Alert rules: once an alert was last seen, hold back a new alert with the same
+# fingerprint (rule type + device/customer) for this many minutes
+ALERT_SUPPRESSION_MINUTES = 60
+
+# Trained churn model (python manage.py train_churn); the heuristic is used while absent
+CHURN_MODEL_PATH = BASE_DIR / 'churn_model.joblib'
+
+# Cache for churn results etc. Local memory is per process; point this at a shared
+# backend (Memcached/Redis) in production so invalidation and hit rates are global.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 100_000},
+    }
+}
+CHURN_CACHE_TTL = 3600  # seconds
+
+# Dashboard snapshot: older than this (seconds) triggers a background rebuild
+DASHBOARD_SNAPSHOT_MAX_AGE = 60
+
+# Write-behind ingestion: single-event POST /api/usage/ and PUT/PATCH /api/devices/<id>/
+# are queued in process and answered 202; a flusher thread writes them in bulk every
+# INGEST_FLUSH_ROWS items or INGEST_FLUSH_INTERVAL seconds. A full queue (INGEST_BUFFER_SIZE)
+# makes requests wait up to INGEST_PUT_TIMEOUT seconds, then answers 503. Queued items
+# are lost if the process is killed hard, so this is opt-in.
+BUFFERED_INGESTION = False
+INGEST_BUFFER_SIZE = 10_000
+INGEST_FLUSH_ROWS = 500
+INGEST_FLUSH_INTERVAL = 1.0  # seconds
+INGEST_PUT_TIMEOUT = 0.5  # seconds
+INGEST_FLUSH_RETRIES = 3  # retries of a batch on transient errors (e.g. database is locked)
+
+# Bill aging (age_bills): an unpaid bill turns overdue this many days after its month ends
+BILL_GRACE_DAYS = 15
+
+# Device metric history retention (days) per resolution
+METRIC_RAW_RETENTION_DAYS = 7
+METRIC_5M_RETENTION_DAYS = 30
+METRIC_HOURLY_RETENTION_DAYS = 365
+
+# Send app logs (rule daemon cycle timings etc.) to the console. `manage.py test`
+# only shows warnings unless CORE_LOG_LEVEL says otherwise.
+TESTING = sys.argv[1:2] == ['test']
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core': {'handlers': ['console'], 'level': os.getenv('CORE_LOG_LEVEL', 'WARNING' if TESTING else 'INFO')},
+    },
 }
@@ -4,7 +4,8 @@ from rest_framework import routers
 from core.views import (
     BillViewSet, SiteViewSet, DeviceViewSet, InventoryItemViewSet, PlanViewSet,
     CustomerViewSet, SubscriptionViewSet, UsageEventViewSet, AlertViewSet,
-    dashboard, my_plan, onboard, portal_page, churn_api, customer_usage, customer_bills,
+    dashboard, my_plan, onboard, portal_page, churn_api, churn_scores_batch, churn_cache_stats, ingest_buffer_stats, customer_usage, customer_bills,
+    export_data,
 )
 
 router = routers.DefaultRouter()
@@ -29,7 +30,11 @@ urlpatterns = [
     # APIs
     path('api/onboard/', onboard, name='onboard'),
     path('api/customers/<int:id>/churn_score/', churn_api, name='churn_api'),
+    path('api/churn/scores/', churn_scores_batch, name='churn_scores_batch'),
+    path('api/churn/cache_stats/', churn_cache_stats, name='churn_cache_stats'),
+    path('api/ingest/stats/', ingest_buffer_stats, name='ingest_buffer_stats'),
     path("api/customers/<int:id>/usage/", customer_usage),
+    path('api/export/<str:kind>/', export_data, name='export_data'),
 
     # My Plan (get + change)
     path('api/customers/<int:customer_id>/my_plan/', my_plan, name="my_plan"),
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Site, Device, InventoryItem, Plan, Customer, Subscription, UsageEvent, Alert
+from .models import Site, Device, InventoryItem, Plan, Customer, Subscription, UsageEvent, Alert, Bill
 
 admin.site.register(Site)
 @admin.register(Device)
@@ -8,14 +8,33 @@ class DeviceAdmin(admin.ModelAdmin):
     list_filter = ("type", "status", "site")
     search_fields = ("identifier",)
     ordering = ("identifier",)
+    list_select_related = ("site",)
 admin.site.register(InventoryItem)
 admin.site.register(Plan)
 admin.site.register(Customer)
-admin.site.register(Subscription)
-admin.site.register(UsageEvent)
+@admin.register(Subscription)
+class SubscriptionAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "status", "start_date")
+    list_filter = ("status", "plan")
+    list_select_related = ("customer", "plan")   # __str__ uses both
+    raw_id_fields = ("customer",)
+@admin.register(UsageEvent)
+class UsageEventAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "date", "gb_used")
+    list_select_related = ("customer",)
+    raw_id_fields = ("customer",)
+    ordering = ("-date", "-id")
 @admin.register(Alert)
 class AlertAdmin(admin.ModelAdmin):
     list_display = ("severity", "type", "message", "device", "status", "created_at")
     list_filter = ("severity", "status", "type")
     search_fields = ("message", "device__identifier")
     ordering = ("-created_at",)
+    list_select_related = ("device",)
+@admin.register(Bill)
+class BillAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "amount", "status")
+    list_filter = ("status",)
+    list_select_related = ("customer",)
+    raw_id_fields = ("customer",)
+    ordering = ("-month", "id")
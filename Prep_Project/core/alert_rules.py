@@ -1,41 +1,382 @@
+import operator
+import time
+from datetime import timedelta
+from itertools import islice
+
+import numpy as np
+
+from django.conf import settings
+from django.db.models import Case, F, Q, TextField, Value, When
 from django.utils import timezone
-from .models import Device, Alert
+from .models import Device, Alert, Watermark
 
-def evaluate_device_rules():
-    alerts_created = []
-    now = timezone.now()
-    for dev in Device.objects.all():
-        # Rule 1: Heartbeat missed (>15 minutes)
-        if dev.last_heartbeat and (now - dev.last_heartbeat).total_seconds() > 15*60:
-            a = Alert.objects.create(
-                severity="critical", type="HEARTBEAT_MISSED",
-                message=f"No heartbeat for >15 minutes for {dev.identifier}", device=dev
-            )
-            alerts_created.append(a)
-
-        # Rule 2: Temperature thresholds
-        if dev.temp_c is not None:
-            if dev.temp_c >= 80:
-                a = Alert.objects.create(
-                    severity="critical", type="OVERHEAT",
-                    message=f"Device {dev.identifier} temp {dev.temp_c}C", device=dev
-                )
-                alerts_created.append(a)
-            elif dev.temp_c >= 70:
-                a = Alert.objects.create(
-                    severity="warning", type="WARM",
-                    message=f"Device {dev.identifier} temp {dev.temp_c}C", device=dev
-                )
-                alerts_created.append(a)
-
-        # Rule 3: Approaching End-of-Life (≤30 days)
-        if dev.eol_date:
-            days = (dev.eol_date - timezone.localdate()).days
-            if days <= 30:
-                a = Alert.objects.create(
-                    severity="warning", type="EOL_SOON",
-                    message=f"Device {dev.identifier} EOL within {max(days,0)} days", device=dev
+HEARTBEAT_TIMEOUT = timedelta(minutes=15)
+EOL_WARNING_DAYS = 30
+BULK_BATCH_SIZE = 1000
+COLUMN_CHUNK_SIZE = 5000  # rows per load_device_columns chunk
+NAN = float("nan")
+
+# Incremental runs re-check devices changed since the last run's start time.
+# The overlap covers writes that committed just after the watermark was taken;
+# re-checking a device twice is harmless because alerts are deduplicated.
+WATERMARK_KEY = "device_rules"
+WATERMARK_OVERLAP = timedelta(seconds=5)
+
+
+def suppression_window():
+    """How long after an alert was last seen a new one for the same fingerprint is held back"""
+    return timedelta(minutes=getattr(settings, "ALERT_SUPPRESSION_MINUTES", 60))
+
+
+def alert_fingerprint(alert_type, device_id=None, customer_id=None):
+    if device_id is not None:
+        return f"{alert_type}:device:{device_id}"
+    return f"{alert_type}:customer:{customer_id}"
+
+
+# Columns every rule needs to build its alert message
+DEVICE_COLUMNS = ("id", "identifier", "temp_c", "eol_date")
+
+
+# ----- Rules -----
+# Rules are declarative: every (field, operator, threshold) condition must hold.
+# Fields are derived from device columns:
+#   temp_c         degrees Celsius
+#   heartbeat_age  seconds since last_heartbeat
+#   eol_days       days until eol_date
+# The same definitions are evaluated either as SQL filters or as NumPy masks.
+# Message templates can use {identifier}, {temp_c} and {eol_days_left}.
+
+RULES = [
+    {
+        "type": "HEARTBEAT_MISSED",
+        "severity": "critical",
+        "conditions": [("heartbeat_age", ">", HEARTBEAT_TIMEOUT.total_seconds())],
+        "message": "No heartbeat for >15 minutes for {identifier}",
+    },
+    {
+        "type": "OVERHEAT",
+        "severity": "critical",
+        "conditions": [("temp_c", ">=", 80)],
+        "message": "Device {identifier} temp {temp_c}C",
+    },
+    {
+        "type": "WARM",
+        "severity": "warning",
+        "conditions": [("temp_c", ">=", 70), ("temp_c", "<", 80)],
+        "message": "Device {identifier} temp {temp_c}C",
+    },
+    {
+        "type": "EOL_SOON",
+        "severity": "warning",
+        "conditions": [("eol_days", "<=", EOL_WARNING_DAYS)],
+        "message": "Device {identifier} EOL within {eol_days_left} days",
+    },
+]
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+}
+LOOKUPS = {">": "gt", ">=": "gte", "<": "lt", "<=": "lte", "==": "exact"}
+# age > x  ⇔  timestamp < now - x
+FLIPPED = {">": "<", ">=": "<=", "<": ">", "<=": ">=", "==": "=="}
+
+
+def condition_q(field, op, threshold, now, today):
+    """One rule condition as a filter on the underlying device column"""
+    if field == "temp_c":
+        return Q(**{f"temp_c__{LOOKUPS[op]}": threshold})
+    if field == "heartbeat_age":
+        return Q(**{f"last_heartbeat__{LOOKUPS[FLIPPED[op]]}": now - timedelta(seconds=threshold)})
+    if field == "eol_days":
+        return Q(**{f"eol_date__{LOOKUPS[op]}": today + timedelta(days=threshold)})
+    raise ValueError(f"Unknown rule field: {field}")
+
+
+def rule_queryset(rule, devices, now, today):
+    q = Q()
+    for field, op, threshold in rule["conditions"]:
+        q &= condition_q(field, op, threshold, now, today)
+    return devices.filter(q)
+
+
+def rule_message(rule, identifier, temp_c, eol_date, today):
+    eol_days_left = max((eol_date - today).days, 0) if eol_date else 0
+    return rule["message"].format(identifier=identifier, temp_c=temp_c, eol_days_left=eol_days_left)
+
+
+def write_alerts(alerts, now, window=None):
+    """
+    Insert a chunk of firing alerts, deduplicated by fingerprint.
+    - an open alert with the same fingerprint gets last_seen_at/occurrences bumped and
+      its message replaced by the current one
+    - an alert seen within the suppression window (e.g. just closed) suppresses re-alerting
+    - anything else is inserted
+    Costs one SELECT, at most one UPDATE and one bulk INSERT per chunk.
+    Returns (created, updated, suppressed).
+    """
+    if not alerts:
+        return 0, 0, 0
+    window = suppression_window() if window is None else window
+
+    for a in alerts:
+        if not a.fingerprint:
+            a.fingerprint = alert_fingerprint(a.type, a.device_id, a.customer_id)
+        a.last_seen_at = now
+
+    existing = Alert.objects.filter(
+        Q(status="open") | Q(last_seen_at__gte=now - window),
+        fingerprint__in=[a.fingerprint for a in alerts],
+    ).values_list("id", "fingerprint", "status")
+
+    messages = {a.fingerprint: a.message for a in alerts}
+    open_ids, open_fps, seen = [], set(), set()
+    refreshed = []
+    for alert_id, fingerprint, status in existing:
+        if status == "open":
+            open_ids.append(alert_id)
+            open_fps.add(fingerprint)
+            refreshed.append(When(id=alert_id, then=Value(messages[fingerprint])))
+        seen.add(fingerprint)
+
+    if open_ids:
+        Alert.objects.filter(id__in=open_ids).update(
+            last_seen_at=now,
+            occurrences=F("occurrences") + 1,
+            message=Case(*refreshed, default=F("message"), output_field=TextField()),
+        )
+
+    new_alerts = [a for a in alerts if a.fingerprint not in seen]
+    if new_alerts:
+        Alert.objects.bulk_create(new_alerts, batch_size=BULK_BATCH_SIZE)
+
+    updated = sum(1 for a in alerts if a.fingerprint in open_fps)
+    return len(new_alerts), updated, len(alerts) - len(new_alerts) - updated
+
+
+def changed_devices(since, now, today, deadlines=True):
+    """
+    Devices that may have started matching a rule after `since`:
+    - metrics/EOL edited since then (updated_at)
+    - heartbeat deadline passed between `since` and now (skipped with deadlines=False)
+    - EOL date entered the warning window between `since` and today
+    """
+    eol_window = timedelta(days=EOL_WARNING_DAYS)
+    condition = (
+        Q(updated_at__gt=since)
+        | Q(eol_date__gt=timezone.localdate(since) + eol_window, eol_date__lte=today + eol_window)
+    )
+    if deadlines:
+        condition |= Q(last_heartbeat__gte=since - HEARTBEAT_TIMEOUT, last_heartbeat__lt=now - HEARTBEAT_TIMEOUT)
+    return Device.objects.filter(condition)
+
+
+# ----- Vectorized evaluation -----
+
+def _epoch(value):
+    return NAN if value is None else value.timestamp()
+
+
+def _ordinal(value):
+    return NAN if value is None else value.toordinal()
+
+
+def load_device_columns(devices):
+    """
+    Load the rule inputs of `devices` once as NumPy arrays (NaN where NULL):
+    id, temp_c, heartbeat (epoch seconds) and eol (date ordinal). One query, read in
+    chunks; each chunk's columns are filled with np.fromiter, then concatenated.
+    """
+    rows = (
+        devices.order_by().values_list("id", "temp_c", "last_heartbeat", "eol_date")
+        .iterator(chunk_size=COLUMN_CHUNK_SIZE)
+    )
+    chunks = {"id": [], "temp_c": [], "heartbeat": [], "eol": []}
+    while chunk := list(islice(rows, COLUMN_CHUNK_SIZE)):
+        n = len(chunk)
+        chunks["id"].append(np.fromiter((r[0] for r in chunk), np.int64, count=n))
+        chunks["temp_c"].append(np.fromiter((NAN if r[1] is None else r[1] for r in chunk), np.float64, count=n))
+        chunks["heartbeat"].append(np.fromiter((_epoch(r[2]) for r in chunk), np.float64, count=n))
+        chunks["eol"].append(np.fromiter((_ordinal(r[3]) for r in chunk), np.float64, count=n))
+    return {
+        name: np.concatenate(parts) if parts else np.empty(0, np.int64 if name == "id" else np.float64)
+        for name, parts in chunks.items()
+    }
+
+
+def field_values(field, columns, now, today):
+    """A rule field as an array over the loaded columns"""
+    if field == "temp_c":
+        return columns["temp_c"]
+    if field == "heartbeat_age":
+        return now.timestamp() - columns["heartbeat"]
+    if field == "eol_days":
+        return columns["eol"] - today.toordinal()
+    raise ValueError(f"Unknown rule field: {field}")
+
+
+def rule_mask(rule, columns, now, today):
+    """Boolean mask of devices matching every condition (NaN never matches)"""
+    mask = np.ones(len(columns["id"]), dtype=bool)
+    for field, op, threshold in rule["conditions"]:
+        mask &= OPERATORS[op](field_values(field, columns, now, today), threshold)
+    return mask
+
+
+def evaluate_rules_vectorized(rules, devices, now, today, window=None):
+    """
+    Load the device columns once and evaluate every rule as a NumPy mask.
+    Only matching devices are read back (in chunks) to build alert messages.
+    The first stats entry ("load_columns") is the time spent loading the columns.
+    """
+    started = time.perf_counter()
+    columns = load_device_columns(devices)
+    results = [{
+        "rule": "load_columns", "matched": len(columns["id"]), "created": 0, "updated": 0,
+        "suppressed": 0, "seconds": time.perf_counter() - started,
+    }]
+
+    for rule in rules:
+        started = time.perf_counter()
+        matched_ids = columns["id"][rule_mask(rule, columns, now, today)].tolist()
+        created = updated = suppressed = 0
+        for i in range(0, len(matched_ids), BULK_BATCH_SIZE):
+            rows = Device.objects.filter(id__in=matched_ids[i:i + BULK_BATCH_SIZE]).values_list(*DEVICE_COLUMNS)
+            alerts = [
+                Alert(
+                    severity=rule["severity"], type=rule["type"],
+                    message=rule_message(rule, identifier, temp_c, eol_date, today), device_id=device_id,
                 )
-                alerts_created.append(a)
+                for device_id, identifier, temp_c, eol_date in rows
+            ]
+            c, u, s = write_alerts(alerts, now, window)
+            created, updated, suppressed = created + c, updated + u, suppressed + s
+        results.append({
+            "rule": rule["type"],
+            "matched": len(matched_ids),
+            "created": created,
+            "updated": updated,
+            "suppressed": suppressed,
+            "seconds": time.perf_counter() - started,
+        })
+    return results
+
+
+def shard_devices(devices, shard):
+    """
+    Restrict a device queryset to shard (index, count) of the id space: id % count == index.
+    (index, count, worker, workers) splits that shard again between one host's workers by
+    (id // count) % workers, so hosts running different worker counts still partition the fleet.
+    """
+    index, count, *split = shard
+    devices = devices.alias(shard=F("id") % count).filter(shard=index)
+    if split:
+        worker, workers = split
+        devices = devices.alias(worker=F("id") / count % workers).filter(worker=worker)
+    return devices
+
+
+def shard_label(shard):
+    """'index/count', plus ':worker/workers' for a split shard"""
+    return ":".join(f"{shard[i]}/{shard[i + 1]}" for i in range(0, len(shard), 2))
+
+
+def evaluate_rule(rule, now, today, window=None, devices=None):
+    """Run one rule as a single query and write its alerts in deduplicated chunks"""
+    started = time.perf_counter()
+    matched = created = updated = suppressed = 0
+    pending = []
+
+    def flush(chunk):
+        nonlocal created, updated, suppressed
+        c, u, s = write_alerts(chunk, now, window)
+        created, updated, suppressed = created + c, updated + u, suppressed + s
+
+    devices = Device.objects.all() if devices is None else devices
+    rows = rule_queryset(rule, devices, now, today).order_by().values_list(*DEVICE_COLUMNS)
+    for device_id, identifier, temp_c, eol_date in rows.iterator(chunk_size=BULK_BATCH_SIZE):
+        matched += 1
+        pending.append(Alert(
+            severity=rule["severity"], type=rule["type"],
+            message=rule_message(rule, identifier, temp_c, eol_date, today), device_id=device_id,
+        ))
+        if len(pending) >= BULK_BATCH_SIZE:
+            flush(pending)
+            pending = []
+    flush(pending)
+
+    return {
+        "rule": rule["type"],
+        "matched": matched,
+        "created": created,
+        "updated": updated,
+        "suppressed": suppressed,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def _evaluate_heartbeats(heartbeats, changed, now, today, window):
+    """
+    HEARTBEAT_MISSED driven by an in-process HeartbeatDeadlines tracker:
+    feed it the changed devices' heartbeats, then only look at the ids it reports expired.
+    """
+    rule = next(r for r in RULES if r["type"] == "HEARTBEAT_MISSED")
+    for device_id, last_heartbeat in changed.values_list("id", "last_heartbeat").iterator(chunk_size=BULK_BATCH_SIZE):
+        heartbeats.touch(device_id, last_heartbeat)
+    expired = heartbeats.pop_expired(now)
+
+    result = {"rule": rule["type"], "matched": 0, "created": 0, "updated": 0, "suppressed": 0, "seconds": 0.0}
+    for i in range(0, len(expired), BULK_BATCH_SIZE):
+        # The rule's own filter re-checks the DB so a heartbeat that raced in is not alerted
+        chunk = evaluate_rule(rule, now, today, window, Device.objects.filter(id__in=expired[i:i + BULK_BATCH_SIZE]))
+        for k in ("matched", "created", "updated", "suppressed", "seconds"):
+            result[k] += chunk[k]
+    return result
+
+
+def evaluate_device_rules(window=None, incremental=False, shard=None, heartbeats=None, engine="numpy"):
+    """
+    Evaluate every device rule.
+    With incremental=True only devices changed since the persisted watermark are
+    checked (the first incremental run does a full pass), then the watermark advances.
+    With shard=(index, count) only devices where id % count == index are checked, and
+    (index, count, worker, workers) checks one worker's part of it (see shard_devices);
+    each shard keeps its own watermark.
+    With a HeartbeatDeadlines tracker (incremental runs only), missed heartbeats come
+    from the tracker instead of a deadline range query.
+    engine="numpy" loads the device columns once and evaluates all rules as masks;
+    engine="sql" runs one filtered query per rule.
+    Returns one stats dict per rule: rule, matched, created, updated, suppressed, seconds.
+    """
+    now = timezone.now()
+    today = timezone.localdate()
+    key = WATERMARK_KEY if shard is None else f"{WATERMARK_KEY}:{shard_label(shard)}"
+
+    devices = Device.objects.all()
+    since = None
+    if incremental:
+        mark = Watermark.objects.filter(key=key).first()
+        if mark is not None:
+            since = mark.value - WATERMARK_OVERLAP
+            devices = changed_devices(since, now, today, deadlines=heartbeats is None)
+    if shard is not None:
+        devices = shard_devices(devices, shard)
+
+    results, rules = [], RULES
+    if heartbeats is not None and since is not None:
+        changed = devices.filter(updated_at__gt=since)
+        results.append(_evaluate_heartbeats(heartbeats, changed, now, today, window))
+        rules = [rule for rule in RULES if rule["type"] != "HEARTBEAT_MISSED"]
+
+    if engine == "numpy":
+        results += evaluate_rules_vectorized(rules, devices, now, today, window)
+    else:
+        results += [evaluate_rule(rule, now, today, window, devices) for rule in rules]
 
-    return alerts_created
+    if incremental:
+        Watermark.advance(key, now)
+    return results
@@ -0,0 +1,216 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .alert_rules import BULK_BATCH_SIZE, write_alerts
+from .models import Alert, Bill, DailyUsageRollup, Subscription
+
+# Usage-based bill estimate: the plan price covers INCLUDED_GB, then OVERAGE_RATE per extra GB
+INCLUDED_GB = 100
+OVERAGE_RATE = 10
+
+
+def estimate_bill(monthly_price, total_gb):
+    """Plan price plus overage for the GB used beyond the included allowance"""
+    bill = monthly_price
+    if total_gb > INCLUDED_GB:
+        bill += (total_gb - INCLUDED_GB) * OVERAGE_RATE
+    return round(bill, 2)
+
+
+# ----- Monthly billing run -----
+
+BILLING_PARTITION_SIZE = 10_000  # customers per partition (one transaction each)
+
+
+def parse_month(value):
+    """'YYYY-MM' → first day of that month"""
+    try:
+        year, month = (int(part) for part in value.split("-"))
+        return date(year, month, 1)
+    except ValueError:
+        raise ValueError(f"month must be YYYY-MM, got {value!r}")
+
+
+def month_end(month):
+    """Last day of the month starting at `month`"""
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def billing_partitions(partition_size=BILLING_PARTITION_SIZE):
+    """(lo, hi) customer id ranges covering every customer with an active subscription"""
+    ids = (
+        Subscription.objects.filter(status="active")
+        .order_by("customer_id").values_list("customer_id", flat=True).distinct()
+    )
+    chunk = []
+    for customer_id in ids.iterator(chunk_size=partition_size):
+        chunk.append(customer_id)
+        if len(chunk) == partition_size:
+            yield chunk[0], chunk[-1]
+            chunk = []
+    if chunk:
+        yield chunk[0], chunk[-1]
+
+
+def bill_partition(month, lo, hi):
+    """
+    Create the `month` bills of active subscribers with customer ids lo..hi.
+    Three set-based reads (plan prices, the month's DailyUsageRollup totals, bills that
+    already exist) and batched multi-row INSERTs; customers already billed for the month are
+    skipped, so re-running a partition is a no-op. A customer with several active
+    subscriptions pays every plan price plus one overage on their total usage.
+    Returns the number of bills created.
+    """
+    prices = defaultdict(int)
+    subscriptions = Subscription.objects.filter(status="active", customer_id__gte=lo, customer_id__lte=hi)
+    for customer_id, price in subscriptions.values_list("customer_id", "plan__monthly_price"):
+        prices[customer_id] += price
+
+    usage = dict(
+        DailyUsageRollup.objects.filter(
+            customer_id__gte=lo, customer_id__lte=hi, date__gte=month, date__lte=month_end(month)
+        ).values("customer_id").annotate(total=Sum("total_gb")).order_by().values_list("customer_id", "total")
+    )
+
+    billed = set(
+        Bill.objects.filter(customer_id__gte=lo, customer_id__lte=hi, month=month)
+        .values_list("customer_id", flat=True)
+    )
+    ops = connection.ops
+    rows = [
+        (
+            customer_id,
+            ops.adapt_datefield_value(month),
+            ops.adapt_decimalfield_value(Decimal(str(estimate_bill(price, usage.get(customer_id) or 0))), 10, 2),
+            "unpaid",
+        )
+        for customer_id, price in sorted(prices.items())
+        if customer_id not in billed
+    ]
+    # The transaction only writes: on SQLite a read-then-write transaction cannot wait
+    # for another worker's lock. bill_customer_month_uniq catches any concurrent run;
+    # rowcount counts only the bills this run actually inserted.
+    table = ops.quote_name(Bill._meta.db_table)
+    batch = (connection.features.max_query_params or 1000) // 4
+    created = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for i in range(0, len(rows), batch):
+            chunk = rows[i:i + batch]
+            cursor.execute(
+                f"INSERT INTO {table} (customer_id, month, amount, status) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s)'] * len(chunk))} "
+                f"ON CONFLICT (customer_id, month) DO NOTHING",
+                [value for row in chunk for value in row],
+            )
+            created += cursor.rowcount
+    return created
+
+
+def bill_month(month, partitions=None):
+    """Bill every active subscriber for `month`; yields (lo, hi, created) per partition"""
+    for lo, hi in partitions if partitions is not None else billing_partitions():
+        yield lo, hi, bill_partition(month, lo, hi)
+
+
+# ----- Settlement -----
+
+MAX_SETTLE_IDS = 10_000
+SETTLEABLE_STATUSES = ("unpaid", "overdue")
+
+
+def settle_bills(bill_ids):
+    """
+    Mark bills paid in one transaction with a conditional UPDATE (unpaid/overdue → paid)
+    that returns the ids it changed, so concurrent or replayed callbacks for the same bill
+    settle it exactly once. Returns {"settled", "already_paid", "not_found"} id lists.
+    """
+    ids = sorted(set(bill_ids))
+    ops = connection.ops
+    table = ops.quote_name(Bill._meta.db_table)
+    # Leave room for the status parameters under the backend's bind limit
+    batch = (connection.features.max_query_params or 1000) - len(SETTLEABLE_STATUSES)
+    settled = set()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for i in range(0, len(ids), batch):
+            chunk = ids[i:i + batch]
+            cursor.execute(
+                f"UPDATE {table} SET status = %s "
+                f"WHERE id IN ({', '.join(['%s'] * len(chunk))}) "
+                f"AND status IN ({', '.join(['%s'] * len(SETTLEABLE_STATUSES))}) RETURNING id",
+                ["paid", *chunk, *SETTLEABLE_STATUSES],
+            )
+            settled.update(row[0] for row in cursor.fetchall())
+
+    rest = [i for i in ids if i not in settled]
+    existing = set(Bill.objects.filter(id__in=rest).values_list("id", flat=True)) if rest else set()
+    return {
+        "settled": [i for i in ids if i in settled],
+        "already_paid": [i for i in rest if i in existing],
+        "not_found": [i for i in rest if i not in existing],
+    }
+
+
+# ----- Aging -----
+
+OVERDUE_ALERT_TYPE = "BILL_OVERDUE"
+
+
+def grace_days():
+    return getattr(settings, "BILL_GRACE_DAYS", 15)
+
+
+def overdue_cutoff(today, grace):
+    """Bills of months before this date are more than `grace` days past their month's end"""
+    return (today - timedelta(days=grace)).replace(day=1)
+
+
+def age_bills(today=None, grace=None):
+    """
+    Move unpaid bills past the grace period to overdue with one UPDATE, then raise one
+    deduplicated BILL_OVERDUE alert per affected customer (write_alerts: bulk insert, or
+    bump the customer's open alert and refresh its message). The message states the
+    customer's whole overdue balance, read with one grouped query per chunk. The UPDATE
+    reads bill_unpaid_month_idx, a partial index holding only unpaid bills, so a run
+    costs what it transitions.
+    Returns {"overdue", "customers", "alerts_created", "alerts_updated"}.
+    """
+    today = today or timezone.localdate()
+    grace = grace_days() if grace is None else grace
+    cutoff = connection.ops.adapt_datefield_value(overdue_cutoff(today, grace))
+    table = connection.ops.quote_name(Bill._meta.db_table)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET status = %s WHERE status = %s AND month < %s RETURNING customer_id",
+                ["overdue", "unpaid", cutoff],
+            )
+            rows = cursor.fetchall()
+
+        customers = sorted({customer_id for customer_id, in rows})
+        now = timezone.now()
+        created = updated = 0
+        for i in range(0, len(customers), BULK_BATCH_SIZE):
+            owed = (
+                Bill.objects.filter(customer_id__in=customers[i:i + BULK_BATCH_SIZE], status="overdue")
+                .values_list("customer_id").annotate(n=Count("id"), total=Sum("amount")).order_by("customer_id")
+            )
+            alerts = [
+                Alert(
+                    type=OVERDUE_ALERT_TYPE,
+                    severity="warning",
+                    customer_id=customer_id,
+                    message=f"{n} bill(s) overdue, ₹{total:.2f} outstanding",
+                )
+                for customer_id, n, total in owed
+            ]
+            c, u, _ = write_alerts(alerts, now)
+            created, updated = created + c, updated + u
+
+    return {"overdue": len(rows), "customers": len(customers), "alerts_created": created, "alerts_updated": updated}
@@ -0,0 +1,248 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.utils import timezone
+
+from .models import Device, UsageEvent
+
+logger = logging.getLogger(__name__)
+
+MAX_DEAD_LETTERS = 1000  # failed items kept for inspection
+
+
+def buffering_enabled():
+    return getattr(settings, "BUFFERED_INGESTION", False)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class WriteBehindBuffer:
+    """
+    Bounded in-process queue drained by a background flusher thread.
+
+    submit() never touches the database: it enqueues and returns, or returns False
+    when the queue is still full after `put_timeout` seconds (backpressure, the caller
+    should answer 503). The flusher hands flush_fn a batch once `flush_rows` items are
+    waiting or `flush_interval` seconds have passed since the first one, whichever
+    comes first. Anything still queued is written by flush() at interpreter exit.
+    Transient database errors are retried with backoff; see _write for failing rows.
+    """
+
+    def __init__(self, name, flush_fn, max_size=10_000, flush_rows=500, flush_interval=1.0, put_timeout=0.5,
+                 retries=3, retry_backoff=0.1):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.queue = queue.Queue(maxsize=max_size)
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.dead_letters = deque(maxlen=MAX_DEAD_LETTERS)
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.accepted = 0
+        self.rejected = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failed = 0
+        self.retried = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-flusher", daemon=True)
+            self._thread.start()
+
+    def submit(self, item):
+        try:
+            self.queue.put(item, timeout=self.put_timeout)
+        except queue.Full:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    def _take(self, first, deadline):
+        """first plus whatever arrives before the batch is full or the deadline passes"""
+        batch = [first]
+        while len(batch) < self.flush_rows:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush_with_retry(self, batch):
+        """flush_fn(batch), retried with backoff on transient errors (locks, dropped connections)"""
+        for attempt in range(self.retries + 1):
+            try:
+                return self.flush_fn(batch)
+            except OperationalError:
+                if attempt == self.retries:
+                    raise
+                self.retried += 1
+                connection.close_if_unusable_or_obsolete()
+                time.sleep(self.retry_backoff * 2 ** attempt)
+
+    def _write(self, batch):
+        """
+        Write a batch. These items were already answered 202, so a failing batch is
+        replayed item by item: one bad row (e.g. its customer was deleted meanwhile)
+        costs only itself. Items that still fail are logged and kept in dead_letters.
+        """
+        started = time.perf_counter()
+        try:
+            self._flush_with_retry(batch)
+            self.flushed += len(batch)
+        except Exception:
+            logger.warning("%s buffer: batch of %d failed, writing items one by one", self.name, len(batch), exc_info=True)
+            for item in batch:
+                try:
+                    self._flush_with_retry([item])
+                    self.flushed += 1
+                except Exception:
+                    self.failed += 1
+                    self.dead_letters.append(item)
+                    logger.exception("%s buffer: dropped item %r", self.name, item)
+        elapsed = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.last_flush_ms = elapsed
+        self.max_flush_ms = max(self.max_flush_ms, elapsed)
+        self.total_flush_ms += elapsed
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    first = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                batch = self._take(first, time.monotonic() + self.flush_interval)
+                with self._flush_lock:
+                    self._write(batch)
+        finally:
+            connection.close()  # the thread's own connection
+
+    def flush(self):
+        """Write everything queued right now, in batches of flush_rows; returns the item count"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = []
+                while len(batch) < self.flush_rows:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return written
+                self._write(batch)
+                written += len(batch)
+
+    def stop(self):
+        """Stop the flusher and drain the queue"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+            self._thread = None
+        return self.flush()
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "capacity": self.queue.maxsize,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "flushes": self.flushes,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "avg_flush_ms": round(self.total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+        }
+
+
+# ----- Flushers -----
+
+def flush_usage(batch):
+    """Validated UsageEvent field dicts → one bulk_create (which keeps DailyUsageRollup current)"""
+    UsageEvent.objects.bulk_create([UsageEvent(**fields) for fields in batch], batch_size=500)
+
+
+def flush_devices(batch):
+    """
+    (device_id, validated fields) updates → bulk_update, one per distinct field set.
+    Later updates to the same device win field by field, as they would have one by one.
+    """
+    merged = {}
+    for device_id, fields in batch:
+        merged.setdefault(device_id, {}).update(fields)
+
+    existing = Device.objects.in_bulk(list(merged))
+    now = timezone.now()
+    groups = {}
+    for device_id, fields in merged.items():
+        device = existing.get(device_id)
+        if device is None:
+            continue  # deleted since the request was accepted
+        for name, value in fields.items():
+            setattr(device, name, value)
+        device.updated_at = now  # bulk_update skips auto_now; incremental rule runs need it
+        groups.setdefault(tuple(sorted(fields)) + ("updated_at",), []).append(device)
+    for field_names, devices in groups.items():
+        Device.objects.bulk_update(devices, field_names, batch_size=500)
+
+
+# ----- Process-wide buffers -----
+
+FLUSHERS = {
+    "usage": flush_usage,
+    "devices": flush_devices,
+}
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+def get_buffer(name):
+    """The started buffer for `name` (see FLUSHERS), created on first use"""
+    with _buffers_lock:
+        buffer = _buffers.get(name)
+        if buffer is None:
+            buffer = _buffers[name] = WriteBehindBuffer(
+                name,
+                FLUSHERS[name],
+                max_size=_setting("INGEST_BUFFER_SIZE", 10_000),
+                flush_rows=_setting("INGEST_FLUSH_ROWS", 500),
+                flush_interval=_setting("INGEST_FLUSH_INTERVAL", 1.0),
+                put_timeout=_setting("INGEST_PUT_TIMEOUT", 0.5),
+                retries=_setting("INGEST_FLUSH_RETRIES", 3),
+            )
+            buffer.start()
+        return buffer
+
+
+def buffer_stats():
+    return {name: buffer.stats() for name, buffer in _buffers.items()}
+
+
+@atexit.register
+def flush_all():
+    """Worker shutdown: stop the flushers and write whatever is still queued"""
+    for name, buffer in list(_buffers.items()):
+        written = buffer.stop()
+        if written:
+            logger.info("%s buffer: flushed %d queued items at shutdown", name, written)
@@ -1,3 +1,16 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .churn_model import predict_churn_proba
+from .models import ChurnScore, Customer, DailyUsageRollup
+
+SCORE_CHUNK_SIZE = 10_000
+
+
 def churn_score(customer, avg7=None, avg30=None):
     """
     Simple churn scoring heuristic.
@@ -22,3 +35,137 @@ def churn_score(customer, avg7=None, avg30=None):
         score += 10
 
     return min(score, 100)
+
+
+def churn_scores(frame):
+    """
+    churn_score over a whole DataFrame at once.
+    Expects columns last_recharge_days_ago, complaints_last_90d, tenure_months, avg7, avg30.
+    """
+    score = (
+        np.where(frame["last_recharge_days_ago"] > 28, 40, 0)
+        + np.where((frame["avg30"] > 0) & (frame["avg7"] > 0) & (frame["avg7"] < 0.3 * frame["avg30"]), 30, 0)
+        + np.where(frame["complaints_last_90d"] >= 2, 20, 0)
+        + np.where(frame["tenure_months"] < 3, 10, 0)
+    )
+    return np.minimum(score, 100)
+
+
+def churn_action(score):
+    if score >= 70:
+        return "Offer 20% discount coupon"
+    if score >= 40:
+        return "Send personalized SMS reminder"
+    return "Normal engagement"
+
+
+def churn_payload(customer, score):
+    """Body returned (and cached) by the churn score endpoint"""
+    return {
+        "customer": customer.name,
+        "city": customer.city,
+        "score": score,
+        "action": churn_action(score)
+    }
+
+
+def usage_averages(customers, today=None):
+    """
+    Average daily GB over the last 7 and 30 days for a customer filter, in one grouped
+    query over the daily rollup (at most 30 rows per customer).
+    `customers` is a Q on DailyUsageRollup (e.g. Q(customer_id__range=(lo, hi))).
+    Returns {customer_id: (avg7, avg30)}; customers without usage are absent.
+    """
+    today = today or timezone.localdate()
+    rows = (
+        DailyUsageRollup.objects
+        .filter(customers, date__gt=today - timedelta(days=30), date__lte=today)
+        .values("customer_id")
+        .annotate(
+            sum7=Sum("total_gb", filter=Q(date__gt=today - timedelta(days=7))),
+            sum30=Sum("total_gb"),
+        )
+        .order_by()
+    )
+    return {r["customer_id"]: ((r["sum7"] or 0) / 7, (r["sum30"] or 0) / 30) for r in rows}
+
+
+CUSTOMER_COLUMNS = ["id", "last_recharge_days_ago", "complaints_last_90d", "tenure_months"]
+
+
+def feature_frame(customers, by_range=False, today=None):
+    """
+    Churn inputs for a Customer queryset as a DataFrame: the customer columns plus
+    avg7, avg30 and usage_trend (avg7 / avg30, 1.0 without 30-day usage).
+    Two queries. The usage aggregate filters on the customers' ids, or on their
+    id range with by_range=True (cheaper for contiguous id chunks).
+    """
+    frame = pd.DataFrame(list(customers.values_list(*CUSTOMER_COLUMNS)), columns=CUSTOMER_COLUMNS)
+    averages = {}
+    if len(frame):
+        ids = frame["id"]
+        usage_filter = (
+            Q(customer_id__gte=int(ids.min()), customer_id__lte=int(ids.max())) if by_range
+            else Q(customer_id__in=ids.tolist())
+        )
+        averages = usage_averages(usage_filter, today)
+
+    avg_frame = pd.DataFrame.from_dict(averages, orient="index", columns=["avg7", "avg30"], dtype=float)
+    frame = frame.join(avg_frame, on="id")
+    frame[["avg7", "avg30"]] = frame[["avg7", "avg30"]].fillna(0.0)
+    frame["usage_trend"] = (frame["avg7"] / frame["avg30"].where(frame["avg30"] > 0)).fillna(1.0)
+    return frame
+
+
+def score_frame(frame):
+    """
+    Scores (0-100) for a feature_frame: the trained model when an artifact is
+    present, otherwise the churn_score heuristic. Returns (scores, source).
+    """
+    proba = predict_churn_proba(frame)
+    if proba is None:
+        return churn_scores(frame), "heuristic"
+    return np.rint(proba * 100).astype(int), "model"
+
+
+def score_customers(chunk_size=SCORE_CHUNK_SIZE, today=None):
+    """
+    Score every customer into ChurnScore.
+    Walks customers by id in chunks: one customer read, one grouped usage query, one
+    vectorized scoring pass and one bulk upsert per chunk, so memory stays bounded by
+    the chunk size.
+    Yields the number of customers scored per chunk.
+    """
+    today = today or timezone.localdate()
+    last_id = 0
+    while True:
+        chunk = Customer.objects.filter(id__gt=last_id).order_by("id")[:chunk_size]
+        read_at = timezone.now()
+        frame = feature_frame(chunk, by_range=True, today=today)
+        if frame.empty:
+            return
+        last_id = int(frame["id"].iloc[-1])
+        scores, _ = score_frame(frame)
+        frame["score"] = scores
+        store_scores(frame, read_at)
+        yield len(frame)
+
+
+def store_scores(frame, scored_at):
+    """
+    Bulk upsert a scored feature_frame (needs a score column) into ChurnScore.
+    scored_at is when the features were read (taken before feature_frame), so a usage
+    change that lands while scoring leaves the rows outdated (churn_cache.is_current).
+    """
+    ChurnScore.objects.bulk_create(
+        [
+            ChurnScore(customer_id=cid, score=score, avg7=avg7, avg30=avg30, scored_at=scored_at)
+            for cid, score, avg7, avg30 in zip(
+                frame["id"].tolist(), frame["score"].tolist(), frame["avg7"].tolist(), frame["avg30"].tolist()
+            )
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["customer"],
+        update_fields=["score", "avg7", "avg30", "scored_at"],
+    )
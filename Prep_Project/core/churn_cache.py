@@ -0,0 +1,81 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Entries are keyed by customer and a version stamp. Invalidation bumps the stamp,
+# so stale entries are never read again and simply age out. The stamp is the time of
+# the last invalidation (0: none seen), which also tells whether a ChurnScore row
+# predates the change (see is_current).
+HITS_KEY = "churn:stats:hits"
+MISSES_KEY = "churn:stats:misses"
+
+
+def _ttl():
+    return getattr(settings, "CHURN_CACHE_TTL", 3600)
+
+
+def _version_key(customer_id):
+    return f"churn:ver:{customer_id}"
+
+
+def _entry_key(customer_id, version):
+    return f"churn:{customer_id}:v{version}"
+
+
+def _count(key):
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:  # evicted between add and incr
+        cache.set(key, 1, timeout=None)
+
+
+def get_churn(customer_id):
+    """
+    (cached payload or None, version stamp), counted as hit/miss. On a miss, compute
+    the payload and hand the stamp back to set_churn: reading it again at write time
+    would file a result computed before an invalidation under the new version.
+    """
+    version = cache.get(_version_key(customer_id), 0)
+    payload = cache.get(_entry_key(customer_id, version))
+    _count(HITS_KEY if payload is not None else MISSES_KEY)
+    return payload, version
+
+
+def get_churn_versions(customer_ids):
+    """{customer_id: version stamp} in one cache round-trip, for set_many_churn"""
+    found = cache.get_many([_version_key(cid) for cid in customer_ids])
+    return {cid: found.get(_version_key(cid), 0) for cid in customer_ids}
+
+
+def set_churn(customer_id, payload, version):
+    cache.set(_entry_key(customer_id, version), payload, _ttl())
+
+
+def set_many_churn(payloads, versions):
+    """Store {customer_id: payload} under the stamps read before computing them (bulk warm-up)"""
+    cache.set_many({_entry_key(cid, versions[cid]): payload for cid, payload in payloads.items()}, _ttl())
+
+
+def is_current(scored_at, version):
+    """Whether a result computed at `scored_at` postdates the invalidation behind `version`"""
+    return scored_at.timestamp() >= version
+
+
+def invalidate_churn(customer_ids):
+    """Move the version stamp of every given customer to now, in bulk"""
+    keys = [_version_key(cid) for cid in set(customer_ids)]
+    if not keys:
+        return
+    current = cache.get_many(keys)
+    now = time.time()
+    # Strictly increasing even if the clock stalls or two writes share a tick
+    cache.set_many({key: max(now, current.get(key, 0) + 1e-6) for key in keys}, timeout=None)
+
+
+def cache_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": round(hits / total, 4) if total else None}
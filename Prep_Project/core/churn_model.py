@@ -0,0 +1,70 @@
+import logging
+import threading
+from pathlib import Path
+
+import joblib
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Columns of churn.feature_frame the model is trained on
+FEATURES = ["tenure_months", "complaints_last_90d", "last_recharge_days_ago", "usage_trend"]
+
+# Loaded once per worker process on first use; None when there is no artifact
+_model = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+
+def model_path():
+    return Path(getattr(settings, "CHURN_MODEL_PATH", settings.BASE_DIR / "churn_model.joblib"))
+
+
+def get_model():
+    """The trained churn pipeline, loaded lazily and shared by every request in this process"""
+    global _model, _model_loaded
+    if not _model_loaded:
+        with _model_lock:
+            if not _model_loaded:
+                path = model_path()
+                if path.exists():
+                    _model = joblib.load(path)["pipeline"]
+                    logger.info("Loaded churn model from %s", path)
+                _model_loaded = True
+    return _model
+
+
+def reset_model():
+    """Forget the loaded model so the next call re-reads the artifact (e.g. after training)"""
+    global _model, _model_loaded
+    with _model_lock:
+        _model, _model_loaded = None, False
+
+
+def train_model(frame, labels):
+    """Fit a scaled logistic regression on FEATURES; labels are 1 for churned customers"""
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    pipeline = make_pipeline(StandardScaler(), LogisticRegression(class_weight="balanced", max_iter=1000))
+    pipeline.fit(frame[FEATURES].to_numpy(dtype=float), labels)
+    return pipeline
+
+
+def save_model(pipeline, path=None):
+    path = Path(path or model_path())
+    joblib.dump({"pipeline": pipeline, "features": FEATURES}, path)
+    reset_model()
+    return path
+
+
+def predict_churn_proba(frame):
+    """Churn probability per row in one vectorized predict_proba call, or None without a model"""
+    model = get_model()
+    if model is None:
+        return None
+    if frame.empty:
+        return np.empty(0)
+    return model.predict_proba(frame[FEATURES].to_numpy(dtype=float))[:, 1]
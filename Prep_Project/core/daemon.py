@@ -0,0 +1,69 @@
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+
+from django.db import close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+
+def install_stop_handlers(stop):
+    """SIGTERM/SIGINT finish the current cycle and then exit the loop"""
+    def _handler(signum, frame):
+        logger.info("Received signal %s, stopping after the current cycle", signum)
+        stop.set()
+
+    signal.signal(signal.SIGTERM, _handler)
+    signal.signal(signal.SIGINT, _handler)
+
+
+def run_loop(step, interval, stop, name="daemon"):
+    """
+    Call step() every `interval` seconds until `stop` is set.
+    A failing cycle is logged and the loop carries on.
+    """
+    cycle = 0
+    while not stop.is_set():
+        cycle += 1
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception("%s cycle %d failed", name, cycle)
+        finally:
+            close_old_connections()
+        elapsed = time.perf_counter() - started
+        logger.info("%s cycle %d took %.1f ms", name, cycle, elapsed * 1000)
+        stop.wait(max(0.0, interval - elapsed))
+
+
+def _worker_main(target, args):
+    stop = threading.Event()
+    install_stop_handlers(stop)
+    target(stop, *args)
+
+
+def run_workers(target, args_list):
+    """
+    Run target(stop, *args) in one process per entry of args_list and wait for them.
+    SIGTERM/SIGINT on the parent are forwarded so every worker shuts down gracefully.
+    """
+    # Children must not share the parent's database connections
+    connections.close_all()
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_worker_main, args=(target, args), daemon=False) for args in args_list]
+    for p in procs:
+        p.start()
+
+    def _forward(signum, frame):
+        for p in procs:
+            if p.is_alive():
+                p.terminate()  # SIGTERM → worker finishes its cycle
+
+    signal.signal(signal.SIGTERM, _forward)
+    signal.signal(signal.SIGINT, _forward)
+    for p in procs:
+        p.join()
+    return [p.exitcode for p in procs]
@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import Alert, Customer, DailyUsageRollup, Device, InventoryItem, Plan, Subscription
+
+logger = logging.getLogger(__name__)
+
+USAGE_DAYS = 7
+DEVICE_PAGE_SIZE = 50
+
+SNAPSHOT_KEY = "dashboard:snapshot"
+REFRESH_LOCK_KEY = "dashboard:refreshing"
+# A refresh that has not finished by then is assumed dead and may be retried
+REFRESH_LOCK_TIMEOUT = 120
+
+
+def combined_counts(**querysets):
+    """
+    COUNT of several querysets in a single round-trip: {name: count}.
+    Each queryset becomes a scalar subquery of one SELECT.
+    """
+    quote = connection.ops.quote_name
+    selects, params = [], []
+    for name, qs in querysets.items():
+        sql, qs_params = qs.order_by().values("pk").query.sql_with_params()
+        selects.append(f"(SELECT COUNT(*) FROM ({sql}) AS {quote(name + '_rows')}) AS {quote(name)}")
+        params.extend(qs_params)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT " + ", ".join(selects), params)
+        return dict(zip(querysets, cursor.fetchone()))
+
+
+def usage_by_day(today=None, days=USAGE_DAYS):
+    """Total GB per day for the last `days` days (oldest first), from one grouped query"""
+    today = today or timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    totals = dict(
+        DailyUsageRollup.objects.filter(date__range=(start, today))
+        .values("date").annotate(total=Sum("total_gb")).order_by()
+        .values_list("date", "total")
+    )
+    days = [start + timedelta(days=i) for i in range(days)]
+    return [d.strftime("%b %d") for d in days], [round(totals.get(d) or 0, 2) for d in days]
+
+
+def device_page(page, total):
+    """One page of the device table (site joined in) plus page numbers; total comes from combined_counts"""
+    num_pages = max(1, -(-total // DEVICE_PAGE_SIZE))
+    page = min(max(page, 1), num_pages)
+    offset = (page - 1) * DEVICE_PAGE_SIZE
+    devices = Device.objects.select_related("site").order_by("id")[offset:offset + DEVICE_PAGE_SIZE]
+    return list(devices), page, num_pages
+
+
+def dashboard_aggregates(today=None):
+    """
+    Everything the dashboard renders except the device page, in five queries
+    regardless of table sizes: counts, plan split, usage by day, recent alerts, inventory.
+    """
+    open_alerts = Alert.objects.filter(status="open")
+    counts = combined_counts(
+        customers=Customer.objects.all(),
+        devices=Device.objects.all(),
+        plans=Plan.objects.all(),
+        alerts_open=open_alerts,
+        alerts_info=open_alerts.filter(severity="info"),
+        alerts_warning=open_alerts.filter(severity="warning"),
+        alerts_critical=open_alerts.filter(severity="critical"),
+    )
+
+    plan_counts = Subscription.objects.values("plan__name").annotate(count=Count("id")).order_by("plan__name")
+    plan_labels, plan_values = [], []
+    for row in plan_counts:
+        plan_labels.append(row["plan__name"])
+        plan_values.append(row["count"])
+
+    usage_labels, usage_values = usage_by_day(today)
+
+    recent_alerts = list(open_alerts.select_related("device").order_by("-created_at")[:10])
+
+    inventory = list(InventoryItem.objects.values_list("name", "stock_on_hand", "reorder_point"))
+
+    return {
+        "customers": counts["customers"],
+        "devices": counts["devices"],
+        "alerts_open": counts["alerts_open"],
+        "plans": counts["plans"],
+        "alert_data": [counts["alerts_info"], counts["alerts_warning"], counts["alerts_critical"]],
+        "plan_labels": plan_labels,
+        "plan_values": plan_values,
+        "usage_labels": usage_labels,
+        "usage_values": usage_values,
+        "recent_alerts": recent_alerts,
+        "inventory_labels": [name for name, _, _ in inventory],
+        "inventory_stock": [stock for _, stock, _ in inventory],
+        "inventory_reorder": [reorder for _, _, reorder in inventory],
+    }
+
+
+# ----- Snapshot -----
+# The aggregates are materialized into the cache. Requests serve whatever snapshot
+# exists; a stale one schedules a single background rebuild (guarded by a cache lock)
+# so the refresh cost does not grow with the number of operators watching.
+
+def _max_age():
+    return getattr(settings, "DASHBOARD_SNAPSHOT_MAX_AGE", 60)
+
+
+def build_snapshot():
+    """Recompute the aggregates and store them as the current snapshot"""
+    started = time.perf_counter()
+    snapshot = {"built_at": timezone.now(), "context": dashboard_aggregates()}
+    cache.set(SNAPSHOT_KEY, snapshot, timeout=None)
+    logger.info("dashboard snapshot rebuilt in %.1f ms", (time.perf_counter() - started) * 1000)
+    return snapshot
+
+
+def _refresh_in_background():
+    try:
+        build_snapshot()
+    except Exception:
+        logger.exception("dashboard snapshot refresh failed")
+    finally:
+        cache.delete(REFRESH_LOCK_KEY)
+        connection.close()  # the thread's own connection
+
+
+def _start_refresh():
+    threading.Thread(target=_refresh_in_background, name="dashboard-refresh", daemon=True).start()
+
+
+def get_snapshot():
+    """Current snapshot, built inline only when none exists; stale ones refresh asynchronously"""
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot is None:
+        return build_snapshot()
+    age = (timezone.now() - snapshot["built_at"]).total_seconds()
+    if age > _max_age() and cache.add(REFRESH_LOCK_KEY, 1, timeout=REFRESH_LOCK_TIMEOUT):
+        _start_refresh()
+    return snapshot
+
+
+def dashboard_context(page=1):
+    """Snapshot aggregates plus the requested device page and the snapshot's age"""
+    snapshot = get_snapshot()
+    context = dict(snapshot["context"])
+    devices_list, page, num_pages = device_page(page, context["devices"])
+    context.update(
+        devices_list=devices_list,
+        device_page=page,
+        device_pages=num_pages,
+        snapshot_built_at=snapshot["built_at"],
+        snapshot_age=int((timezone.now() - snapshot["built_at"]).total_seconds()),
+    )
+    return context
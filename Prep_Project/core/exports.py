@@ -0,0 +1,111 @@
+import csv
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+from .models import Alert, Bill, UsageEvent
+
+EXPORT_CHUNK_SIZE = 5000
+
+# Exportable tables: columns read with values_list (no model instances), the date column
+# used by start/end filters, and an ordering served by an index.
+EXPORTS = {
+    "usage": {
+        "model": UsageEvent,
+        "columns": ("id", "customer_id", "date", "gb_used"),
+        "date_field": "date",
+        "ordering": ("date", "id"),             # usage_date_id_idx
+    },
+    "alerts": {
+        "model": Alert,
+        "columns": ("id", "type", "severity", "status", "device_id", "customer_id", "message",
+                    "occurrences", "created_at", "last_seen_at"),
+        "date_field": "created_at",
+        "ordering": ("created_at", "-id"),      # alert_created_id_idx, scanned backwards
+    },
+    "bills": {
+        "model": Bill,
+        "columns": ("id", "customer_id", "month", "amount", "status"),
+        "date_field": "month",
+        "ordering": ("month", "-id"),           # bill_month_id_idx, scanned backwards
+    },
+}
+FORMATS = ("ndjson", "csv")
+
+
+def export_rows(kind, start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Stream tuples of EXPORTS[kind]["columns"] for rows dated start..end (inclusive dates).
+    Uses .iterator() so only one chunk is ever held in memory.
+    """
+    spec = EXPORTS[kind]
+    model = spec["model"]
+    date_field = spec["date_field"]
+    qs = model.objects.all()
+    if isinstance(model._meta.get_field(date_field), models.DateTimeField):
+        # Whole days in the current timezone
+        if start:
+            qs = qs.filter(**{f"{date_field}__gte": timezone.make_aware(datetime.combine(start, time.min))})
+        if end:
+            qs = qs.filter(**{f"{date_field}__lt": timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))})
+    else:
+        if start:
+            qs = qs.filter(**{f"{date_field}__gte": start})
+        if end:
+            qs = qs.filter(**{f"{date_field}__lte": end})
+    return qs.order_by(*spec["ordering"]).values_list(*spec["columns"]).iterator(chunk_size=chunk_size)
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _Echo:
+    """File-like object for csv.writer that hands back what it is given"""
+
+    def write(self, value):
+        return value
+
+
+def ndjson_chunks(columns, rows, batch_size=1000):
+    """One JSON object per line, emitted as text blocks of batch_size lines"""
+    encoder = DjangoJSONEncoder()
+    for batch in _batched(rows, batch_size):
+        yield "".join(encoder.encode(dict(zip(columns, row))) + "\n" for row in batch)
+
+
+def csv_chunks(columns, rows, batch_size=1000):
+    """Header line, then CSV text blocks of batch_size rows"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for batch in _batched(rows, batch_size):
+        yield "".join(writer.writerow(row) for row in batch)
+
+
+def export_chunks(kind, fmt="ndjson", start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Text chunks of a whole export, ready to stream"""
+    columns = EXPORTS[kind]["columns"]
+    rows = export_rows(kind, start, end, chunk_size)
+    if fmt == "csv":
+        return csv_chunks(columns, rows)
+    return ndjson_chunks(columns, rows)
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a stream of text chunks into a gzip stream without buffering it"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
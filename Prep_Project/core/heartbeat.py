@@ -0,0 +1,81 @@
+import heapq
+
+from .alert_rules import HEARTBEAT_TIMEOUT
+from .models import Device
+
+HEARTBEAT_TIMEOUT_SECONDS = HEARTBEAT_TIMEOUT.total_seconds()
+
+
+class HeartbeatDeadlines:
+    """
+    Min-heap of heartbeat deadlines (last_heartbeat + timeout) keyed by device id.
+
+    touch() records a heartbeat, pop_expired() hands back the devices whose deadline
+    passed. Superseded heap entries are skipped lazily, so both cost O(log n) and a
+    tick costs O(expired · log n) no matter how many devices are tracked.
+    """
+
+    def __init__(self, timeout=HEARTBEAT_TIMEOUT_SECONDS):
+        self.timeout = timeout
+        self._heap = []       # (deadline, device_id), may contain superseded entries
+        self._deadlines = {}  # device_id -> current deadline (epoch seconds)
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, device_id):
+        return device_id in self._deadlines
+
+    @classmethod
+    def from_db(cls, devices=None, timeout=HEARTBEAT_TIMEOUT_SECONDS):
+        """Build the tracker from devices' last_heartbeat in one pass (heapify is O(n))"""
+        tracker = cls(timeout)
+        devices = Device.objects.all() if devices is None else devices
+        rows = devices.filter(last_heartbeat__isnull=False).order_by().values_list("id", "last_heartbeat")
+        for device_id, last_heartbeat in rows.iterator(chunk_size=5000):
+            tracker._deadlines[device_id] = last_heartbeat.timestamp() + timeout
+        tracker._heap = [(deadline, device_id) for device_id, deadline in tracker._deadlines.items()]
+        heapq.heapify(tracker._heap)
+        return tracker
+
+    def touch(self, device_id, last_heartbeat):
+        """Record a heartbeat (datetime or epoch seconds); older heartbeats are ignored"""
+        if last_heartbeat is None:
+            return
+        ts = last_heartbeat if isinstance(last_heartbeat, (int, float)) else last_heartbeat.timestamp()
+        deadline = ts + self.timeout
+        current = self._deadlines.get(device_id)
+        if current is not None and current >= deadline:
+            return
+        self._deadlines[device_id] = deadline
+        heapq.heappush(self._heap, (deadline, device_id))
+        self._compact()
+
+    def remove(self, device_id):
+        self._deadlines.pop(device_id, None)
+
+    def next_deadline(self):
+        """Earliest live deadline (epoch seconds), or None"""
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_expired(self, now):
+        """
+        Remove and return ids of devices whose deadline is before `now`.
+        Each device is reported once until its next heartbeat re-arms it.
+        """
+        now = now if isinstance(now, (int, float)) else now.timestamp()
+        expired = []
+        while self._heap and self._heap[0][0] < now:
+            deadline, device_id = heapq.heappop(self._heap)
+            if self._deadlines.get(device_id) == deadline:
+                del self._deadlines[device_id]
+                expired.append(device_id)
+        return expired
+
+    def _compact(self):
+        # Rebuild when superseded entries dominate so memory stays O(devices)
+        if len(self._heap) > 2 * len(self._deadlines) + 1024:
+            self._heap = [(deadline, device_id) for device_id, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
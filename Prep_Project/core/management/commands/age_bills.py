@@ -0,0 +1,41 @@
+import logging
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from core.billing import age_bills, grace_days
+from core.daemon import install_stop_handlers, run_loop
+
+logger = logging.getLogger("core.billing")
+
+
+def _format(result):
+    return (
+        f"{result['overdue']} bills now overdue for {result['customers']} customers; "
+        f"alerts created={result['alerts_created']} updated={result['alerts_updated']}"
+    )
+
+
+class Command(BaseCommand):
+    help = "Move unpaid bills past the grace period to overdue and raise BILL_OVERDUE alerts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-days", type=int, default=None,
+            help="Days after the billing month ends (default: settings.BILL_GRACE_DAYS)",
+        )
+        parser.add_argument("--daemon", action="store_true", help="Stay resident and age bills every --interval seconds")
+        parser.add_argument("--interval", type=float, default=3600, help="Seconds between daemon runs")
+
+    def handle(self, *args, **options):
+        grace = grace_days() if options["grace_days"] is None else options["grace_days"]
+        if grace < 0:
+            raise CommandError("--grace-days must be >= 0")
+
+        if options["daemon"]:
+            stop = threading.Event()
+            install_stop_handlers(stop)
+            run_loop(lambda: logger.info("age_bills %s", _format(age_bills(grace=grace))),
+                     options["interval"], stop, name="age_bills")
+            return
+
+        self.stdout.write(self.style.SUCCESS(_format(age_bills(grace=grace))))
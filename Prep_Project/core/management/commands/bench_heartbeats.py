@@ -0,0 +1,53 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from core.heartbeat import HeartbeatDeadlines
+
+
+class Command(BaseCommand):
+    help = "Benchmark HeartbeatDeadlines ticks against a full scan as the fleet grows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+        parser.add_argument("--ticks", type=int, default=200)
+        parser.add_argument("--expire-per-tick", type=int, default=20, help="Devices going silent per tick")
+        parser.add_argument("--beats-per-tick", type=int, default=200, help="Heartbeats arriving per tick")
+
+    def handle(self, *args, **options):
+        ticks, expire, beats = options["ticks"], options["expire_per_tick"], options["beats_per_tick"]
+        timeout = 900.0
+        self.stdout.write(f"{'devices':>10} {'heap µs/tick':>14} {'scan µs/tick':>14}")
+
+        for n in options["sizes"]:
+            rng = random.Random(n)
+            # Everyone reported recently except `expire` devices per tick, spread over the run
+            last_seen = {i: 0.0 for i in range(n)}
+            silent = rng.sample(range(n), min(n, expire * ticks))
+            for k, device_id in enumerate(silent):
+                last_seen[device_id] = -timeout + (k // expire) + 0.5
+
+            tracker = HeartbeatDeadlines(timeout)
+            for device_id, ts in last_seen.items():
+                tracker.touch(device_id, ts)
+
+            silent_set = set(silent)
+            awake = [i for i in range(min(n, 10 * beats)) if i not in silent_set]
+            heap_s = scan_s = 0.0
+            for tick in range(1, ticks + 1):
+                arrivals = rng.sample(awake, min(beats, len(awake)))
+
+                started = time.perf_counter()
+                for device_id in arrivals:
+                    tracker.touch(device_id, float(tick))
+                tracker.pop_expired(float(tick))
+                heap_s += time.perf_counter() - started
+
+                started = time.perf_counter()
+                for device_id in arrivals:
+                    last_seen[device_id] = float(tick)
+                cutoff = tick - timeout
+                [d for d, ts in last_seen.items() if ts < cutoff]
+                scan_s += time.perf_counter() - started
+
+            self.stdout.write(f"{n:>10} {heap_s / ticks * 1e6:>14.1f} {scan_s / ticks * 1e6:>14.1f}")
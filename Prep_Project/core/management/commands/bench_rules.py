@@ -0,0 +1,95 @@
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.alert_rules import OPERATORS, RULES, load_device_columns, rule_mask
+from core.models import Device
+
+SEED_BATCH_SIZE = 5000
+
+
+def _python_loop(rules, devices, now_ts, today_ord):
+    """Per-device load and evaluation, the way the original evaluate_device_rules loop worked"""
+    matches = {rule["type"]: 0 for rule in rules}
+    rows = devices.order_by().values_list("id", "temp_c", "last_heartbeat", "eol_date")
+    for device_id, temp_c, heartbeat, eol in rows.iterator(chunk_size=SEED_BATCH_SIZE):
+        values = {
+            "temp_c": temp_c,
+            "heartbeat_age": None if heartbeat is None else now_ts - heartbeat.timestamp(),
+            "eol_days": None if eol is None else eol.toordinal() - today_ord,
+        }
+        for rule in rules:
+            ok = True
+            for field, op, threshold in rule["conditions"]:
+                value = values[field]
+                if value is None or not OPERATORS[op](value, threshold):
+                    ok = False
+                    break
+            if ok:
+                matches[rule["type"]] += 1
+    return matches
+
+
+def _seed(n, now, today):
+    """n random devices (5% without a temperature reading), in SEED_BATCH_SIZE inserts"""
+    rng = np.random.default_rng(n)
+    temps = rng.uniform(40, 90, n)
+    missing = rng.random(n) < 0.05
+    ages = rng.uniform(0, 3600, n)
+    eol_days = rng.integers(-10, 720, n)
+    for start in range(0, n, SEED_BATCH_SIZE):
+        Device.objects.bulk_create([
+            Device(
+                identifier=f"bench-{i}", type="CPE",
+                temp_c=None if missing[i] else float(temps[i]),
+                last_heartbeat=now - timedelta(seconds=float(ages[i])),
+                eol_date=today + timedelta(days=int(eol_days[i])),
+            )
+            for i in range(start, min(start + SEED_BATCH_SIZE, n))
+        ])
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark rule evaluation end to end (load devices from the database, then evaluate): "
+        "vectorized against a per-device Python loop. Seeds devices in a rolled-back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        today = timezone.localdate()
+        now_ts, today_ord = now.timestamp(), today.toordinal()
+        self.stdout.write(f"{'devices':>10} {'loop ms':>10} {'load ms':>10} {'eval ms':>10} {'numpy ms':>10} {'speedup':>8}")
+
+        for n in options["sizes"]:
+            with transaction.atomic():
+                _seed(n, now, today)
+                devices = Device.objects.filter(identifier__startswith="bench-")
+
+                started = time.perf_counter()
+                loop = _python_loop(RULES, devices, now_ts, today_ord)
+                loop_ms = (time.perf_counter() - started) * 1000
+
+                started = time.perf_counter()
+                columns = load_device_columns(devices)
+                loaded = time.perf_counter()
+                vec = {rule["type"]: int(rule_mask(rule, columns, now, today).sum()) for rule in RULES}
+                load_ms = (loaded - started) * 1000
+                eval_ms = (time.perf_counter() - loaded) * 1000
+
+                transaction.set_rollback(True)
+
+            numpy_ms = load_ms + eval_ms
+            if loop != vec:
+                self.stderr.write(f"Mismatch at n={n}: loop={loop} numpy={vec}")
+            self.stdout.write(
+                f"{n:>10} {loop_ms:>10.1f} {load_ms:>10.1f} {eval_ms:>10.1f} {numpy_ms:>10.1f} "
+                f"{loop_ms / numpy_ms:>7.1f}x"
+            )
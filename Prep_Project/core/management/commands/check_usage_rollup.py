@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.usage_rollup import REBUILD_CHUNK_SIZE, check_usage_rollup, resync_usage_keys
+
+
+class Command(BaseCommand):
+    help = "Compare DailyUsageRollup with raw UsageEvent totals; --fix rewrites mismatching days"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=REBUILD_CHUNK_SIZE, help="Customers per comparison chunk")
+        parser.add_argument("--fix", action="store_true", help="Recompute the mismatching rollup rows")
+        parser.add_argument("--show", type=int, default=20, help="Mismatches to print")
+
+    def handle(self, *args, **options):
+        mismatches = list(check_usage_rollup(chunk_size=options["chunk_size"]))
+        for customer_id, day, expected, actual in mismatches[:options["show"]]:
+            self.stdout.write(f"customer={customer_id} date={day} expected={expected} rollup={actual}")
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("Daily usage rollup is consistent"))
+            return
+        if options["fix"]:
+            resync_usage_keys((c, d) for c, d, _, _ in mismatches)
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(mismatches)} rollup rows"))
+            return
+        raise CommandError(f"{len(mismatches)} rollup rows differ from raw usage (re-run with --fix)")
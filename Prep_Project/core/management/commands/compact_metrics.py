@@ -0,0 +1,30 @@
+import logging
+import threading
+
+from django.core.management.base import BaseCommand
+from core.daemon import install_stop_handlers, run_loop
+from core.metrics import compact_metrics
+
+logger = logging.getLogger("core.metrics")
+
+
+class Command(BaseCommand):
+    help = "Downsample device metrics to 5-minute/hourly buckets and apply retention"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--daemon", action="store_true", help="Stay resident and compact every --interval seconds")
+        parser.add_argument("--interval", type=float, default=300, help="Seconds between compaction passes")
+
+    def handle(self, *args, **options):
+        if options["daemon"]:
+            stop = threading.Event()
+            install_stop_handlers(stop)
+            run_loop(lambda: logger.info("compaction %s", compact_metrics()), options["interval"], stop, name="metrics")
+            return
+
+        result = compact_metrics()
+        self.stdout.write(
+            f"5-minute buckets={result['5m_buckets']} hourly buckets={result['hourly_buckets']} "
+            f"deleted={result['deleted']}"
+        )
+        self.stdout.write(self.style.SUCCESS("Compaction done"))
@@ -0,0 +1,51 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core.exports import EXPORT_CHUNK_SIZE, EXPORTS, FORMATS, export_chunks, gzip_chunks
+
+
+def _date(value):
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = "Stream usage/alerts/bills to a file (or stdout) as NDJSON or CSV, optionally gzipped"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=list(EXPORTS))
+        parser.add_argument("--format", choices=FORMATS, default="ndjson")
+        parser.add_argument("--start", type=_date, help="First date (YYYY-MM-DD, inclusive)")
+        parser.add_argument("--end", type=_date, help="Last date (YYYY-MM-DD, inclusive)")
+        parser.add_argument("--gzip", action="store_true", help="Write a gzip stream")
+        parser.add_argument("--output", "-o", default="-", help="Output path, - for stdout")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="Rows fetched per round-trip")
+
+    def handle(self, *args, **options):
+        chunks = export_chunks(
+            options["kind"], options["format"], options["start"], options["end"], options["chunk_size"]
+        )
+        if options["gzip"]:
+            chunks = gzip_chunks(chunks)
+        else:
+            chunks = (chunk.encode("utf-8") for chunk in chunks)
+
+        to_stdout = options["output"] == "-"
+        try:
+            out = sys.stdout.buffer if to_stdout else open(options["output"], "wb")
+        except OSError as e:
+            raise CommandError(e)
+        written = 0
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if not to_stdout:
+                out.close()
+        if not to_stdout:
+            self.stderr.write(f"Wrote {written} bytes to {options['output']}")
@@ -0,0 +1,62 @@
+import csv
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.usage_import import ERROR_REPORT_HEADER, FORMATS, IMPORT_CHUNK_SIZE, import_usage
+
+
+class Command(BaseCommand):
+    help = "Bulk import usage events from a CSV (customer_id,date,gb_used) or NDJSON file, optionally gzipped"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Input file (.gz is decompressed on the fly), - for stdin")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults from the file extension, else csv")
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="Rows per transaction")
+        parser.add_argument("--workers", type=int, default=1, help="Parser processes")
+        parser.add_argument("--errors", help="Write rejected rows to this CSV file")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or ("ndjson" if ".ndjson" in path or ".jsonl" in path else "csv")
+        try:
+            if path == "-":
+                source = sys.stdin
+            elif path.endswith(".gz"):
+                source = gzip.open(path, "rt", encoding="utf-8", newline="")
+            else:
+                source = open(path, encoding="utf-8", newline="")
+            error_file = open(options["errors"], "w", newline="") if options["errors"] else None
+        except OSError as e:
+            raise CommandError(e)
+
+        error_writer = None
+        if error_file:
+            error_writer = csv.writer(error_file)
+            error_writer.writerow(ERROR_REPORT_HEADER)
+
+        def progress(result):
+            self.stdout.write(
+                f"{result.inserted} inserted, {result.rejected} rejected "
+                f"({result.rows_per_sec:,.0f} rows/s)"
+            )
+
+        try:
+            result = import_usage(
+                source, fmt, options["chunk_size"], options["workers"], progress, error_writer
+            )
+        except ValueError as e:
+            raise CommandError(e)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if error_file:
+                error_file.close()
+
+        for line_no, reason, raw in result.errors[:10]:
+            self.stderr.write(f"line {line_no}: {reason}: {raw}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.inserted} usage events in {result.seconds:.1f}s "
+            f"({result.rows_per_sec:,.0f} rows/s), rejected {result.rejected}"
+        ))
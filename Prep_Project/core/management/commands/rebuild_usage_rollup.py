@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+from core.usage_rollup import REBUILD_CHUNK_SIZE, rebuild_usage_rollup
+
+
+class Command(BaseCommand):
+    help = "Recompute DailyUsageRollup from raw UsageEvent rows (backfills, repairs)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=REBUILD_CHUNK_SIZE, help="Customers per transaction")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = 0
+        for written in rebuild_usage_rollup(chunk_size=options["chunk_size"]):
+            total += written
+            self.stdout.write(f"Wrote {total} rollup rows ({time.perf_counter() - started:.1f}s)")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} daily usage rollup rows"))
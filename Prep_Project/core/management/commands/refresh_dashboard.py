@@ -0,0 +1,26 @@
+import logging
+import threading
+
+from django.core.management.base import BaseCommand
+from core.daemon import install_stop_handlers, run_loop
+from core.dashboard import build_snapshot
+
+logger = logging.getLogger("core.dashboard")
+
+
+class Command(BaseCommand):
+    help = "Rebuild the cached dashboard snapshot (once, or every --interval seconds with --daemon)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--daemon", action="store_true", help="Stay resident and rebuild every --interval seconds")
+        parser.add_argument("--interval", type=float, default=30, help="Seconds between rebuilds")
+
+    def handle(self, *args, **options):
+        if options["daemon"]:
+            stop = threading.Event()
+            install_stop_handlers(stop)
+            run_loop(build_snapshot, options["interval"], stop, name="dashboard")
+            return
+
+        snapshot = build_snapshot()
+        self.stdout.write(self.style.SUCCESS(f"Dashboard snapshot built at {snapshot['built_at']:%H:%M:%S}"))
@@ -0,0 +1,69 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Sum
+from core.billing import BILLING_PARTITION_SIZE, bill_month, billing_partitions, parse_month
+from core.daemon import run_workers
+from core.models import Bill
+
+logger = logging.getLogger("core.billing")
+
+
+def _billing_worker(stop, month, partitions, name):
+    """One worker process: bill its customer id ranges, stopping between partitions on SIGTERM"""
+    created = 0
+    for lo, hi, n in bill_month(month, partitions):
+        created += n
+        logger.info("%s billed customers %d-%d: %d new bills", name, lo, hi, n)
+        if stop.is_set():
+            logger.info("%s stopping early; re-run to bill the remaining partitions", name)
+            break
+    logger.info("%s done, %d bills created", name, created)
+
+
+class Command(BaseCommand):
+    help = "Generate the monthly bill of every active subscription (idempotent per customer and month)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--month", required=True, help="Billing month, YYYY-MM")
+        parser.add_argument(
+            "--partition-size", type=int, default=BILLING_PARTITION_SIZE,
+            help="Customers per partition; each partition is one transaction",
+        )
+        parser.add_argument("--workers", type=int, default=1, help="Processes billing partitions in parallel")
+        parser.add_argument("--shard-index", type=int, default=0, help="This host's shard of the partitions (0-based)")
+        parser.add_argument("--shard-count", type=int, default=1, help="Number of hosts sharing the run")
+
+    def handle(self, *args, **options):
+        try:
+            month = parse_month(options["month"])
+        except ValueError as e:
+            raise CommandError(e)
+        workers, index, count = options["workers"], options["shard_index"], options["shard_count"]
+        if workers < 1 or options["partition_size"] < 1 or count < 1 or not 0 <= index < count:
+            raise CommandError("Need --workers >= 1, --partition-size >= 1 and 0 <= --shard-index < --shard-count")
+
+        started = time.perf_counter()
+        partitions = list(billing_partitions(options["partition_size"]))[index::count]
+        self.stdout.write(f"Billing {month:%Y-%m}: {len(partitions)} partition(s), {workers} worker(s)")
+
+        if workers == 1:
+            created = 0
+            for lo, hi, n in bill_month(month, partitions):
+                created += n
+                self.stdout.write(f"customers {lo}-{hi}: {n} new bills ({time.perf_counter() - started:.1f}s)")
+        else:
+            # Worker w takes every w-th partition so ranges never overlap
+            args_list = [(month, partitions[w::workers], f"billing[{w}/{workers}]") for w in range(workers)]
+            exit_codes = run_workers(_billing_worker, args_list)
+            if any(exit_codes):
+                raise CommandError(f"Billing workers failed (exit codes {exit_codes}); re-run to finish")
+            created = None
+
+        totals = Bill.objects.filter(month=month).aggregate(n=Count("id"), amount=Sum("amount"))
+        summary = f"{created} bills created, " if created is not None else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary}{totals['n'] or 0} bills for {month:%Y-%m} totalling {totals['amount'] or 0} "
+            f"in {time.perf_counter() - started:.1f}s"
+        ))
@@ -1,9 +1,122 @@
-from django.core.management.base import BaseCommand
-from core.alert_rules import evaluate_device_rules
+import logging
+import threading
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from core.alert_rules import evaluate_device_rules, shard_devices, shard_label
+from core.daemon import install_stop_handlers, run_loop, run_workers
+from core.heartbeat import HeartbeatDeadlines
+from core.models import Device
+
+logger = logging.getLogger("core.rules")
+
+
+def _format(r):
+    return (
+        f"{r['rule']:<18} matched={r['matched']:<8} created={r['created']:<8} "
+        f"updated={r['updated']:<8} suppressed={r['suppressed']:<8} {r['seconds'] * 1000:.1f} ms"
+    )
+
+
+def _load_heartbeats(shard):
+    devices = Device.objects.all() if shard is None else shard_devices(Device.objects.all(), shard)
+    return HeartbeatDeadlines.from_db(devices)
+
+
+def _rules_worker(stop, interval, window, incremental, shard, engine):
+    """
+    One daemon worker: evaluate its shard every `interval` seconds.
+    Incremental workers keep heartbeat deadlines in memory, rebuilt from the DB
+    at startup and after a failed cycle.
+    """
+    name = "rules" if shard is None else f"rules[{shard_label(shard)}]"
+    heartbeats = None
+
+    def step():
+        nonlocal heartbeats
+        if incremental and heartbeats is None:
+            heartbeats = _load_heartbeats(shard)
+            logger.info("%s tracking %d heartbeat deadlines", name, len(heartbeats))
+        try:
+            results = evaluate_device_rules(
+                window=window, incremental=incremental, shard=shard, heartbeats=heartbeats, engine=engine,
+            )
+        except Exception:
+            heartbeats = None
+            raise
+        for r in results:
+            logger.debug("%s %s", name, _format(r))
+        logger.info(
+            "%s created=%d updated=%d",
+            name, sum(r["created"] for r in results), sum(r["updated"] for r in results),
+        )
+
+    run_loop(step, interval, stop, name=name)
+
 
 class Command(BaseCommand):
     help = "Evaluate device rules and create alerts"
 
-    def handle(self, *args, **kwargs):
-        alerts = evaluate_device_rules()
-        self.stdout.write(self.style.SUCCESS(f"Created {len(alerts)} alerts"))
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--suppress-minutes", type=int, default=None,
+            help="Suppression window for re-alerting (default: settings.ALERT_SUPPRESSION_MINUTES)",
+        )
+        parser.add_argument(
+            "--incremental", action="store_true",
+            help="Only re-check devices changed since the last incremental run",
+        )
+        parser.add_argument(
+            "--engine", choices=["numpy", "sql"], default="numpy",
+            help="numpy: load device columns once and evaluate rules as masks; sql: one query per rule",
+        )
+        parser.add_argument(
+            "--daemon", action="store_true",
+            help="Stay resident and re-evaluate every --interval seconds",
+        )
+        parser.add_argument("--interval", type=float, default=60, help="Seconds between daemon cycles")
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="Daemon worker processes, each owning a slice of this host's shard",
+        )
+        parser.add_argument("--shard-index", type=int, default=0, help="This host's shard (0-based)")
+        parser.add_argument("--shard-count", type=int, default=1, help="Number of hosts sharing the fleet")
+
+    def handle(self, *args, **options):
+        window = None
+        if options["suppress_minutes"] is not None:
+            window = timedelta(minutes=options["suppress_minutes"])
+
+        workers, index, count = options["workers"], options["shard_index"], options["shard_count"]
+        if workers < 1 or count < 1 or not 0 <= index < count:
+            raise CommandError("Need --workers >= 1 and 0 <= --shard-index < --shard-count")
+
+        # Host shard i of n (id % n == i), split again between this host's workers only:
+        # the host's share doesn't depend on the --workers of any other host
+        if workers > 1:
+            shards = [(index, count, w, workers) for w in range(workers)]
+        else:
+            shards = [(index, count) if count > 1 else None]
+
+        if options["daemon"]:
+            self.stdout.write(f"Rule daemon: {len(shards)} worker(s), every {options['interval']}s")
+            args_list = [(options["interval"], window, options["incremental"], s, options["engine"]) for s in shards]
+            if len(args_list) == 1:
+                stop = threading.Event()
+                install_stop_handlers(stop)
+                _rules_worker(stop, *args_list[0])
+            else:
+                run_workers(_rules_worker, args_list)
+            self.stdout.write(self.style.SUCCESS("Rule daemon stopped"))
+            return
+
+        results = []
+        for shard in shards:
+            results += evaluate_device_rules(
+                window=window, incremental=options["incremental"], shard=shard, engine=options["engine"],
+            )
+        for r in results:
+            self.stdout.write(_format(r))
+        total = sum(r["created"] for r in results)
+        updated = sum(r["updated"] for r in results)
+        self.stdout.write(self.style.SUCCESS(f"Created {total} alerts, updated {updated} open alerts"))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+from core.churn import SCORE_CHUNK_SIZE, score_customers
+
+
+class Command(BaseCommand):
+    help = "Score churn for every customer into the ChurnScore table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=SCORE_CHUNK_SIZE, help="Customers per chunk")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = 0
+        for scored in score_customers(chunk_size=options["chunk_size"]):
+            total += scored
+            self.stdout.write(f"Scored {total} customers ({time.perf_counter() - started:.1f}s)")
+        self.stdout.write(self.style.SUCCESS(f"Scored {total} customers"))
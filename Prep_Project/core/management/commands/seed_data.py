@@ -1,9 +1,9 @@
 from django.core.management.base import BaseCommand
+from core.billing import bill_partition, billing_partitions
 from core.models import Site, Device, InventoryItem, Plan, Customer, Subscription, UsageEvent, Alert, Bill
 from django.utils import timezone
 import random
 import datetime
-from django.db.models import Sum
 
 class Command(BaseCommand):
     help = "Seed database with sample data"
@@ -49,11 +49,8 @@ class Command(BaseCommand):
         ]
 
         # Subscriptions
-        subs = [
-            Subscription.objects.create(customer=customers[0], plan=plan_basic),
-            Subscription.objects.create(customer=customers[1], plan=plan_premium),
-            Subscription.objects.create(customer=customers[2], plan=plan_ultra),
-        ]
+        for customer, plan in zip(customers, (plan_basic, plan_premium, plan_ultra)):
+            Subscription.objects.create(customer=customer, plan=plan)
 
         # Usage Events (last 5 days)
         today = timezone.now().date()
@@ -71,27 +68,19 @@ class Command(BaseCommand):
         Alert.objects.create(severity="info", type="CUSTOMER_COMPLAINT", message="Customer John Doe filed a complaint", customer=customers[2])
         
 
-        # Bills
-        for sub in subs:
-            cust = sub.customer
-            # sum of usage in last 30 days
-            usage_total = UsageEvent.objects.filter(customer=cust).aggregate(total=Sum("gb_used"))["total"] or 0
-            usage_charge = usage_total * 10  # e.g., ₹10 per GB
-            amount = sub.plan.monthly_price + usage_charge
+        # Bills: this month from usage, like run_billing
+        this_month = today.replace(day=1)
+        for lo, hi in billing_partitions():
+            bill_partition(this_month, lo, hi)
 
-            Bill.objects.create(
-                customer=cust,
-                month=today.replace(day=1),
-                amount=round(amount, 2),
-                status="unpaid"
-            )
-            
         # Bills
-        for cust in customers:
-            for i in range(3):  # last 3 months bills
+        month = this_month
+        for i in range(1, 3):  # previous 2 months bills
+            month = (month - datetime.timedelta(days=1)).replace(day=1)
+            for cust in customers:
                 Bill.objects.create(
                     customer=cust,
-                    month=(today.replace(day=1) - datetime.timedelta(days=30*i)),
+                    month=month,
                     amount=random.choice([499, 999, 1999]),
                     status=random.choice(["paid", "unpaid"])
                 )
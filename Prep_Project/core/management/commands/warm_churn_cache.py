@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.churn import SCORE_CHUNK_SIZE, churn_payload, feature_frame, score_frame, store_scores
+from core.churn_cache import get_churn_versions, is_current, set_many_churn
+from core.models import ChurnScore, Customer
+
+
+class Command(BaseCommand):
+    help = "Load churn results for every customer into the cache (scores missing or outdated ChurnScore rows first)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=SCORE_CHUNK_SIZE, help="Customers per chunk")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        chunk_size = options["chunk_size"]
+        total = scored = 0
+        last_id = 0
+        while True:
+            customers = list(
+                Customer.objects.filter(id__gt=last_id).order_by("id")
+                .only("id", "name", "city")[:chunk_size]
+            )
+            if not customers:
+                break
+            last_id = customers[-1].id
+            versions = get_churn_versions([c.id for c in customers])
+            scores = {
+                cid: score
+                for cid, score, scored_at in ChurnScore.objects.filter(
+                    customer_id__gte=customers[0].id, customer_id__lte=last_id
+                ).values_list("customer_id", "score", "scored_at")
+                if is_current(scored_at, versions[cid])
+            }
+
+            # Customers never scored, or whose usage changed since the last score_churn run
+            missing = [c.id for c in customers if c.id not in scores]
+            if missing:
+                read_at = timezone.now()
+                frame = feature_frame(Customer.objects.filter(id__in=missing))
+                frame["score"], _ = score_frame(frame)
+                store_scores(frame, read_at)
+                scores.update(zip(frame["id"].tolist(), frame["score"].tolist()))
+                scored += len(missing)
+
+            set_many_churn({c.id: churn_payload(c, scores[c.id]) for c in customers}, versions)
+            total += len(customers)
+            self.stdout.write(f"Cached {total} customers ({time.perf_counter() - started:.1f}s)")
+
+        self.stdout.write(self.style.SUCCESS(f"Cached {total} customers, {scored} scored live"))
@@ -0,0 +1,258 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import DeviceMetric, DeviceMetricRollup, Watermark
+
+RAW = 0
+FIVE_MINUTES = 300
+HOURLY = 3600
+BULK_BATCH_SIZE = 1000
+
+# Compaction reads one slice of the timeline at a time to bound memory
+COMPACTION_SLICE = timedelta(hours=1)
+# Buckets are only compacted once they are this far in the past, so late points still land
+COMPACTION_LAG = timedelta(minutes=5)
+
+
+def retention():
+    """How long each resolution is kept: {resolution: timedelta}"""
+    return {
+        RAW: timedelta(days=getattr(settings, "METRIC_RAW_RETENTION_DAYS", 7)),
+        FIVE_MINUTES: timedelta(days=getattr(settings, "METRIC_5M_RETENTION_DAYS", 30)),
+        HOURLY: timedelta(days=getattr(settings, "METRIC_HOURLY_RETENTION_DAYS", 365)),
+    }
+
+
+def _floor(ts, seconds):
+    epoch = int(ts.timestamp()) // seconds * seconds
+    return datetime.fromtimestamp(epoch, tz=dt_timezone.utc)
+
+
+def record_metrics(points):
+    """
+    Append (device_id, ts, temp_c) points in bulk.
+    Uses one executemany INSERT rather than bulk_create so the telemetry hot path
+    does not instantiate a model per point. Points behind a compaction watermark
+    are also merged into the buckets already written for them (see merge_late_points).
+    """
+    points = list(points)
+    ops = connection.ops
+    params = [(d, ops.adapt_datetimefield_value(ts), t) for d, ts, t in points]
+    if not params:
+        return 0
+    table = ops.quote_name(DeviceMetric._meta.db_table)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.executemany(f"INSERT INTO {table} (device_id, ts, temp_c) VALUES (%s, %s, %s)", params)
+        merge_late_points(points)
+    return len(params)
+
+
+def merge_late_points(points):
+    """
+    Compaction never revisits a bucket behind its watermark, so fold late points into
+    those buckets directly: min/max/samples and the samples-weighted average merge
+    exactly, and the arithmetic runs in the upsert so concurrent writers don't race.
+    """
+    marks = dict(
+        Watermark.objects.filter(key__in=[f"metrics:{r}" for r in (FIVE_MINUTES, HOURLY)])
+        .values_list("key", "value")
+    )
+    rows = []
+    for resolution in (FIVE_MINUTES, HOURLY):
+        done = marks.get(f"metrics:{resolution}")
+        if done is None:
+            continue
+        late = [(d, ts, t, t, t, 1) for d, ts, t in points if _floor(ts, resolution) < done]
+        rows += _rollup_rows(late, resolution)
+    if not rows:
+        return 0
+
+    ops = connection.ops
+    table = ops.quote_name(DeviceMetricRollup._meta.db_table)
+    params = [
+        (r.device_id, r.resolution, ops.adapt_datetimefield_value(r.bucket), r.temp_min, r.temp_max, r.temp_avg, r.samples)
+        for r in rows
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table} (device_id, resolution, bucket, temp_min, temp_max, temp_avg, samples) "
+            f"VALUES (%s, %s, %s, %s, %s, %s, %s) "
+            f"ON CONFLICT (device_id, resolution, bucket) DO UPDATE SET "
+            f"temp_min = CASE WHEN {table}.temp_min IS NULL OR excluded.temp_min < {table}.temp_min "
+            f"THEN excluded.temp_min ELSE {table}.temp_min END, "
+            f"temp_max = CASE WHEN {table}.temp_max IS NULL OR excluded.temp_max > {table}.temp_max "
+            f"THEN excluded.temp_max ELSE {table}.temp_max END, "
+            f"temp_avg = CASE WHEN excluded.temp_avg IS NULL THEN {table}.temp_avg "
+            f"WHEN {table}.temp_avg IS NULL THEN excluded.temp_avg "
+            f"ELSE ({table}.temp_avg * {table}.samples + excluded.temp_avg * excluded.samples) "
+            f"/ ({table}.samples + excluded.samples) END, "
+            f"samples = {table}.samples + excluded.samples",
+            params,
+        )
+    return len(params)
+
+
+# ----- Compaction -----
+
+def _rollup_rows(rows, resolution):
+    """
+    Fold (device_id, ts, min, max, avg, samples) rows into buckets of `resolution` seconds.
+    Averages are weighted by samples so 5-minute buckets merge into exact hourly ones.
+    """
+    buckets = {}
+    for device_id, ts, lo, hi, avg, n in rows:
+        key = (device_id, int(ts.timestamp()) // resolution * resolution)
+        b = buckets.setdefault(key, [None, None, 0.0, 0, 0])  # min, max, weighted sum, weight, samples
+        b[4] += n
+        if avg is None:
+            continue  # heartbeat without a temperature
+        b[0] = lo if b[0] is None else min(b[0], lo)
+        b[1] = hi if b[1] is None else max(b[1], hi)
+        b[2] += avg * n
+        b[3] += n
+
+    return [
+        DeviceMetricRollup(
+            device_id=device_id, resolution=resolution,
+            bucket=datetime.fromtimestamp(epoch, tz=dt_timezone.utc),
+            temp_min=lo, temp_max=hi,
+            temp_avg=(total / weight) if weight else None,
+            samples=n,
+        )
+        for (device_id, epoch), (lo, hi, total, weight, n) in buckets.items()
+    ]
+
+
+def _source_rows(source, start, end):
+    if source == RAW:
+        rows = DeviceMetric.objects.filter(ts__gte=start, ts__lt=end).values_list("device_id", "ts", "temp_c")
+        return ((d, ts, t, t, t, 1) for d, ts, t in rows.iterator(chunk_size=5000))
+    rows = DeviceMetricRollup.objects.filter(resolution=source, bucket__gte=start, bucket__lt=end).values_list(
+        "device_id", "bucket", "temp_min", "temp_max", "temp_avg", "samples"
+    )
+    return rows.iterator(chunk_size=5000)
+
+
+def _compacted_until(resolution):
+    mark = Watermark.objects.filter(key=f"metrics:{resolution}").first()
+    return mark.value if mark else None
+
+
+def _compact_level(source, resolution, now):
+    """Downsample `source` into `resolution` buckets from the level's watermark up to now - lag"""
+    key = f"metrics:{resolution}"
+    end = _floor(now - COMPACTION_LAG, resolution)
+    if source != RAW:
+        # Only roll up what the finer level has finished compacting
+        source_done = _compacted_until(source)
+        if source_done is None:
+            return 0
+        end = min(end, _floor(source_done, resolution))
+    mark = Watermark.objects.filter(key=key).first()
+    if mark is not None:
+        start = mark.value
+    else:
+        oldest = (
+            DeviceMetric.objects.order_by("ts").values_list("ts", flat=True).first()
+            if source == RAW else
+            DeviceMetricRollup.objects.filter(resolution=source).order_by("bucket").values_list("bucket", flat=True).first()
+        )
+        if oldest is None:
+            return 0
+        start = _floor(oldest, resolution)
+
+    written = 0
+    while start < end:
+        stop = min(start + max(COMPACTION_SLICE, timedelta(seconds=resolution)), end)
+        rollups = _rollup_rows(_source_rows(source, start, stop), resolution)
+        with transaction.atomic():
+            DeviceMetricRollup.objects.bulk_create(
+                rollups, batch_size=BULK_BATCH_SIZE,
+                update_conflicts=True, unique_fields=["device", "resolution", "bucket"],
+                update_fields=["temp_min", "temp_max", "temp_avg", "samples"],
+            )
+            Watermark.advance(key, stop)
+        written += len(rollups)
+        start = stop
+    return written
+
+
+def apply_retention(now):
+    """Drop data past each resolution's horizon; raw/5-minute points are kept until compacted"""
+    horizons = retention()
+    deleted = {}
+
+    raw_cutoff = now - horizons[RAW]
+    compacted = _compacted_until(FIVE_MINUTES)
+    raw_cutoff = min(raw_cutoff, compacted) if compacted else None
+    deleted[RAW] = DeviceMetric.objects.filter(ts__lt=raw_cutoff).delete()[0] if raw_cutoff else 0
+
+    five_cutoff = now - horizons[FIVE_MINUTES]
+    compacted = _compacted_until(HOURLY)
+    five_cutoff = min(five_cutoff, compacted) if compacted else None
+    deleted[FIVE_MINUTES] = (
+        DeviceMetricRollup.objects.filter(resolution=FIVE_MINUTES, bucket__lt=five_cutoff).delete()[0]
+        if five_cutoff else 0
+    )
+
+    deleted[HOURLY] = DeviceMetricRollup.objects.filter(
+        resolution=HOURLY, bucket__lt=now - horizons[HOURLY]
+    ).delete()[0]
+    return deleted
+
+
+def compact_metrics(now=None):
+    """
+    One compaction pass: raw → 5-minute, 5-minute → hourly, then retention.
+    Safe to re-run; buckets are upserted.
+    """
+    now = now or timezone.now()
+    return {
+        "5m_buckets": _compact_level(RAW, FIVE_MINUTES, now),
+        "hourly_buckets": _compact_level(FIVE_MINUTES, HOURLY, now),
+        "deleted": apply_retention(now),
+    }
+
+
+# ----- Range queries -----
+
+def pick_resolution(step):
+    """Coarsest stored resolution that is still at least as fine as the requested step"""
+    for resolution in (HOURLY, FIVE_MINUTES):
+        if step >= resolution:
+            return resolution
+    return RAW
+
+
+LEVELS = (RAW, FIVE_MINUTES, HOURLY)
+
+
+def metric_series(device_id, start, end, step=FIVE_MINUTES, now=None):
+    """
+    Temperature series for one device, read from the coarsest level that satisfies `step`.
+    A range reaching back past a level's retention is served by the next coarser level.
+    """
+    now = now or timezone.now()
+    horizons = retention()
+    resolution = pick_resolution(step)
+    while resolution != HOURLY and start < now - horizons[resolution]:
+        resolution = LEVELS[LEVELS.index(resolution) + 1]
+    if resolution == RAW:
+        rows = DeviceMetric.objects.filter(device_id=device_id, ts__gte=start, ts__lt=end).order_by("ts")
+        points = [
+            {"ts": ts, "min": t, "max": t, "avg": t, "samples": 1}
+            for ts, t in rows.values_list("ts", "temp_c")
+        ]
+    else:
+        rows = DeviceMetricRollup.objects.filter(
+            device_id=device_id, resolution=resolution, bucket__gte=start, bucket__lt=end
+        ).order_by("bucket")
+        points = [
+            {"ts": b, "min": lo, "max": hi, "avg": avg, "samples": n}
+            for b, lo, hi, avg, n in rows.values_list("bucket", "temp_min", "temp_max", "temp_avg", "samples")
+        ]
+    return resolution, points
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:05
+
+from django.db import migrations, models
+from django.db.models import CharField, F, Value
+from django.db.models.functions import Cast, Concat
+
+
+def backfill_fingerprints(apps, schema_editor):
+    Alert = apps.get_model('core', 'Alert')
+    Alert.objects.filter(device__isnull=False).update(
+        fingerprint=Concat('type', Value(':device:'), Cast('device_id', CharField())),
+    )
+    Alert.objects.filter(device__isnull=True, customer__isnull=False).update(
+        fingerprint=Concat('type', Value(':customer:'), Cast('customer_id', CharField())),
+    )
+    Alert.objects.update(last_seen_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_ticket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', max_length=150),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='last_seen_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='occurrences',
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['fingerprint', 'status'], name='alert_fingerprint_idx'),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
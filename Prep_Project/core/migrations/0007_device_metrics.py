@@ -0,0 +1,52 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_device_updated_at_watermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ts', models.DateTimeField()),
+                ('temp_c', models.FloatField(blank=True, null=True)),
+                ('device', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.device')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DeviceMetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.PositiveIntegerField(choices=[(300, '5 minutes'), (3600, '1 hour')])),
+                ('bucket', models.DateTimeField()),
+                ('temp_min', models.FloatField(blank=True, null=True)),
+                ('temp_max', models.FloatField(blank=True, null=True)),
+                ('temp_avg', models.FloatField(blank=True, null=True)),
+                ('samples', models.IntegerField(default=0)),
+                ('device', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.device')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='devicemetric',
+            index=models.Index(fields=['device', 'ts'], name='metric_device_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='devicemetric',
+            index=models.Index(fields=['ts'], name='metric_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='devicemetricrollup',
+            index=models.Index(fields=['resolution', 'bucket'], name='metric_rollup_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='devicemetricrollup',
+            constraint=models.UniqueConstraint(fields=('device', 'resolution', 'bucket'), name='metric_rollup_unique'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_device_metrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChurnScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.IntegerField()),
+                ('avg7', models.FloatField(default=0)),
+                ('avg30', models.FloatField(default=0)),
+                ('scored_at', models.DateTimeField()),
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='churn', to='core.customer')),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_churn_score'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usageevent',
+            index=models.Index(fields=['date'], name='usage_date_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rollup(apps, schema_editor):
+    UsageEvent = apps.get_model('core', 'UsageEvent')
+    DailyUsageRollup = apps.get_model('core', 'DailyUsageRollup')
+    rows = UsageEvent.objects.values('customer_id', 'date').annotate(total=Sum('gb_used'), n=Count('id')).order_by()
+    DailyUsageRollup.objects.bulk_create(
+        (
+            DailyUsageRollup(customer_id=r['customer_id'], date=r['date'], total_gb=r['total'], event_count=r['n'])
+            for r in rows.iterator(chunk_size=5000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_usage_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyUsageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total_gb', models.FloatField(default=0)),
+                ('event_count', models.IntegerField(default=0)),
+                ('customer', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.customer')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='dailyusagerollup',
+            index=models.Index(fields=['date'], name='usage_rollup_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyusagerollup',
+            constraint=models.UniqueConstraint(fields=('customer', 'date'), name='usage_rollup_unique'),
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_daily_usage_rollup'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='usageevent',
+            name='usage_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['-created_at', 'id'], name='alert_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['-month', 'id'], name='bill_month_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usageevent',
+            index=models.Index(fields=['date', 'id'], name='usage_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_pagination_indexes'),
+    ]
+
+    operations = [
+        # New composite indexes first, so the FK indexes they replace are never missing
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['status', '-created_at'], name='alert_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['customer', '-month'], name='bill_customer_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['name', 'city'], name='customer_name_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['customer', 'plan'], name='subscription_customer_plan_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usageevent',
+            index=models.Index(fields=['customer', 'date'], name='usage_customer_date_idx'),
+        ),
+        migrations.AlterField(
+            model_name='bill',
+            name='customer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.customer'),
+        ),
+        migrations.AlterField(
+            model_name='subscription',
+            name='customer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.customer'),
+        ),
+        migrations.AlterField(
+            model_name='usageevent',
+            name='customer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.customer'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:43
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_bills(apps, schema_editor):
+    """
+    Collapse duplicate (customer, month) bills before the constraint goes on. The paid
+    bill is kept if there is one (else the oldest) and only unpaid/overdue duplicates are
+    deleted. Several paid bills for one month are real money records: stop and report them.
+    """
+    Bill = apps.get_model('core', 'Bill')
+    dupes = (
+        Bill.objects.values('customer_id', 'month')
+        .annotate(n=Count('id')).filter(n__gt=1).order_by()
+    )
+    plan, conflicts = [], []
+    for row in dupes.iterator():
+        bills = list(
+            Bill.objects.filter(customer_id=row['customer_id'], month=row['month'])
+            .order_by('id').values_list('id', 'status')
+        )
+        paid = [bill_id for bill_id, status in bills if status == 'paid']
+        if len(paid) > 1:
+            conflicts.append(f"customer {row['customer_id']} {row['month']}: paid bills {paid}")
+            continue
+        keep = paid[0] if paid else bills[0][0]
+        plan.append([bill_id for bill_id, _ in bills if bill_id != keep])
+    if conflicts:
+        raise RuntimeError(
+            "Several paid bills share a customer and month; resolve them by hand, then re-run migrate:\n"
+            + "\n".join(conflicts)
+        )
+    for ids in plan:
+        Bill.objects.filter(id__in=ids).exclude(status='paid').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_bills, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='bill',
+            name='bill_customer_month_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='bill',
+            constraint=models.UniqueConstraint(fields=('customer', 'month'), name='bill_customer_month_uniq'),
+        ),
+    ]
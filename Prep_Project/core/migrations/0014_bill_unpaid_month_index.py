@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_bill_customer_month_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(condition=models.Q(('status', 'unpaid')), fields=['month'], name='bill_unpaid_month_idx'),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 
 # Sites / Locations
 class Site(models.Model):
@@ -28,13 +28,72 @@ class Device(models.Model):
     type = models.CharField(max_length=20, choices=TYPE_CHOICES)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="active")
 
-    last_heartbeat = models.DateTimeField(null=True, blank=True)  # last check-in time
+    last_heartbeat = models.DateTimeField(null=True, blank=True, db_index=True)  # last check-in time
     temp_c = models.FloatField(null=True, blank=True)             # device temp in Celsius
-    eol_date = models.DateField(null=True, blank=True)            # end of life date
+    eol_date = models.DateField(null=True, blank=True, db_index=True)            # end of life date
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # drives incremental rule runs
 
     def __str__(self):
         return f"{self.identifier} ({self.type})"
 
+# Raw device telemetry points, appended in bulk by telemetry ingestion
+class DeviceMetric(models.Model):
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, db_index=False)
+    ts = models.DateTimeField()
+    temp_c = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["device", "ts"], name="metric_device_ts_idx"),  # per-device range reads
+            models.Index(fields=["ts"], name="metric_ts_idx"),                   # compaction / retention sweeps
+        ]
+
+    def __str__(self):
+        return f"{self.device_id} @ {self.ts}: {self.temp_c}C"
+
+
+# Downsampled DeviceMetric buckets (5-minute and hourly min/max/avg)
+class DeviceMetricRollup(models.Model):
+    RESOLUTION_CHOICES = [
+        (300, "5 minutes"),
+        (3600, "1 hour"),
+    ]
+
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, db_index=False)
+    resolution = models.PositiveIntegerField(choices=RESOLUTION_CHOICES)  # bucket width in seconds
+    bucket = models.DateTimeField()                                         # bucket start
+    temp_min = models.FloatField(null=True, blank=True)
+    temp_max = models.FloatField(null=True, blank=True)
+    temp_avg = models.FloatField(null=True, blank=True)
+    samples = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["device", "resolution", "bucket"], name="metric_rollup_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["resolution", "bucket"], name="metric_rollup_bucket_idx"),  # compaction / retention
+        ]
+
+    def __str__(self):
+        return f"{self.device_id} @ {self.bucket} ({self.resolution}s)"
+
+
+# Progress markers for incremental jobs (e.g. "device_rules" → last evaluation time)
+class Watermark(models.Model):
+    key = models.CharField(max_length=100, unique=True)
+    value = models.DateTimeField()
+
+    @classmethod
+    def advance(cls, key, value):
+        # Plain UPDATE first: no read-then-write transaction for concurrent workers to deadlock on
+        if not cls.objects.filter(key=key).update(value=value):
+            cls.objects.bulk_create([cls(key=key, value=value)], ignore_conflicts=True)
+
+    def __str__(self):
+        return f"{self.key} @ {self.value}"
+
+
 # Inventory items (spare parts, replacements)
 class InventoryItem(models.Model):
     name = models.CharField(max_length=100)
@@ -64,30 +123,142 @@ class Customer(models.Model):
     complaints_last_90d = models.IntegerField(default=0)
     last_recharge_days_ago = models.IntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            # onboard looks customers up by name + city
+            models.Index(fields=["name", "city"], name="customer_name_city_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
 
+# Precomputed churn score per customer (written in bulk by score_churn)
+class ChurnScore(models.Model):
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, related_name="churn")
+    score = models.IntegerField()
+    avg7 = models.FloatField(default=0)    # avg daily GB over the last 7 days
+    avg30 = models.FloatField(default=0)   # avg daily GB over the last 30 days
+    scored_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.customer_id}: {self.score}"
+
+
 # Subscription of a customer to a plan
 class Subscription(models.Model):
-    customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, db_index=False)  # subscription_customer_plan_idx
     plan = models.ForeignKey(Plan, on_delete=models.PROTECT)
     start_date = models.DateField(auto_now_add=True)
     status = models.CharField(max_length=20, default="active")
 
+    class Meta:
+        indexes = [
+            # Subscriptions of a customer; onboard's duplicate check adds the plan
+            models.Index(fields=["customer", "plan"], name="subscription_customer_plan_idx"),
+        ]
+
     def __str__(self):
         return f"{self.customer.name} → {self.plan.name}"
 
 
+# Bulk paths bypass model signals, so they maintain DailyUsageRollup themselves
+class UsageEventQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        from .signals import mark_churn_stale
+        from .usage_rollup import apply_usage_deltas
+
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            apply_usage_deltas((e.customer_id, e.date, e.gb_used, 1) for e in created)
+        mark_churn_stale(e.customer_id for e in created)
+        return created
+
+    def update(self, **kwargs):
+        from .signals import mark_churn_stale
+        from .usage_rollup import apply_usage_deltas
+
+        if not {"customer", "customer_id", "date", "gb_used"} & kwargs.keys():
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            ids = list(self.values_list("pk", flat=True))
+            before = list(UsageEvent.objects.filter(pk__in=ids).values_list("customer_id", "date", "gb_used"))
+            rows = super().update(**kwargs)
+            after = list(UsageEvent.objects.filter(pk__in=ids).values_list("customer_id", "date", "gb_used"))
+            apply_usage_deltas(
+                [(c, d, -gb, -1) for c, d, gb in before] + [(c, d, gb, 1) for c, d, gb in after]
+            )
+        mark_churn_stale([c for c, _, _ in before] + [c for c, _, _ in after])
+        return rows
+
+    def delete(self):
+        from .signals import mark_churn_stale
+        from .usage_rollup import apply_usage_deltas
+
+        # One grouped read and one rollup upsert for the whole delete; with no delete
+        # signals on UsageEvent the rows themselves go in a single fast DELETE
+        with transaction.atomic(using=self.db):
+            totals = list(
+                self.values_list("customer_id", "date").annotate(gb=models.Sum("gb_used"), n=models.Count("id")).order_by()
+            )
+            deleted = super().delete()
+            apply_usage_deltas((c, d, -gb, -n) for c, d, gb, n in totals)
+        mark_churn_stale(c for c, _, _, _ in totals)
+        return deleted
+
+
 # Usage data (e.g., daily data consumption in GB)
 class UsageEvent(models.Model):
-    customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, db_index=False)  # usage_customer_date_idx
     date = models.DateField()
     gb_used = models.FloatField()
 
+    objects = UsageEventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Usage-by-date range scans and the API's (date, id) keyset pagination
+            models.Index(fields=["date", "id"], name="usage_date_id_idx"),
+            # Per customer day ranges (rollup rebuilds, history)
+            models.Index(fields=["customer", "date"], name="usage_customer_date_idx"),
+        ]
+
     def __str__(self):
         return f"{self.customer.name} - {self.date} - {self.gb_used} GB"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What DailyUsageRollup counts for this event (None when deferred; see signals.usage_origin)
+        stored = tuple(instance.__dict__.get(f) for f in ("customer_id", "date", "gb_used"))
+        instance._rollup_origin = None if None in stored else stored
+        return instance
+
+    def delete(self, using=None, keep_parents=False):
+        # Through the queryset, which keeps DailyUsageRollup current
+        deleted = type(self).objects.using(using or self._state.db).filter(pk=self.pk).delete()
+        self.pk = self._rollup_origin = None  # as Model.delete leaves it
+        return deleted
+
+
+# Per customer per day usage totals, kept current on every UsageEvent write
+class DailyUsageRollup(models.Model):
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, db_index=False)
+    date = models.DateField()
+    total_gb = models.FloatField(default=0)
+    event_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["customer", "date"], name="usage_rollup_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["date"], name="usage_rollup_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_id} - {self.date} - {self.total_gb} GB"
+
 
 # Alerts (generated when devices/customers need attention)
 class Alert(models.Model):
@@ -105,6 +276,20 @@ class Alert(models.Model):
     status = models.CharField(max_length=20, default="open")  # open/acknowledged/closed
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Dedup: one open alert per fingerprint (rule type + device/customer)
+    fingerprint = models.CharField(max_length=150, blank=True, default="")
+    occurrences = models.IntegerField(default=1)                 # times the condition fired
+    last_seen_at = models.DateTimeField(null=True, blank=True)   # last time the condition fired
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["fingerprint", "status"], name="alert_fingerprint_idx"),
+            # API keyset pagination, newest first
+            models.Index(fields=["-created_at", "id"], name="alert_created_id_idx"),
+            # Open alerts, newest first (dashboard, alert lists)
+            models.Index(fields=["status", "-created_at"], name="alert_status_created_idx"),
+        ]
+
     def __str__(self):
         return f"[{self.severity}] {self.type}"
 
@@ -116,11 +301,24 @@ class Bill(models.Model):
         ("overdue", "Overdue"),
     ]
 
-    customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, db_index=False)  # bill_customer_month_uniq
     month = models.DateField()  # first day of the billing month
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="unpaid")
 
+    class Meta:
+        indexes = [
+            # API keyset pagination, latest month first
+            models.Index(fields=["-month", "id"], name="bill_month_id_idx"),
+            # Bill aging: only unpaid bills, so age_bills never walks paid history
+            models.Index(fields=["month"], name="bill_unpaid_month_idx", condition=models.Q(status="unpaid")),
+        ]
+        constraints = [
+            # One bill per customer and month (run_billing relies on it); also serves
+            # a customer's bills, latest first
+            models.UniqueConstraint(fields=["customer", "month"], name="bill_customer_month_uniq"),
+        ]
+
     def __str__(self):
         return f"Bill for {self.customer.name} - {self.month.strftime('%B %Y')} ({self.status})"
 
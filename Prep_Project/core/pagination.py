@@ -0,0 +1,133 @@
+import json
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _positive_int, _reverse_ordering
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination over a composite ordering such as ("-created_at", "id").
+
+    The view declares `cursor_ordering` (backed by an index, last field unique) and may
+    set `cursor_page_size`; an allowlisted ?ordering= (see core.filters) overrides it. The cursor carries the last row's value for every ordering
+    field and the next page is a row-value comparison, so a deep page is the same
+    index seek as the first one, unlike OFFSET paging.
+    Clients pick a page size with ?page_size= (up to max_page_size).
+    """
+    ordering = ("id",)
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+    def get_ordering(self, request, queryset, view):
+        # ?ordering= from a filter backend (AllowlistFilterBackend), else the view's default
+        ordering = None
+        for backend in getattr(view, "filter_backends", []):
+            if hasattr(backend, "get_ordering"):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering:
+                    break
+        ordering = tuple(ordering or getattr(view, "cursor_ordering", self.ordering))
+        # NULLs never satisfy the row-value comparison, so they would drop out of pages
+        for order in ordering:
+            if queryset.model._meta.get_field(order.lstrip("-")).null:
+                raise ImproperlyConfigured(f"Keyset ordering field {order!r} is nullable")
+        return ordering
+
+    def get_page_size(self, request, view=None):
+        default = getattr(view, "cursor_page_size", None) or self.page_size
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param], strict=True, cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return default
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            name = order.lstrip("-")
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(str(value))
+        return json.dumps(values)
+
+    def _keyset_filter(self, queryset, position, reverse):
+        """Rows strictly after `position` in the (possibly reversed) ordering"""
+        values = json.loads(position)
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        if len(values) != len(ordering):
+            raise ValueError("cursor does not match the ordering")
+
+        # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y), expanded per field
+        after = Q()
+        equal = Q()
+        for order, value in zip(ordering, values):
+            name = order.lstrip("-")
+            lookup = "__lt" if order.startswith("-") else "__gt"
+            after |= equal & Q(**{name + lookup: value})
+            equal &= Q(**{name: value})
+
+        # Redundant bound on the leading column so the planner can seek the index
+        first = ordering[0].lstrip("-")
+        bound = "__lte" if ordering[0].startswith("-") else "__gte"
+        return queryset.filter(Q(**{first + bound: values[0]}) & after)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Same flow as CursorPagination, with the single-field position filter
+        # replaced by the composite keyset comparison
+        self.request = request
+        self.page_size = self.get_page_size(request, view)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            try:
+                queryset = self._keyset_filter(queryset, current_position, reverse)
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
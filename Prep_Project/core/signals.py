@@ -0,0 +1,47 @@
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from .churn_cache import invalidate_churn
+from .models import Customer, UsageEvent
+from .usage_rollup import apply_usage_deltas
+
+USAGE_FIELDS = ("customer_id", "date", "gb_used")
+
+# UsageEvent has no delete receivers on purpose: they would turn off Django's fast delete
+# and load every row of a queryset or cascade delete. Deletes adjust DailyUsageRollup in
+# UsageEventQuerySet.delete (UsageEvent.delete goes through it), and a customer's delete
+# cascades to its rollup rows.
+
+
+def mark_churn_stale(customer_ids):
+    """
+    Churn inputs changed: invalidate cached results. Cache-only, so usage writes pay no
+    extra query; ChurnScore rows scored before the change are skipped by readers
+    (churn_cache.is_current) until score_churn or a live score replaces them.
+    """
+    invalidate_churn(customer_ids)
+
+
+@receiver(post_save, sender=Customer)
+def customer_saved(sender, instance, created, **kwargs):
+    if not created:
+        mark_churn_stale([instance.id])
+
+
+@receiver(pre_save, sender=UsageEvent)
+def usage_origin(sender, instance, **kwargs):
+    # Not loaded from the database, or partially (.only()/.defer()): read the stored values once
+    if instance.pk is not None and getattr(instance, "_rollup_origin", None) is None:
+        instance._rollup_origin = sender.objects.filter(pk=instance.pk).values_list(*USAGE_FIELDS).first()
+
+
+@receiver(post_save, sender=UsageEvent)
+def usage_saved(sender, instance, created, **kwargs):
+    current = (instance.customer_id, instance.date, instance.gb_used)
+    origin = None if created else getattr(instance, "_rollup_origin", None)
+    if origin is None:
+        apply_usage_deltas([(*current, 1)])
+    elif origin != current:
+        apply_usage_deltas([(origin[0], origin[1], -origin[2], -1), (*current, 1)])
+    instance._rollup_origin = current
+    mark_churn_stale([instance.customer_id] + ([origin[0]] if origin else []))
@@ -0,0 +1,125 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .metrics import record_metrics
+from .models import Device
+
+MAX_TELEMETRY_RECORDS = 10_000
+
+
+def _parse_ts(value):
+    """ISO-8601 string or epoch seconds → aware datetime (None if unparseable)"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+        except (OverflowError, ValueError, OSError):  # out of datetime's range, or NaN
+            return None
+    if isinstance(value, str):
+        try:
+            ts = parse_datetime(value)
+        except ValueError:
+            return None
+        if ts is not None and timezone.is_naive(ts):
+            ts = timezone.make_aware(ts, dt_timezone.utc)
+        return ts
+    return None
+
+
+def _parse_record(record):
+    """Returns (identifier, ts, temp_c, error)"""
+    if not isinstance(record, dict):
+        return None, None, None, "record must be an object"
+    identifier = record.get("identifier")
+    if not isinstance(identifier, str) or not identifier:
+        return None, None, None, "identifier required"
+    ts = _parse_ts(record.get("ts"))
+    if ts is None:
+        return identifier, None, None, "ts must be ISO-8601 or epoch seconds"
+    temp_c = record.get("temp_c")
+    if temp_c is not None:
+        if isinstance(temp_c, bool) or not isinstance(temp_c, (int, float)):
+            return identifier, None, None, "temp_c must be a number"
+        temp_c = float(temp_c)
+    return identifier, ts, temp_c, None
+
+
+def ingest_telemetry(records):
+    """
+    Apply a batch of {identifier, ts, temp_c} heartbeats in bulk.
+    Identifiers are resolved in one query and devices are written in one batched UPDATE;
+    every valid point of a known device is also appended to the DeviceMetric history.
+    Per identifier only the newest record is applied; records older than the device's
+    current heartbeat are reported as stale.
+    Returns one {"identifier", "status"[, "error"]} per input record, in order.
+    Statuses: ok, stale, unknown_device, invalid.
+    """
+    results = [None] * len(records)
+    latest = {}  # identifier -> (index, ts, temp_c)
+    points = []  # every valid (identifier, ts, temp_c), for the metric history
+
+    for i, record in enumerate(records):
+        identifier, ts, temp_c, error = _parse_record(record)
+        if error:
+            results[i] = {"identifier": identifier, "status": "invalid", "error": error}
+            continue
+        points.append((identifier, ts, temp_c))
+        current = latest.get(identifier)
+        if current is None or ts >= current[1]:
+            if current is not None:
+                results[current[0]] = {"identifier": identifier, "status": "stale"}
+            latest[identifier] = (i, ts, temp_c)
+        else:
+            results[i] = {"identifier": identifier, "status": "stale"}
+
+    devices = Device.objects.filter(identifier__in=list(latest)).values_list(
+        "id", "identifier", "last_heartbeat"
+    )
+    updates = []
+    device_ids = {}
+    for device_id, identifier, last_heartbeat in devices:
+        device_ids[identifier] = device_id
+        i, ts, temp_c = latest.pop(identifier)
+        if last_heartbeat is not None and ts < last_heartbeat:
+            results[i] = {"identifier": identifier, "status": "stale"}
+            continue
+        updates.append((device_id, ts, temp_c))
+        results[i] = {"identifier": identifier, "status": "ok"}
+
+    for identifier, (i, _, _) in latest.items():
+        results[i] = {"identifier": identifier, "status": "unknown_device"}
+
+    bulk_update_heartbeats(updates)
+    record_metrics((device_ids[ident], ts, temp_c) for ident, ts, temp_c in points if ident in device_ids)
+    return results
+
+
+def bulk_update_heartbeats(updates):
+    """
+    Write (device_id, last_heartbeat, temp_c) rows in one transaction.
+    A None temp_c keeps the stored temperature, and a heartbeat older than the stored
+    one (a concurrent writer got there first) is not applied. updated_at is bumped so
+    incremental rule runs pick the devices up.
+
+    This is a single parameterised UPDATE run through executemany. Django's
+    bulk_update builds a CASE expression per row and spends most of its time
+    resolving them, which tops out around 1.5k rows/sec.
+    """
+    if not updates:
+        return 0
+    ops = connection.ops
+    table = ops.quote_name(Device._meta.db_table)
+    sql = (
+        f"UPDATE {table} SET last_heartbeat = %s, temp_c = COALESCE(%s, temp_c), updated_at = %s "
+        f"WHERE id = %s AND (last_heartbeat IS NULL OR last_heartbeat <= %s)"
+    )
+    now = ops.adapt_datetimefield_value(timezone.now())
+    params = []
+    for device_id, ts, temp_c in updates:
+        ts = ops.adapt_datetimefield_value(ts)
+        params.append((ts, temp_c, now, device_id, ts))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+    return len(updates)
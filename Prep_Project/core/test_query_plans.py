@@ -0,0 +1,81 @@
+import re
+from datetime import date, timedelta
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from .models import Alert, Bill, Customer, DailyUsageRollup, Device, Subscription, UsageEvent
+
+# "SCAN core_alert" on its own is a full table scan; "SCAN ... USING INDEX" walks a whole
+# index, and "USE TEMP B-TREE" sorts in memory. Hot paths may do none of these.
+FULL_SCAN = re.compile(r"\bSCAN (\w+)(?! USING)")
+WHOLE_INDEX_SCAN = re.compile(r"\bSCAN \w+ USING (COVERING )?INDEX")
+TEMP_SORT = "USE TEMP B-TREE"
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite specific")
+class HotQueryPlanTests(TestCase):
+    """Each hot query must be an index SEARCH; a regression to a scan or a sort fails here"""
+
+    def assertSearches(self, queryset, index=None):
+        plan = queryset.explain()
+        self.assertNotRegex(plan, FULL_SCAN, f"full table scan:\n{plan}")
+        self.assertNotRegex(plan, WHOLE_INDEX_SCAN, f"whole index scan:\n{plan}")
+        self.assertNotIn(TEMP_SORT, plan, f"in-memory sort:\n{plan}")
+        if index:
+            self.assertIn(index, plan)
+
+    def test_usage_by_customer_and_date(self):
+        today = date.today()
+        self.assertSearches(
+            UsageEvent.objects.filter(customer_id=1, date__range=(today - timedelta(days=30), today)),
+            "usage_customer_date_idx",
+        )
+
+    def test_usage_page_by_date(self):
+        self.assertSearches(
+            UsageEvent.objects.filter(date__gt=date.today()).order_by("date", "id")[:100],
+            "usage_date_id_idx",
+        )
+
+    def test_daily_rollup_by_customer_and_date(self):
+        today = date.today()
+        self.assertSearches(
+            DailyUsageRollup.objects.filter(customer_id=1, date__range=(today - timedelta(days=6), today))
+        )
+
+    def test_open_alerts_newest_first(self):
+        self.assertSearches(
+            Alert.objects.filter(status="open").order_by("-created_at")[:10],
+            "alert_status_created_idx",
+        )
+
+    def test_alert_fingerprint_lookup(self):
+        self.assertSearches(
+            Alert.objects.filter(fingerprint__in=["OVERHEAT:device:1"], status="open"),
+            "alert_fingerprint_idx",
+        )
+
+    def test_customer_bills_latest_first(self):
+        # bill_customer_month_uniq; SQLite names the index of an inline UNIQUE itself
+        self.assertSearches(Bill.objects.filter(customer_id=1).order_by("-month"))
+
+    def test_unpaid_bills_past_cutoff(self):
+        # age_bills' UPDATE reads the partial index of unpaid bills only
+        self.assertSearches(
+            Bill.objects.filter(status="unpaid", month__lt=date.today().replace(day=1)),
+            "bill_unpaid_month_idx",
+        )
+
+    def test_subscription_by_customer(self):
+        self.assertSearches(Subscription.objects.filter(customer_id=1), "subscription_customer_plan_idx")
+        self.assertSearches(
+            Subscription.objects.filter(customer_id=1, plan_id=1), "subscription_customer_plan_idx"
+        )
+
+    def test_customer_by_name_and_city(self):
+        self.assertSearches(Customer.objects.filter(name="Asha", city="Pune"), "customer_name_city_idx")
+
+    def test_device_by_identifier(self):
+        self.assertSearches(Device.objects.filter(identifier="dev-1"))
@@ -1,3 +1,1255 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import tempfile
+import threading
+from base64 import b64encode
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models.deletion import Collector
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import billing, buffering, churn_model
+from .alert_rules import evaluate_device_rules, shard_devices
+from .billing import OVERDUE_ALERT_TYPE, age_bills, bill_month
+from .buffering import WriteBehindBuffer, get_buffer
+from .churn import churn_score, churn_scores, feature_frame, score_customers, score_frame
+from .churn_cache import get_churn, invalidate_churn, is_current, set_churn
+from .daemon import run_loop
+from .dashboard import DEVICE_PAGE_SIZE, SNAPSHOT_KEY
+from .heartbeat import HeartbeatDeadlines
+from .management.commands import run_rules
+from .telemetry import ingest_telemetry
+from .metrics import FIVE_MINUTES, HOURLY, RAW, apply_retention, compact_metrics, metric_series, record_metrics
+from .pagination import KeysetCursorPagination
+from .models import (
+    Alert, Bill, ChurnScore, Customer, DailyUsageRollup, Device, DeviceMetric, DeviceMetricRollup, InventoryItem, Plan,
+    Site, Subscription, UsageEvent, Watermark,
+)
+from .usage_import import import_usage
+from . import usage_rollup
+from .usage_rollup import check_usage_rollup
+
+
+# No test depends on a churn_model.joblib left in the project: the model path points at
+# an empty temporary directory unless a test trains a model into it.
+_model_dir = tempfile.TemporaryDirectory()
+_model_settings = override_settings(CHURN_MODEL_PATH=Path(_model_dir.name) / "churn_model.joblib")
+
+
+def setUpModule():
+    _model_settings.enable()
+    churn_model.reset_model()
+
+
+def tearDownModule():
+    _model_settings.disable()
+    churn_model.reset_model()
+    _model_dir.cleanup()
+
+
+class HeartbeatDeadlinesTests(SimpleTestCase):
+    def test_pop_expired_returns_devices_past_deadline(self):
+        tracker = HeartbeatDeadlines(timeout=60)
+        tracker.touch(1, 0)
+        tracker.touch(2, 30)
+        tracker.touch(3, 100)
+
+        self.assertEqual(tracker.pop_expired(59), [])
+        self.assertEqual(tracker.pop_expired(91), [1, 2])
+        self.assertEqual(len(tracker), 1)
+        self.assertEqual(tracker.next_deadline(), 160)
+
+    def test_expired_device_is_reported_once(self):
+        tracker = HeartbeatDeadlines(timeout=60)
+        tracker.touch(1, 0)
+        self.assertEqual(tracker.pop_expired(100), [1])
+        self.assertEqual(tracker.pop_expired(200), [])
+
+    def test_new_heartbeat_moves_deadline(self):
+        tracker = HeartbeatDeadlines(timeout=60)
+        tracker.touch(1, 0)
+        tracker.touch(1, 50)
+        self.assertEqual(tracker.pop_expired(100), [])
+        self.assertEqual(tracker.pop_expired(111), [1])
+
+    def test_older_heartbeat_is_ignored(self):
+        tracker = HeartbeatDeadlines(timeout=60)
+        tracker.touch(1, 50)
+        tracker.touch(1, 0)
+        self.assertEqual(tracker.pop_expired(100), [])
+
+    def test_removed_device_never_expires(self):
+        tracker = HeartbeatDeadlines(timeout=60)
+        tracker.touch(1, 0)
+        tracker.remove(1)
+        self.assertNotIn(1, tracker)
+        self.assertEqual(tracker.pop_expired(1000), [])
+
+    def test_heap_stays_bounded_under_repeated_heartbeats(self):
+        tracker = HeartbeatDeadlines(timeout=60)
+        for ts in range(10_000):
+            tracker.touch(1, ts)
+        self.assertLess(len(tracker._heap), 2000)
+        self.assertEqual(tracker.pop_expired(10_058), [])
+        self.assertEqual(tracker.pop_expired(10_060), [1])
+
+
+class HeartbeatDeadlinesFromDbTests(TestCase):
+    def test_from_db_loads_last_heartbeats(self):
+        now = timezone.now()
+        stale = Device.objects.create(identifier="dev-stale", type="CPE", last_heartbeat=now - timedelta(minutes=20))
+        Device.objects.create(identifier="dev-fresh", type="CPE", last_heartbeat=now)
+        Device.objects.create(identifier="dev-never", type="CPE")
+
+        tracker = HeartbeatDeadlines.from_db()
+        self.assertEqual(len(tracker), 2)
+        self.assertEqual(tracker.pop_expired(now), [stale.id])
+
+
+class RuleEngineTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        today = timezone.localdate()
+        Device.objects.bulk_create([
+            Device(identifier="dev-hot", type="CPE", temp_c=85, last_heartbeat=now),
+            Device(identifier="dev-warm", type="CPE", temp_c=72.5, last_heartbeat=now),
+            Device(identifier="dev-edge", type="CPE", temp_c=80, last_heartbeat=now - timedelta(minutes=14)),
+            Device(identifier="dev-silent", type="ROUTER", last_heartbeat=now - timedelta(minutes=20)),
+            Device(identifier="dev-eol", type="TOWER", temp_c=60, eol_date=today + timedelta(days=30)),
+            Device(identifier="dev-ok", type="TOWER", temp_c=60, eol_date=today + timedelta(days=31)),
+        ])
+
+    def _alerts(self):
+        return sorted(Alert.objects.values_list("type", "device__identifier", "message"))
+
+    def test_numpy_and_sql_engines_agree(self):
+        evaluate_device_rules(engine="sql")
+        sql_alerts = self._alerts()
+        Alert.objects.all().delete()
+        evaluate_device_rules(engine="numpy")
+
+        self.assertEqual(self._alerts(), sql_alerts)
+        self.assertEqual(
+            [(t, d) for t, d, _ in sql_alerts],
+            [
+                ("EOL_SOON", "dev-eol"),
+                ("HEARTBEAT_MISSED", "dev-silent"),
+                ("OVERHEAT", "dev-edge"),
+                ("OVERHEAT", "dev-hot"),
+                ("WARM", "dev-warm"),
+            ],
+        )
+
+    def test_repeated_run_updates_open_alerts(self):
+        evaluate_device_rules()
+        results = evaluate_device_rules()
+
+        self.assertEqual(sum(r["created"] for r in results), 0)
+        self.assertEqual(sum(r["updated"] for r in results), 5)
+        self.assertEqual(Alert.objects.count(), 5)
+        self.assertTrue(all(n == 2 for n in Alert.objects.values_list("occurrences", flat=True)))
+
+    def test_sql_engine_cost_does_not_grow_with_matches(self):
+        def queries():
+            """(reads and updates, inserts); SQLite splits bulk INSERTs by its parameter limit"""
+            Alert.objects.all().delete()
+            with CaptureQueriesContext(connection) as ctx:
+                evaluate_device_rules(engine="sql")
+            inserts = sum(q["sql"].startswith("INSERT") for q in ctx.captured_queries)
+            return len(ctx.captured_queries) - inserts, inserts
+
+        def add_hot(start, n):
+            Device.objects.bulk_create([
+                Device(identifier=f"dev-hot-{i}", type="CPE", temp_c=90, last_heartbeat=timezone.now())
+                for i in range(start, start + n)
+            ])
+
+        add_hot(0, 10)
+        few, _ = queries()
+        add_hot(10, 500)  # still one alert chunk per rule
+        many, inserts = queries()
+        self.assertEqual(many, few)
+        self.assertLess(inserts, 20)
+        self.assertEqual(Alert.objects.filter(type="OVERHEAT").count(), 512)
+
+
+class AlertDedupTests(TestCase):
+    def setUp(self):
+        self.device = Device.objects.create(identifier="dev-hot", type="CPE", temp_c=85, last_heartbeat=timezone.now())
+
+    def test_alerts_carry_a_fingerprint(self):
+        evaluate_device_rules()
+        alert = Alert.objects.get()
+        self.assertEqual(alert.fingerprint, f"OVERHEAT:device:{self.device.id}")
+        self.assertIsNotNone(alert.last_seen_at)
+
+    def test_closed_alert_suppresses_re_alerting_within_window(self):
+        evaluate_device_rules()
+        Alert.objects.update(status="closed")
+        results = evaluate_device_rules(window=timedelta(minutes=60))
+
+        self.assertEqual(sum(r["suppressed"] for r in results), 1)
+        self.assertEqual(Alert.objects.count(), 1)
+
+    def test_condition_firing_after_window_opens_new_alert(self):
+        evaluate_device_rules()
+        Alert.objects.update(status="closed", last_seen_at=timezone.now() - timedelta(hours=2))
+        results = evaluate_device_rules(window=timedelta(minutes=60))
+
+        self.assertEqual(sum(r["created"] for r in results), 1)
+        self.assertEqual(sorted(Alert.objects.values_list("status", flat=True)), ["closed", "open"])
+
+
+class IncrementalRuleTests(TestCase):
+    def setUp(self):
+        self.hot = Device.objects.create(identifier="dev-hot", type="CPE", temp_c=85, last_heartbeat=timezone.now())
+        Device.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+
+    def _matched(self, results, rule):
+        return next(r["matched"] for r in results if r["rule"] == rule)
+
+    def test_first_run_is_a_full_pass_and_stores_the_watermark(self):
+        results = evaluate_device_rules(incremental=True)
+        self.assertEqual(self._matched(results, "OVERHEAT"), 1)
+        self.assertTrue(Watermark.objects.filter(key="device_rules").exists())
+
+    def test_next_run_only_checks_changed_devices(self):
+        evaluate_device_rules(incremental=True)
+        results = evaluate_device_rules(incremental=True)
+        self.assertEqual(self._matched(results, "OVERHEAT"), 0)
+        self.assertEqual(Alert.objects.get().occurrences, 1)
+
+        self.hot.temp_c = 95
+        self.hot.save()
+        Device.objects.create(identifier="dev-new", type="CPE", temp_c=88, last_heartbeat=timezone.now())
+        results = evaluate_device_rules(incremental=True)
+
+        self.assertEqual(self._matched(results, "OVERHEAT"), 2)
+        self.assertEqual(
+            sorted(Alert.objects.values_list("device__identifier", "occurrences")), [("dev-hot", 2), ("dev-new", 1)]
+        )
+
+
+class RuleShardTests(TestCase):
+    def setUp(self):
+        Device.objects.bulk_create([Device(identifier=f"dev-{i}", type="CPE") for i in range(60)])
+
+    def test_hosts_with_different_worker_counts_partition_the_fleet(self):
+        devices = Device.objects.all()
+        # Host 0 of 2 runs three workers, host 1 runs two
+        shards = [(0, 2, w, 3) for w in range(3)] + [(1, 2, w, 2) for w in range(2)]
+        owned = [set(shard_devices(devices, s).values_list("id", flat=True)) for s in shards]
+
+        self.assertEqual(sum(len(ids) for ids in owned), 60)
+        self.assertEqual(set().union(*owned), set(devices.values_list("id", flat=True)))
+        self.assertEqual(set().union(*owned[:3]), set(shard_devices(devices, (0, 2)).values_list("id", flat=True)))
+
+
+class RuleDaemonTests(SimpleTestCase):
+    def test_stop_mid_cycle_lets_the_cycle_finish(self):
+        stop, done = threading.Event(), []
+
+        def step():
+            stop.set()  # e.g. SIGTERM arrives while the cycle runs
+            done.append(len(done) + 1)
+
+        with self.assertLogs("core.daemon", "INFO") as logs:
+            run_loop(step, 0, stop, name="rules")
+        self.assertEqual(done, [1])
+        self.assertRegex(logs.output[-1], r"rules cycle 1 took \d+\.\d ms")
+
+    def test_failed_cycle_is_logged_and_the_loop_carries_on(self):
+        stop, calls = threading.Event(), []
+
+        def step():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("database went away")
+            stop.set()
+
+        with self.assertLogs("core.daemon", "INFO") as logs:
+            run_loop(step, 0, stop, name="rules")
+        self.assertEqual(len(calls), 2)
+        self.assertIn("rules cycle 1 failed", "\n".join(logs.output))
+
+    def test_workers_split_the_host_shard(self):
+        with mock.patch.object(run_rules, "run_workers") as run_workers:
+            call_command("run_rules", daemon=True, workers=3, shard_index=1, shard_count=2, stdout=StringIO())
+        shards = [args[3] for args in run_workers.call_args.args[1]]
+        self.assertEqual(shards, [(1, 2, 0, 3), (1, 2, 1, 3), (1, 2, 2, 3)])
+
+    def test_worker_logs_each_cycle(self):
+        stop = threading.Event()
+
+        def evaluate(**kwargs):
+            stop.set()
+            return [{"rule": "OVERHEAT", "matched": 2, "created": 1, "updated": 1, "suppressed": 0, "seconds": 0.01}]
+
+        with mock.patch.object(run_rules, "evaluate_device_rules", evaluate), \
+                self.assertLogs("core", "INFO") as logs:
+            run_rules._rules_worker(stop, 0, None, False, (0, 2, 1, 3), "numpy")
+        output = "\n".join(logs.output)
+        self.assertIn("rules[0/2:1/3] created=1 updated=1", output)
+        self.assertRegex(output, r"rules\[0/2:1/3\] cycle 1 took")
+
+
+class DashboardQueryBudgetTests(TestCase):
+    QUERY_BUDGET = 6  # cold: snapshot build (5) + device page
+
+    def setUp(self):
+        cache.clear()
+
+    def _seed(self, n):
+        today = timezone.localdate()
+        site = Site.objects.create(name="Site A", city="Pune")
+        plan = Plan.objects.create(name="Basic", speed_mbps=50, monthly_price=199)
+        customers = Customer.objects.bulk_create(
+            [Customer(name=f"cust-{i}", city="Pune") for i in range(n)]
+        )
+        Subscription.objects.bulk_create(
+            [Subscription(customer=c, plan=plan) for c in customers]
+        )
+        UsageEvent.objects.bulk_create(
+            [UsageEvent(customer=c, date=today - timedelta(days=i % 10), gb_used=1.5) for i, c in enumerate(customers)]
+        )
+        devices = Device.objects.bulk_create(
+            [Device(identifier=f"dev-{n}-{i}", type="CPE", site=site) for i in range(n)]
+        )
+        Alert.objects.bulk_create(
+            [Alert(device=d, type="OVERHEAT", severity="critical", message="hot") for d in devices[:20]]
+        )
+        InventoryItem.objects.bulk_create([InventoryItem(name=f"item-{i}") for i in range(5)])
+
+    def test_query_count_does_not_grow_with_rows(self):
+        for n in (3, 200):
+            with self.subTest(rows=n):
+                self._seed(n)
+                cache.clear()
+                with self.assertNumQueries(self.QUERY_BUDGET):
+                    response = self.client.get(reverse("dashboard"))
+                self.assertEqual(response.status_code, 200)
+
+    def test_context_aggregates(self):
+        self._seed(120)
+        response = self.client.get(reverse("dashboard"), {"page": 3})
+        context = response.context
+
+        self.assertEqual(context["devices"], 120)
+        self.assertEqual(context["alerts_open"], 20)
+        self.assertEqual(context["alert_data"], [0, 0, 20])
+        self.assertEqual(context["usage_values"], [18.0] * 7)
+        self.assertEqual(context["device_pages"], 3)
+        self.assertEqual(len(context["devices_list"]), 120 - 2 * DEVICE_PAGE_SIZE)
+
+    def test_warm_snapshot_only_reads_device_page(self):
+        self._seed(10)
+        self.client.get(reverse("dashboard"))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.context["devices"], 10)
+
+    def test_stale_snapshot_is_served_and_refreshed_once(self):
+        self._seed(10)
+        self.client.get(reverse("dashboard"))
+        snapshot = cache.get(SNAPSHOT_KEY)
+        snapshot["built_at"] -= timedelta(minutes=5)
+        cache.set(SNAPSHOT_KEY, snapshot, timeout=None)
+
+        with mock.patch("core.dashboard._start_refresh") as start_refresh:
+            for _ in range(3):
+                response = self.client.get(reverse("dashboard"))
+                self.assertGreaterEqual(response.context["snapshot_age"], 300)
+        start_refresh.assert_called_once()
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        # Several alerts share a created_at, so the id tiebreaker decides page boundaries
+        alerts = Alert.objects.bulk_create(
+            [Alert(type="OVERHEAT", severity="critical", message=f"a{i}") for i in range(25)]
+        )
+        base = timezone.now()
+        for i, alert in enumerate(alerts):
+            alert.created_at = base - timedelta(minutes=i // 4)
+        Alert.objects.bulk_update(alerts, ["created_at"])
+        self.expected = list(Alert.objects.order_by("-created_at", "id").values_list("id", flat=True))
+
+    def _walk(self, url, key):
+        ids = []
+        while url:
+            data = self.client.get(url).json()
+            ids.extend(row["id"] for row in data["results"])
+            url = data[key]
+        return ids, data
+
+    def test_forward_and_backward_walks_cover_every_row_once(self):
+        forward, last_page = self._walk("/api/alerts/?page_size=4", "next")
+        self.assertEqual(forward, self.expected)
+
+        backward = []
+        url = last_page["previous"]
+        while url:
+            data = self.client.get(url).json()
+            backward[:0] = [row["id"] for row in data["results"]]
+            url = data["previous"]
+        self.assertEqual(backward + [row["id"] for row in last_page["results"]], self.expected)
+
+    def test_tampered_cursor_is_rejected(self):
+        for position in ('["x"]', '["not-a-date", "1"]'):
+            cursor = b64encode(urlencode({"p": position}).encode()).decode()
+            response = self.client.get("/api/alerts/", {"cursor": cursor})
+            self.assertEqual(response.status_code, 404)
+
+
+class AllowlistFilterTests(TestCase):
+    def setUp(self):
+        base = timezone.now()
+        Device.objects.bulk_create(
+            [Device(identifier=f"dev-{i}", type="CPE", last_heartbeat=base if i % 3 else None) for i in range(10)]
+        )
+
+    def test_out_of_range_integer_is_a_400(self):
+        self.assertEqual(self.client.get("/api/alerts/?customer=99999999999999999999").status_code, 400)
+        self.assertEqual(self.client.get("/api/bills/?customer=-99999999999999999999").status_code, 400)
+
+    def test_detail_actions_take_their_own_params(self):
+        device = Device.objects.first()
+        self.assertEqual(self.client.get(f"/api/devices/{device.id}/?status=active").status_code, 200)
+        response = self.client.get(
+            f"/api/devices/{device.id}/metrics/",
+            {"start": "2026-10-01T00:00:00Z", "end": "2026-10-02T00:00:00Z", "step": 3600},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get("/api/devices/?start=2026-10-01").status_code, 400)  # list still checked
+
+    def test_nullable_column_is_not_a_keyset_ordering(self):
+        self.assertEqual(self.client.get("/api/devices/?ordering=last_heartbeat").status_code, 400)
+
+    def test_every_device_is_paged_once(self):
+        ids, url = [], "/api/devices/?ordering=-id&page_size=3"
+        while url:
+            data = self.client.get(url).json()
+            ids.extend(row["id"] for row in data["results"])
+            url = data["next"]
+        self.assertEqual(ids, sorted(Device.objects.values_list("id", flat=True), reverse=True))
+
+    def test_nullable_cursor_ordering_is_refused(self):
+        view = mock.Mock(filter_backends=[], cursor_ordering=("last_heartbeat", "id"))
+        with self.assertRaises(ImproperlyConfigured):
+            KeysetCursorPagination().get_ordering(mock.Mock(), Device.objects.all(), view)
+
+
+class EndpointQueryBudgetTests(TestCase):
+    """Query counts per endpoint must not move when the tables grow from 10 to 10,000 rows"""
+
+    SIZES = (10, 10_000)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.site = Site.objects.create(name="Site A", city="Pune")
+        cls.plan = Plan.objects.create(name="Basic", speed_mbps=50, monthly_price=199)
+        cls.admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+
+    def _grow_to(self, n):
+        have = Customer.objects.count()
+        if have >= n:
+            return
+        today = timezone.localdate()
+        customers = Customer.objects.bulk_create(
+            [Customer(name=f"cust-{i}", city="Pune") for i in range(have, n)]
+        )
+        Subscription.objects.bulk_create([Subscription(customer=c, plan=self.plan) for c in customers])
+        UsageEvent.objects.bulk_create([UsageEvent(customer=c, date=today, gb_used=1.0) for c in customers])
+        # Half the bills belong to the first customer, one per (distinct, past) month
+        first = Customer.objects.order_by("id").first()
+        Bill.objects.bulk_create([
+            Bill(customer=first, month=date(1000 + k // 12, k % 12 + 1, 1), amount=199) if k % 2
+            else Bill(customer=c, month=today.replace(day=1), amount=199)
+            for k, c in enumerate(customers, start=have)
+        ])
+        devices = Device.objects.bulk_create(
+            [Device(identifier=f"dev-{i}", type="CPE", site=self.site) for i in range(have, n)]
+        )
+        Alert.objects.bulk_create(
+            [Alert(device=d, customer=c, type="OVERHEAT", severity="critical", message="hot")
+             for d, c in zip(devices, customers)]
+        )
+        InventoryItem.objects.bulk_create([InventoryItem(name=f"item-{i}") for i in range(have, n)])
+
+    def _endpoints(self):
+        customer_id = Customer.objects.order_by("id").values_list("id", flat=True).first()
+        return [
+            ("get", "/api/sites/", {}),
+            ("get", "/api/devices/", {}),
+            ("get", "/api/inventory/", {}),
+            ("get", "/api/plans/", {}),
+            ("get", "/api/customers/", {}),
+            ("get", "/api/subscriptions/", {}),
+            ("get", "/api/usage/", {}),
+            ("get", "/api/alerts/", {"status": "open"}),
+            ("get", "/api/bills/", {"customer": customer_id}),
+            ("get", f"/api/customers/{customer_id}/usage/", {}),
+            ("get", f"/api/customers/{customer_id}/my_plan/", {}),
+            ("get", f"/api/customers/{customer_id}/churn_score/", {}),
+            ("get", "/api/usage/summary/", {"city": "Pune", "plan": "Basic"}),
+            ("get", reverse("dashboard"), {}),
+            ("get", "/admin/core/subscription/", {}),
+            ("get", "/admin/core/usageevent/", {}),
+            ("get", "/admin/core/alert/", {}),
+            ("get", "/admin/core/bill/", {}),
+            ("get", "/admin/core/device/", {}),
+        ]
+
+    def _count_queries(self):
+        self.client.force_login(self.admin)
+        ChurnScore.objects.all().delete()  # churn_score scores live on both runs
+        counts = {}
+        for method, url, params in self._endpoints():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(url, params)
+            self.assertEqual(response.status_code, 200, url)
+            counts[url] = len(queries)
+        return counts
+
+    def test_query_counts_are_constant_in_table_size(self):
+        results = []
+        for n in self.SIZES:
+            self._grow_to(n)
+            results.append(self._count_queries())
+        small, large = results
+        self.maxDiff = None
+        self.assertEqual(small, large)
+
+
+class UsageImportTests(TestCase):
+    def setUp(self):
+        self.customers = Customer.objects.bulk_create([Customer(name=f"c{i}", city="Pune") for i in range(3)])
+
+    def test_valid_rows_land_and_bad_rows_are_reported(self):
+        a, b, _ = (c.id for c in self.customers)
+        lines = [
+            "customer_id,date,gb_used\n",
+            f"{a},2026-09-01,1.5\n",
+            f"{b},2026-09-01,2\n",
+            f"{a},2026-09-01,0.5\n",
+            "999999,2026-09-01,1\n",
+            f"{a},2026-02-30,1\n",
+            f"{a},2026-09-01,-3\n",
+        ]
+        result = import_usage(lines, "csv", chunk_size=2)
+
+        self.assertEqual(result.inserted, 3)
+        self.assertEqual([(n, reason) for n, reason, _ in result.errors], [
+            (5, "unknown customer_id"),
+            (6, "day is out of range for month"),
+            (7, "gb_used must be a non-negative number"),
+        ])
+        rollup = DailyUsageRollup.objects.get(customer_id=a)
+        self.assertEqual((rollup.total_gb, rollup.event_count), (2.0, 2))
+        self.assertEqual(list(check_usage_rollup()), [])
+
+    def test_ndjson_and_bad_header(self):
+        a = self.customers[0].id
+        result = import_usage([f'{{"customer_id": {a}, "date": "2026-09-01", "gb_used": 4}}\n', '{"customer_id": 1}\n'], "ndjson")
+        self.assertEqual((result.inserted, result.errors[0][1]), (1, "missing field date"))
+        with self.assertRaises(ValueError):
+            import_usage(["customer,day,gb\n"], "csv")
+
+    def test_ndjson_booleans_and_fractions_are_not_numbers(self):
+        a = self.customers[0].id
+        lines = [
+            '{"customer_id": true, "date": "2026-09-01", "gb_used": 4}\n',
+            f'{{"customer_id": {a}, "date": "2026-09-01", "gb_used": true}}\n',
+            f'{{"customer_id": {a}.5, "date": "2026-09-01", "gb_used": 4}}\n',
+            '{"customer_id": 99999999999999999999999, "date": "2026-09-01", "gb_used": 4}\n',
+        ]
+        result = import_usage(lines, "ndjson")
+        self.assertEqual(result.inserted, 0)
+        self.assertEqual([reason for _, reason, _ in result.errors], [
+            "customer_id must be an integer",
+            "gb_used must be a non-negative number",
+            "customer_id must be an integer",
+            "customer_id is out of range",
+        ])
+        self.assertFalse(UsageEvent.objects.exists())
+
+
+@override_settings(BUFFERED_INGESTION=True, INGEST_BUFFER_SIZE=2, INGEST_PUT_TIMEOUT=0)
+class BufferedIngestionTests(TestCase):
+    def setUp(self):
+        # Fresh buffers without flusher threads; tests flush explicitly
+        patches = [mock.patch.dict(buffering._buffers, clear=True), mock.patch.object(WriteBehindBuffer, "start")]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.customer = Customer.objects.create(name="Asha", city="Pune")
+        self.device = Device.objects.create(identifier="dev-1", type="CPE")
+
+    def test_usage_post_is_accepted_then_written_in_bulk(self):
+        for gb in (1.5, 2.5):
+            response = self.client.post("/api/usage/", {"customer": self.customer.id, "date": "2026-09-01", "gb_used": gb})
+            self.assertEqual(response.status_code, 202)
+        self.assertFalse(UsageEvent.objects.exists())
+
+        self.assertEqual(get_buffer("usage").flush(), 2)
+        self.assertEqual(UsageEvent.objects.count(), 2)
+        self.assertEqual(DailyUsageRollup.objects.get(customer=self.customer).total_gb, 4.0)
+        stats = self.client.get("/api/ingest/stats/").json()["buffers"]["usage"]
+        self.assertEqual((stats["queue_depth"], stats["flushed"], stats["flushes"]), (0, 2, 1))
+
+    def test_invalid_event_is_rejected_before_queueing(self):
+        response = self.client.post("/api/usage/", {"customer": 999, "date": "2026-09-01", "gb_used": 1})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(get_buffer("usage").queue.qsize(), 0)
+
+    def test_full_buffer_applies_backpressure(self):
+        statuses = [
+            self.client.post("/api/usage/", {"customer": self.customer.id, "date": "2026-09-01", "gb_used": 1}).status_code
+            for _ in range(3)
+        ]
+        self.assertEqual(statuses, [202, 202, 503])
+        self.assertEqual(get_buffer("usage").stats()["rejected"], 1)
+
+    def test_transient_errors_are_retried(self):
+        attempts = []
+
+        def flaky(batch):
+            attempts.append(list(batch))
+            if len(attempts) < 3:
+                raise OperationalError("database is locked")
+
+        buffer = WriteBehindBuffer("test", flaky, retry_backoff=0)
+        for i in range(3):
+            buffer.submit(i)
+        buffer.flush()
+        self.assertEqual(attempts, [[0, 1, 2]] * 3)
+        self.assertEqual((buffer.flushed, buffer.failed, buffer.retried), (3, 0, 2))
+
+    def test_bad_item_does_not_drop_its_batch(self):
+        written = []
+
+        def strict(batch):
+            if "bad" in batch:
+                raise IntegrityError("FOREIGN KEY constraint failed")
+            written.extend(batch)
+
+        buffer = WriteBehindBuffer("test", strict, retry_backoff=0)
+        for item in ("a", "bad", "b"):
+            buffer.submit(item)
+        buffer.flush()
+        self.assertEqual(written, ["a", "b"])
+        self.assertEqual((buffer.flushed, buffer.failed, list(buffer.dead_letters)), (2, 1, ["bad"]))
+
+    def test_device_updates_merge_per_device(self):
+        url = f"/api/devices/{self.device.id}/"
+        before = self.device.updated_at
+        self.client.patch(url, {"temp_c": 71.5}, content_type="application/json")
+        response = self.client.patch(url, {"status": "faulty"}, content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+
+        get_buffer("devices").flush()
+        self.device.refresh_from_db()
+        self.assertEqual((self.device.temp_c, self.device.status), (71.5, "faulty"))
+        self.assertGreater(self.device.updated_at, before)
+
+
+class BillingRunTests(TestCase):
+    def setUp(self):
+        plan = Plan.objects.create(name="Basic", speed_mbps=100, monthly_price=499)
+        self.heavy, self.light, self.cancelled = Customer.objects.bulk_create(
+            [Customer(name=n, city="Pune") for n in ("heavy", "light", "cancelled")]
+        )
+        Subscription.objects.bulk_create([
+            Subscription(customer=self.heavy, plan=plan),
+            Subscription(customer=self.light, plan=plan),
+            Subscription(customer=self.cancelled, plan=plan, status="cancelled"),
+        ])
+        UsageEvent.objects.bulk_create([
+            UsageEvent(customer=self.heavy, date=date(2026, 9, 3), gb_used=80),
+            UsageEvent(customer=self.heavy, date=date(2026, 9, 30), gb_used=40.5),
+            UsageEvent(customer=self.heavy, date=date(2026, 10, 1), gb_used=500),  # next month
+            UsageEvent(customer=self.light, date=date(2026, 9, 10), gb_used=3),
+        ])
+
+    def test_bills_active_subscriptions_with_overage(self):
+        call_command("run_billing", month="2026-09", partition_size=1, stdout=StringIO())
+        bills = dict(Bill.objects.filter(month=date(2026, 9, 1)).values_list("customer_id", "amount"))
+        self.assertEqual(bills, {self.heavy.id: Decimal("704.00"), self.light.id: Decimal("499.00")})
+
+    def test_rerun_is_idempotent(self):
+        Bill.objects.create(customer=self.light, month=date(2026, 9, 1), amount=1, status="paid")
+        self.assertEqual(sum(n for _, _, n in bill_month(date(2026, 9, 1))), 1)
+        self.assertEqual(sum(n for _, _, n in bill_month(date(2026, 9, 1))), 0)
+        self.assertEqual(Bill.objects.get(customer=self.light).amount, 1)
+
+    def test_bills_inserted_concurrently_are_not_counted(self):
+        real = billing.estimate_bill
+
+        def estimate_racing_another_run(price, gb):
+            # Another worker bills "light" after this run read the existing bills
+            if not Bill.objects.filter(customer=self.light).exists():
+                Bill.objects.create(customer=self.light, month=date(2026, 9, 1), amount=1)
+            return real(price, gb)
+
+        with mock.patch.object(billing, "estimate_bill", estimate_racing_another_run):
+            self.assertEqual(sum(n for _, _, n in bill_month(date(2026, 9, 1))), 1)
+        self.assertEqual(Bill.objects.get(customer=self.light).amount, 1)
+        self.assertEqual(Bill.objects.count(), 2)
+
+
+class BillSettlementTests(TestCase):
+    def setUp(self):
+        customers = Customer.objects.bulk_create([Customer(name=f"c{i}", city="Pune") for i in range(3)])
+        self.unpaid, self.overdue, self.paid = Bill.objects.bulk_create([
+            Bill(customer=c, month=date(2026, 9, 1), amount=499, status=s)
+            for c, s in zip(customers, ("unpaid", "overdue", "paid"))
+        ])
+
+    def settle(self, ids):
+        return self.client.post("/api/bills/settle/", {"bill_ids": ids}, content_type="application/json")
+
+    def test_settles_in_one_update_and_reports_the_rest(self):
+        ids = [self.unpaid.id, self.overdue.id, self.paid.id, 999999, self.unpaid.id]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.settle(ids)
+        self.assertEqual(response.json(), {
+            "settled": [self.unpaid.id, self.overdue.id],
+            "already_paid": [self.paid.id],
+            "not_found": [999999],
+        })
+        self.assertEqual(sum(q["sql"].startswith("UPDATE") for q in ctx.captured_queries), 1)
+        self.assertEqual(Bill.objects.filter(status="paid").count(), 3)
+
+    def test_replay_is_idempotent(self):
+        self.settle([self.unpaid.id])
+        response = self.settle([self.unpaid.id])
+        self.assertEqual(response.json()["already_paid"], [self.unpaid.id])
+        self.assertEqual(self.client.post(f"/api/bills/{self.unpaid.id}/pay/").json()["message"],
+                         f"Bill {self.unpaid.id} was already paid")
+
+    def test_rejects_bad_payloads(self):
+        self.assertEqual(self.settle([]).status_code, 400)
+        self.assertEqual(self.settle(["1"]).status_code, 400)
+        self.assertEqual(self.settle([True]).status_code, 400)
+        self.assertEqual(self.settle([2 ** 63]).status_code, 400)
+        self.assertEqual(self.settle([-2 ** 63 - 1]).status_code, 400)
+
+    def test_pay_out_of_range_id_is_not_found(self):
+        self.assertEqual(self.client.post("/api/bills/99999999999999999999/pay/").status_code, 404)
+
+
+class BillAgingTests(TestCase):
+    def setUp(self):
+        self.late, self.current = Customer.objects.bulk_create([Customer(name=n, city="Pune") for n in ("late", "current")])
+        Bill.objects.bulk_create([
+            Bill(customer=self.late, month=date(2026, 8, 1), amount=499, status="unpaid"),
+            Bill(customer=self.late, month=date(2026, 7, 1), amount=999, status="unpaid"),
+            Bill(customer=self.late, month=date(2026, 6, 1), amount=499, status="paid"),
+            Bill(customer=self.current, month=date(2026, 9, 1), amount=499, status="unpaid"),
+        ])
+
+    def test_moves_bills_past_grace_and_alerts_once_per_customer(self):
+        result = age_bills(today=date(2026, 10, 10), grace=15)  # September is still in grace
+
+        self.assertEqual(result, {"overdue": 2, "customers": 1, "alerts_created": 1, "alerts_updated": 0})
+        self.assertEqual(
+            sorted(Bill.objects.values_list("customer__name", "month", "status")),
+            [
+                ("current", date(2026, 9, 1), "unpaid"),
+                ("late", date(2026, 6, 1), "paid"),
+                ("late", date(2026, 7, 1), "overdue"),
+                ("late", date(2026, 8, 1), "overdue"),
+            ],
+        )
+        alert = Alert.objects.get()
+        self.assertEqual((alert.type, alert.customer_id), (OVERDUE_ALERT_TYPE, self.late.id))
+        self.assertIn("1498.00", alert.message)
+
+    def test_next_run_only_touches_newly_late_bills(self):
+        age_bills(today=date(2026, 10, 10), grace=15)
+        result = age_bills(today=date(2026, 10, 20), grace=15)
+        self.assertEqual(result["overdue"], 1)
+        self.assertEqual(Alert.objects.filter(type=OVERDUE_ALERT_TYPE).count(), 2)
+
+    def test_bumped_alert_states_the_current_balance(self):
+        age_bills(today=date(2026, 10, 10), grace=15)
+        Bill.objects.create(customer=self.late, month=date(2026, 9, 1), amount=501, status="unpaid")
+        result = age_bills(today=date(2026, 10, 20), grace=15)
+
+        self.assertEqual(result["alerts_updated"], 1)  # "current" is new this run
+        alert = Alert.objects.get(customer=self.late)
+        self.assertEqual(alert.occurrences, 2)
+        self.assertEqual(alert.message, "3 bill(s) overdue, ₹1999.00 outstanding")
+
+
+class UsageRollupDeleteTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Asha", city="Pune")
+        self.other = Customer.objects.create(name="Ravi", city="Pune")
+
+    def _events(self, customer, n):
+        UsageEvent.objects.bulk_create(
+            [UsageEvent(customer=customer, date=date(2026, 9, 1 + i % 28), gb_used=1.0) for i in range(n)]
+        )
+
+    def test_customer_delete_cascades_through_usage(self):
+        self._events(self.customer, 300)
+        self._events(self.other, 10)
+        self.customer.delete()
+
+        self.assertFalse(UsageEvent.objects.filter(customer_id=self.customer.id).exists())
+        self.assertFalse(DailyUsageRollup.objects.filter(customer_id=self.customer.id).exists())
+        self.assertEqual(list(check_usage_rollup()), [])
+
+    def test_customer_delete_through_api(self):
+        self._events(self.customer, 5)
+        self.assertEqual(self.client.delete(f"/api/customers/{self.customer.id}/").status_code, 204)
+        self.assertFalse(DailyUsageRollup.objects.exists())
+
+    def test_queryset_delete_adjusts_rollup_in_constant_queries(self):
+        self._events(self.customer, 500)
+        counts = []
+        for n in (10, 490):
+            ids = list(UsageEvent.objects.order_by("id").values_list("id", flat=True)[:n])
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(UsageEvent.objects.filter(id__in=ids).delete()[0], n)
+            counts.append(len(ctx.captured_queries))
+            self.assertEqual(list(check_usage_rollup()), [])
+        self.assertLess(counts[1], 20)
+        self.assertEqual(DailyUsageRollup.objects.filter(event_count__gt=0).count(), 0)
+
+    def test_single_event_delete_still_adjusts_rollup(self):
+        self._events(self.customer, 2)
+        UsageEvent.objects.only("id").first().delete()
+        self.assertEqual(list(check_usage_rollup()), [])
+
+    def test_deletes_never_load_usage_rows(self):
+        self.assertTrue(Collector(using="default").can_fast_delete(UsageEvent.objects.all()))
+        self._events(self.customer, 50)
+        self._events(self.other, 50)
+
+        with CaptureQueriesContext(connection) as ctx:
+            UsageEvent.objects.filter(customer=self.other).delete()
+            self.customer.delete()
+        row_reads = [  # anything but the grouped totals of UsageEventQuerySet.delete
+            q["sql"] for q in ctx.captured_queries
+            if q["sql"].startswith("SELECT") and '"core_usageevent"' in q["sql"] and "GROUP BY" not in q["sql"]
+        ]
+        self.assertEqual(row_reads, [])
+        self.assertEqual(list(check_usage_rollup()), [])
+
+    def test_saving_a_loaded_event_moves_its_rollup(self):
+        self._events(self.customer, 1)
+        event = UsageEvent.objects.get()
+        event.date, event.gb_used = date(2026, 9, 5), 4.0
+        event.save()
+        self.assertEqual(list(DailyUsageRollup.objects.filter(event_count__gt=0).values_list("date", "total_gb")),
+                         [(date(2026, 9, 5), 4.0)])
+
+    def test_rebuild_reads_usage_inside_its_transaction(self):
+        self._events(self.customer, 3)
+        depth, seen = len(connection.atomic_blocks), []  # TestCase's own blocks
+        real = usage_rollup._raw_totals
+
+        def raw_totals(lo, hi):
+            seen.append(len(connection.atomic_blocks) > depth)
+            return real(lo, hi)
+
+        with mock.patch.object(usage_rollup, "_raw_totals", raw_totals):
+            list(usage_rollup.rebuild_usage_rollup())
+        self.assertTrue(seen and all(seen))
+        self.assertEqual(list(check_usage_rollup()), [])
+
+
+class ChurnCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = Customer.objects.create(name="Asha", city="Pune")
+        ChurnScore.objects.create(
+            customer=self.customer, score=7, scored_at=timezone.now() - timedelta(days=1)
+        )
+        self.url = f"/api/customers/{self.customer.id}/churn_score/"
+
+    def test_result_computed_before_an_invalidation_is_not_served(self):
+        payload, version = get_churn(self.customer.id)
+        self.assertIsNone(payload)
+        invalidate_churn([self.customer.id])  # usage written while the result was computed
+        set_churn(self.customer.id, {"score": 7}, version)
+        self.assertIsNone(get_churn(self.customer.id)[0])
+
+    def test_precomputed_score_is_served_and_cached(self):
+        self.assertEqual(self.client.get(self.url).json()["score"], 7)
+        self.assertEqual(get_churn(self.customer.id)[0]["score"], 7)
+
+    def test_usage_write_keeps_churn_score_and_costs_no_churn_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            UsageEvent.objects.create(customer=self.customer, date=date(2026, 9, 1), gb_used=2.0)
+        self.assertFalse([q for q in ctx.captured_queries if "core_churnscore" in q["sql"]])
+        self.assertTrue(ChurnScore.objects.filter(customer=self.customer, score=7).exists())
+
+    def test_outdated_churn_score_is_rescored_after_usage_write(self):
+        self.client.get(self.url)
+        UsageEvent.objects.create(customer=self.customer, date=date(2026, 9, 1), gb_used=2.0)
+
+        score = self.client.get(self.url).json()["score"]
+        churn = ChurnScore.objects.get(customer=self.customer)
+        self.assertEqual(churn.score, score)
+        self.assertGreater(churn.scored_at, timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.client.get(self.url).json()["score"], score)
+
+    def test_invalidation_while_scoring_leaves_the_stored_score_outdated(self):
+        ChurnScore.objects.all().delete()
+        real = feature_frame
+
+        def frame_then_usage_write(*args, **kwargs):
+            frame = real(*args, **kwargs)
+            UsageEvent.objects.create(customer=self.customer, date=date(2026, 9, 1), gb_used=2.0)
+            return frame
+
+        with mock.patch("core.views.feature_frame", frame_then_usage_write):
+            self.client.get(self.url)
+
+        churn = ChurnScore.objects.get(customer=self.customer)
+        _, version = get_churn(self.customer.id)
+        self.assertFalse(is_current(churn.scored_at, version))
+        self.assertIsNone(get_churn(self.customer.id)[0])
+
+    def test_warm_cache_rescores_outdated_rows(self):
+        invalidate_churn([self.customer.id])
+        call_command("warm_churn_cache", stdout=StringIO())
+        payload = get_churn(self.customer.id)[0]
+        self.assertEqual(payload["score"], ChurnScore.objects.get(customer=self.customer).score)
+        self.assertGreater(ChurnScore.objects.get().scored_at, timezone.now() - timedelta(minutes=1))
+
+
+class UsageSummaryTests(TestCase):
+    url = "/api/usage/summary/"
+
+    def setUp(self):
+        plan = Plan.objects.create(name="Basic", speed_mbps=100, monthly_price=499)
+        self.customer = Customer.objects.create(name="Asha", city="Pune")
+        Subscription.objects.create(customer=self.customer, plan=plan)
+        UsageEvent.objects.create(customer=self.customer, date=date(2026, 9, 2), gb_used=3.0)
+
+    def _post(self, body):
+        return self.client.post(self.url, body, content_type="application/json")
+
+    def test_summarizes_requested_customers(self):
+        response = self._post({"customer_ids": [self.customer.id, 999999], "start": "2026-09-01", "end": "2026-09-07"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["missing"], [999999])
+        self.assertEqual(len(response.json()["customers"]), 1)
+
+    def test_rejects_malformed_bodies(self):
+        cid = self.customer.id
+        for body in (
+            [cid],
+            {"customer_ids": [cid], "start": 20260901},
+            {"customer_ids": [cid], "end": ["2026-09-07"]},
+            {"customer_ids": [True]},
+            {"customer_ids": [2 ** 63]},
+            {"customer_ids": {"a": 1}},
+            {"plan": "99999999999999999999"},
+        ):
+            with self.subTest(body=body):
+                self.assertEqual(self._post(body).status_code, 400)
+
+
+@mock.patch("core.churn.predict_churn_proba", return_value=None)  # heuristic scores
+class ChurnScoringTests(TestCase):
+    TODAY = date(2026, 10, 1)
+
+    def setUp(self):
+        self.dropping, self.steady, self.idle = Customer.objects.bulk_create([
+            Customer(name="dropping", city="Pune", tenure_months=12, last_recharge_days_ago=30),
+            Customer(name="steady", city="Pune", tenure_months=12),
+            Customer(name="idle", city="Pune", tenure_months=1, complaints_last_90d=3),
+        ])
+        events = [
+            # 30 GB a day until last week, 1 GB a day since
+            UsageEvent(customer=self.dropping, date=self.TODAY - timedelta(days=d), gb_used=1.0 if d < 7 else 30.0)
+            for d in range(30)
+        ] + [UsageEvent(customer=self.steady, date=self.TODAY - timedelta(days=d), gb_used=2.0) for d in range(30)]
+        events.append(UsageEvent(customer=self.steady, date=self.TODAY - timedelta(days=40), gb_used=500.0))
+        UsageEvent.objects.bulk_create(events)
+
+    def test_averages_come_from_the_last_7_and_30_days(self, _):
+        frame = feature_frame(Customer.objects.order_by("id"), today=self.TODAY).set_index("id")
+        self.assertEqual(tuple(frame.loc[self.dropping.id, ["avg7", "avg30"]]), (1.0, (7 + 23 * 30) / 30))
+        self.assertEqual(tuple(frame.loc[self.steady.id, ["avg7", "avg30"]]), (2.0, 2.0))  # day -40 excluded
+        self.assertEqual(tuple(frame.loc[self.idle.id, ["avg7", "avg30", "usage_trend"]]), (0.0, 0.0, 1.0))
+
+    def test_vectorized_scores_match_the_per_customer_heuristic(self, _):
+        frame = feature_frame(Customer.objects.order_by("id"), today=self.TODAY)
+        expected = [
+            churn_score(c, avg7, avg30)
+            for c, avg7, avg30 in zip(Customer.objects.order_by("id"), frame["avg7"], frame["avg30"])
+        ]
+        self.assertEqual(churn_scores(frame).tolist(), expected)
+        self.assertEqual(expected, [70, 0, 30])
+
+    def test_score_customers_walks_chunks_and_stores_averages(self, _):
+        self.assertEqual(list(score_customers(chunk_size=2, today=self.TODAY)), [2, 1])
+        self.assertEqual(
+            sorted(ChurnScore.objects.values_list("customer__name", "score", "avg7")),
+            [("dropping", 70, 1.0), ("idle", 30, 0.0), ("steady", 0, 2.0)],
+        )
+
+
+class ChurnModelTests(TestCase):
+    def setUp(self):
+        churn_model.reset_model()
+        self.addCleanup(churn_model.reset_model)
+        self.addCleanup(lambda: churn_model.model_path().unlink(missing_ok=True))
+        plan = Plan.objects.create(name="Basic", speed_mbps=50, monthly_price=199)
+        customers = Customer.objects.bulk_create([
+            Customer(name=f"c{i}", city="Pune", tenure_months=i % 24, complaints_last_90d=i % 4,
+                     last_recharge_days_ago=(i * 7) % 60)
+            for i in range(40)
+        ])
+        Subscription.objects.bulk_create([
+            Subscription(customer=c, plan=plan, status="cancelled" if c.complaints_last_90d >= 2 else "active")
+            for c in customers
+        ])
+        self.frame = feature_frame(Customer.objects.order_by("id"))
+
+    def test_heuristic_without_an_artifact(self):
+        self.assertFalse(churn_model.model_path().exists())
+        scores, source = score_frame(self.frame)
+        self.assertEqual(source, "heuristic")
+        self.assertEqual(scores.tolist(), churn_scores(self.frame).tolist())
+
+    def test_trained_model_is_loaded_once_and_used(self):
+        call_command("train_churn", stdout=StringIO())
+        self.assertTrue(churn_model.model_path().exists())
+
+        with mock.patch.object(churn_model.joblib, "load", wraps=churn_model.joblib.load) as load:
+            scores, source = score_frame(self.frame)
+            score_frame(self.frame.head(5))
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual(source, "model")
+        self.assertEqual(len(scores), 40)
+        self.assertTrue(((scores >= 0) & (scores <= 100)).all())
+
+    def test_empty_frame_gives_no_probabilities(self):
+        call_command("train_churn", stdout=StringIO())
+        proba = churn_model.predict_churn_proba(self.frame.iloc[:0])
+        self.assertEqual((proba.shape, proba.dtype), ((0,), np.float64))
+
+
+class ChurnBatchTests(TestCase):
+    url = "/api/churn/scores/"
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Asha", city="Pune")
+
+    def _post(self, body):
+        return self.client.post(self.url, body, content_type="application/json")
+
+    def test_scores_known_ids_and_reports_missing(self):
+        response = self._post({"customer_ids": [self.customer.id, 999999]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([s["customer_id"] for s in response.json()["scores"]], [self.customer.id])
+        self.assertEqual(response.json()["missing"], [999999])
+
+    def test_rejects_malformed_bodies(self):
+        for body in ([self.customer.id], {"customer_ids": [True]}, {"customer_ids": [2 ** 63]}, {"customer_ids": "1"}):
+            with self.subTest(body=body):
+                self.assertEqual(self._post(body).status_code, 400)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(name="Asha", city="Pune")
+        self.events = UsageEvent.objects.bulk_create([
+            UsageEvent(customer=customer, date=date(2026, 9, d), gb_used=float(d)) for d in (3, 1, 2)
+        ])
+
+    def _get(self, **params):
+        return self.client.get("/api/export/usage/", params)
+
+    def test_ndjson_streams_rows_in_index_order_within_dates(self):
+        response = self._get(start="2026-09-02", end="2026-09-03")
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(r["date"], r["gb_used"]) for r in rows], [("2026-09-02", 2.0), ("2026-09-03", 3.0)])
+
+    def test_csv_has_a_header_and_one_line_per_row(self):
+        body = b"".join(self._get(format="csv").streaming_content).decode()
+        lines = list(csv.reader(body.splitlines()))
+        self.assertEqual(lines[0], ["id", "customer_id", "date", "gb_used"])
+        self.assertEqual([line[2] for line in lines[1:]], ["2026-09-01", "2026-09-02", "2026-09-03"])
+
+    def test_gzip_stream_decompresses_to_the_plain_export(self):
+        plain = b"".join(self._get().streaming_content)
+        response = self._get(gzip="1")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), plain)
+
+    def test_rejects_unknown_kinds_and_formats(self):
+        self.assertEqual(self.client.get("/api/export/devices/").status_code, 404)
+        self.assertEqual(self._get(format="xml").status_code, 400)
+        self.assertEqual(self._get(start="2026-13-01").status_code, 400)
+
+
+class BillDuplicateMigrationTests(TransactionTestCase):
+    """0013 merges duplicate (customer, month) bills without losing paid ones"""
+    before = [("core", "0012_hot_path_indexes")]
+    after = [("core", "0013_bill_customer_month_unique")]
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.before)
+        apps = self.executor.loader.project_state(self.before).apps
+        self.Bill = apps.get_model("core", "Bill")
+        Customer = apps.get_model("core", "Customer")
+        self.a, self.b = Customer.objects.create(name="a", city="x"), Customer.objects.create(name="b", city="x")
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def _bill(self, customer, status):
+        return self.Bill.objects.create(customer=customer, month=date(2026, 9, 1), amount=499, status=status).id
+
+    def _migrate(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.after)
+
+    def test_keeps_paid_bill_else_oldest(self):
+        unpaid, paid = self._bill(self.a, "unpaid"), self._bill(self.a, "paid")
+        first, _ = self._bill(self.b, "overdue"), self._bill(self.b, "unpaid")
+        self._migrate()
+        self.assertEqual(sorted(Bill.objects.values_list("id", flat=True)), sorted([paid, first]))
+        self.assertNotIn(unpaid, Bill.objects.values_list("id", flat=True))
+
+    def test_refuses_to_drop_paid_duplicates(self):
+        self._bill(self.a, "paid")
+        self._bill(self.a, "paid")
+        with self.assertRaisesMessage(RuntimeError, "Several paid bills"):
+            self._migrate()
+        self.Bill.objects.all().delete()
+
+
+class DeviceMetricTests(TestCase):
+    NOW = datetime(2026, 10, 1, 12, 0, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.device = Device.objects.create(identifier="dev-1", type="CPE")
+        start = self.NOW - timedelta(hours=3)
+        # One reading a minute for two hours: 40 + minute % 10
+        record_metrics((self.device.id, start + timedelta(minutes=m), 40.0 + m % 10) for m in range(120))
+
+    def _bucket(self, resolution, ts):
+        return DeviceMetricRollup.objects.get(device=self.device, resolution=resolution, bucket=ts)
+
+    def test_compaction_builds_five_minute_and_hourly_buckets(self):
+        compact_metrics(self.NOW)
+        first = self._bucket(FIVE_MINUTES, self.NOW - timedelta(hours=3))
+        self.assertEqual((first.temp_min, first.temp_max, first.temp_avg, first.samples), (40.0, 44.0, 42.0, 5))
+        hour = self._bucket(HOURLY, self.NOW - timedelta(hours=3))
+        self.assertEqual((hour.temp_min, hour.temp_max, hour.temp_avg, hour.samples), (40.0, 49.0, 44.5, 60))
+
+    def test_late_point_is_merged_into_compacted_buckets(self):
+        compact_metrics(self.NOW)
+        late = self.NOW - timedelta(hours=3) + timedelta(seconds=30)
+        record_metrics([(self.device.id, late, 99.0)])
+
+        five = self._bucket(FIVE_MINUTES, self.NOW - timedelta(hours=3))
+        self.assertEqual((five.temp_max, five.samples), (99.0, 6))
+        self.assertAlmostEqual(five.temp_avg, (42.0 * 5 + 99) / 6)
+        self.assertEqual(self._bucket(HOURLY, self.NOW - timedelta(hours=3)).temp_max, 99.0)
+
+        # Raw retention later drops the point, the rollups keep it
+        compact_metrics(self.NOW + timedelta(days=8))
+        self.assertFalse(DeviceMetric.objects.filter(temp_c=99.0).exists())
+        _, points = metric_series(self.device.id, late - timedelta(hours=1), late + timedelta(hours=1), 3600,
+                                  now=self.NOW + timedelta(days=8))
+        self.assertEqual(max(p["max"] for p in points), 99.0)
+
+    def test_retention_keeps_raw_points_until_compacted(self):
+        deleted = apply_retention(self.NOW + timedelta(days=30))  # nothing compacted yet
+        self.assertEqual(deleted[RAW], 0)
+        self.assertEqual(DeviceMetric.objects.count(), 120)
+
+    def test_series_resolution_and_fallback(self):
+        compact_metrics(self.NOW)
+        start, end = self.NOW - timedelta(hours=3), self.NOW - timedelta(hours=1)
+        resolution, points = metric_series(self.device.id, start, end, 60, now=self.NOW)
+        self.assertEqual((resolution, len(points)), (RAW, 120))
+        self.assertEqual(metric_series(self.device.id, start, end, 300, now=self.NOW)[0], FIVE_MINUTES)
+        self.assertEqual(metric_series(self.device.id, start, end, 7200, now=self.NOW)[0], HOURLY)
+
+        # Older than raw retention: a fine step falls back to the 5-minute rollups
+        resolution, points = metric_series(self.device.id, start, end, 60, now=self.NOW + timedelta(days=8))
+        self.assertEqual((resolution, len(points)), (FIVE_MINUTES, 24))
+
+    def test_endpoint_reads_naive_datetimes_in_the_current_timezone(self):
+        compact_metrics(self.NOW)
+        response = self.client.get(
+            f"/api/devices/{self.device.id}/metrics/",
+            {"start": "2026-10-01T09:00:00", "end": "2026-10-01T11:00:00", "step": 3600},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["resolution"], len(response.json()["points"])), (HOURLY, 2))
+
+    def test_endpoint_rejects_bad_params(self):
+        url = f"/api/devices/{self.device.id}/metrics/"
+        for params in (
+            {"start": "2026-13-45T00:00:00"},
+            {"end": "yesterday-ish"},
+            {"start": "2026-10-01T11:00:00Z", "end": "2026-10-01T09:00:00Z"},
+            {"start": "2026-10-01T09:00:00Z", "end": "2026-10-01T09:00:00Z"},
+            {"step": 0},
+            {"step": -300},
+            {"step": "5m"},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+
+class TelemetryIngestTests(TestCase):
+    def setUp(self):
+        self.device = Device.objects.create(identifier="dev-1", type="CPE")
+
+    def test_unrepresentable_timestamps_only_reject_their_record(self):
+        records = [
+            {"identifier": "dev-1", "ts": 1e20, "temp_c": 50},
+            {"identifier": "dev-1", "ts": -1e15, "temp_c": 50},
+            {"identifier": "dev-1", "ts": 1_790_000_000, "temp_c": 42.5},
+        ]
+        response = self.client.post("/api/devices/telemetry/", {"records": records}, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["status"] for r in response.json()["results"]], ["invalid", "invalid", "ok"])
+        self.device.refresh_from_db()
+        self.assertEqual(self.device.temp_c, 42.5)
+
+    def test_newest_record_per_device_wins(self):
+        results = ingest_telemetry([
+            {"identifier": "dev-1", "ts": 1_790_000_100, "temp_c": 60},
+            {"identifier": "dev-1", "ts": 1_790_000_000, "temp_c": 30},
+            {"identifier": "ghost", "ts": 1_790_000_000},
+        ])
+        self.assertEqual([r["status"] for r in results], ["ok", "stale", "unknown_device"])
+        self.assertEqual(DeviceMetric.objects.filter(device=self.device).count(), 2)
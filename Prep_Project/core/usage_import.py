@@ -0,0 +1,200 @@
+import csv
+import json
+import math
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from itertools import islice
+
+from django.db import connection, connections, transaction
+
+from .models import Customer, UsageEvent
+from .signals import mark_churn_stale
+from .usage_rollup import apply_usage_deltas
+
+IMPORT_CHUNK_SIZE = 20_000
+MAX_KEPT_ERRORS = 1000
+ERROR_REPORT_HEADER = ("line", "error", "raw")
+COLUMNS = ("customer_id", "date", "gb_used")
+FORMATS = ("csv", "ndjson")
+
+
+class ImportResult:
+    """
+    Running totals of an import. Rejected rows (line_no, reason, raw line) go to
+    error_writer (a csv.writer) as they happen; only the first MAX_KEPT_ERRORS are kept.
+    """
+
+    def __init__(self, error_writer=None):
+        self.inserted = 0
+        self.rejected = 0
+        self.errors = []
+        self.error_writer = error_writer
+        self.started = time.perf_counter()
+
+    def reject(self, errors):
+        errors = sorted(errors)
+        self.rejected += len(errors)
+        self.errors.extend(errors[:MAX_KEPT_ERRORS - len(self.errors)])
+        if self.error_writer is not None:
+            self.error_writer.writerows(errors)
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_sec(self):
+        return (self.inserted + self.rejected) / self.seconds if self.seconds else 0.0
+
+
+# ----- Parsing (pure Python, runs in worker processes) -----
+
+def _parse_values(customer_id, day, gb_used):
+    # JSON true/false would pass int()/float() as 1/0
+    if isinstance(customer_id, bool) or (isinstance(customer_id, float) and not customer_id.is_integer()):
+        raise ValueError("customer_id must be an integer")
+    if isinstance(gb_used, bool):
+        raise ValueError("gb_used must be a non-negative number")
+    customer_id = int(customer_id)
+    if customer_id <= 0:
+        raise ValueError("customer_id must be positive")
+    _, highest = connection.ops.integer_field_range(Customer._meta.pk.get_internal_type())
+    if highest is not None and customer_id > highest:
+        raise ValueError("customer_id is out of range")
+    day = date.fromisoformat(day) if isinstance(day, str) else None
+    if day is None:
+        raise ValueError("date must be YYYY-MM-DD")
+    gb_used = float(gb_used)
+    if not math.isfinite(gb_used) or gb_used < 0:
+        raise ValueError("gb_used must be a non-negative number")
+    return customer_id, day, gb_used
+
+
+def parse_chunk(lines, fmt, first_line_no):
+    """
+    Parse raw lines (no header) into ((customer_id, date, gb_used) rows, errors).
+    Rows carry their line number so later validation can point back at the file.
+    """
+    rows, errors = [], []
+    if fmt == "csv":
+        records = csv.reader(lines)
+    else:
+        records = (line for line in lines)
+    for offset, record in enumerate(records):
+        line_no = first_line_no + offset
+        try:
+            if fmt == "csv":
+                if not record:
+                    continue
+                if len(record) != 3:
+                    raise ValueError(f"expected 3 columns, got {len(record)}")
+                values = _parse_values(*record)
+            else:
+                if not record.strip():
+                    continue
+                obj = json.loads(record)
+                values = _parse_values(obj["customer_id"], obj["date"], obj["gb_used"])
+        except KeyError as e:
+            errors.append((line_no, f"missing field {e.args[0]}", record.rstrip("\n")))
+            continue
+        except (ValueError, TypeError) as e:
+            raw = ",".join(record) if fmt == "csv" else record.rstrip("\n")
+            errors.append((line_no, str(e) or type(e).__name__, raw))
+            continue
+        rows.append((line_no, *values))
+    return rows, errors
+
+
+def _line_chunks(lines, fmt, chunk_size):
+    """(lines, first_line_no) chunks of the input; the CSV header is checked and skipped"""
+    lines = iter(lines)
+    line_no = 1
+    if fmt == "csv":
+        header = next(lines, "")
+        columns = tuple(c.strip() for c in next(csv.reader([header]), []))
+        if columns != COLUMNS:
+            raise ValueError(f"CSV header must be {','.join(COLUMNS)}")
+        line_no = 2
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield chunk, line_no
+        line_no += len(chunk)
+
+
+def _parsed_chunks(lines, fmt, chunk_size, workers):
+    """parse_chunk over the input, in order; with workers > 1 parsing runs in a process pool"""
+    chunks = _line_chunks(lines, fmt, chunk_size)
+    if workers <= 1:
+        for chunk, first in chunks:
+            yield parse_chunk(chunk, fmt, first)
+        return
+
+    # Bounded submission keeps at most 2 chunks per worker in flight (flat memory)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk, first in chunks:
+            pending.append(pool.submit(parse_chunk, chunk, fmt, first))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# ----- Loading -----
+
+def insert_rows(rows):
+    """
+    Resolve a parsed chunk's customer ids in one query and insert the valid rows in one
+    transaction. Like record_metrics, this is a single executemany INSERT rather than
+    bulk_create (no model instance per row); the DailyUsageRollup deltas and churn
+    invalidation that UsageEvent.objects.bulk_create would do are applied here.
+    Returns (inserted, errors).
+    """
+    known = set(
+        Customer.objects.filter(id__in={row[1] for row in rows}).values_list("id", flat=True)
+    )
+    valid, errors = [], []
+    for line_no, customer_id, day, gb_used in rows:
+        if customer_id not in known:
+            errors.append((line_no, "unknown customer_id", f"{customer_id},{day},{gb_used}"))
+            continue
+        valid.append((customer_id, day, gb_used))
+    if not valid:
+        return 0, errors
+
+    # Inserting in (customer_id, date) order keeps usage_customer_date_idx writes local
+    valid.sort()
+    ops = connection.ops
+    table = ops.quote_name(UsageEvent._meta.db_table)
+    params = [(c, ops.adapt_datefield_value(d), gb) for c, d, gb in valid]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(f"INSERT INTO {table} (customer_id, date, gb_used) VALUES (%s, %s, %s)", params)
+        apply_usage_deltas((c, d, gb, 1) for c, d, gb in valid)
+    mark_churn_stale(known)
+    return len(valid), errors
+
+
+def import_usage(lines, fmt="csv", chunk_size=IMPORT_CHUNK_SIZE, workers=1, progress=None, error_writer=None):
+    """
+    Import usage events from an iterable of text lines (CSV with a customer_id,date,gb_used
+    header, or NDJSON objects with those keys). Parses as a stream, one transaction per chunk;
+    invalid rows are skipped and reported (see ImportResult). progress(result) is called
+    after every chunk.
+    """
+    if workers > 1:
+        # Forked parsers must not inherit open database connections
+        connections.close_all()
+    result = ImportResult(error_writer)
+    for rows, errors in _parsed_chunks(lines, fmt, chunk_size, workers):
+        if rows:
+            inserted, unknown = insert_rows(rows)
+            result.inserted += inserted
+            errors += unknown
+        result.reject(errors)
+        if progress:
+            progress(result)
+    return result
@@ -0,0 +1,180 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+
+from .billing import estimate_bill
+from .models import Customer, DailyUsageRollup, UsageEvent
+
+REBUILD_CHUNK_SIZE = 10_000  # customers per rebuild/check chunk
+FLOAT_TOLERANCE = 1e-6
+
+
+def apply_usage_deltas(deltas):
+    """
+    Add (customer_id, date, gb_delta, count_delta) to DailyUsageRollup.
+    Deltas are merged per (customer, date) and applied with one executemany upsert
+    whose arithmetic runs in the database, so concurrent writers never lose updates.
+    Keys are applied in index order, which keeps large batches cheap.
+    """
+    merged = defaultdict(lambda: [0.0, 0])
+    for customer_id, day, gb, count in deltas:
+        entry = merged[(customer_id, day)]
+        entry[0] += gb
+        entry[1] += count
+    if not merged:
+        return 0
+
+    ops = connection.ops
+    table = ops.quote_name(DailyUsageRollup._meta.db_table)
+    params = [
+        (customer_id, ops.adapt_datefield_value(day), gb, count)
+        for (customer_id, day), (gb, count) in sorted(merged.items())
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table} (customer_id, date, total_gb, event_count) VALUES (%s, %s, %s, %s) "
+            f"ON CONFLICT (customer_id, date) DO UPDATE SET "
+            f"total_gb = {table}.total_gb + excluded.total_gb, "
+            f"event_count = {table}.event_count + excluded.event_count",
+            params,
+        )
+    return len(params)
+
+
+def _raw_totals(lo, hi):
+    """{(customer_id, date): (total_gb, event_count)} from UsageEvent for a customer id range"""
+    rows = (
+        UsageEvent.objects.filter(customer_id__gte=lo, customer_id__lte=hi)
+        .values("customer_id", "date")
+        .annotate(total=Sum("gb_used"), n=Count("id"))
+        .order_by()
+    )
+    return {(r["customer_id"], r["date"]): (r["total"], r["n"]) for r in rows}
+
+
+def _rollup_totals(lo, hi):
+    rows = DailyUsageRollup.objects.filter(customer_id__gte=lo, customer_id__lte=hi).values_list(
+        "customer_id", "date", "total_gb", "event_count"
+    )
+    return {(c, d): (gb, n) for c, d, gb, n in rows}
+
+
+def _customer_ranges(chunk_size):
+    """Consecutive (lo, hi) customer id ranges of at most chunk_size customers"""
+    ids = Customer.objects.order_by("id").values_list("id", flat=True)
+    chunk = []
+    for customer_id in ids.iterator(chunk_size=chunk_size):
+        chunk.append(customer_id)
+        if len(chunk) == chunk_size:
+            yield chunk[0], chunk[-1]
+            chunk = []
+    if chunk:
+        yield chunk[0], chunk[-1]
+
+
+def rebuild_usage_rollup(chunk_size=REBUILD_CHUNK_SIZE):
+    """
+    Recompute DailyUsageRollup from UsageEvent, one customer id range per transaction.
+    The chunk is locked before usage is read, so no delta lands between the read and
+    the write: the customers FOR UPDATE where supported (usage inserts take a key-share
+    lock on their customer), and on SQLite the DELETE takes the write lock first.
+    Yields the number of rollup rows written per chunk.
+    """
+    for lo, hi in _customer_ranges(chunk_size):
+        with transaction.atomic():
+            if connection.features.has_select_for_update:
+                list(Customer.objects.select_for_update().filter(id__gte=lo, id__lte=hi).values_list("id"))
+            DailyUsageRollup.objects.filter(customer_id__gte=lo, customer_id__lte=hi).delete()
+            totals = _raw_totals(lo, hi)
+            DailyUsageRollup.objects.bulk_create(
+                [
+                    DailyUsageRollup(customer_id=c, date=d, total_gb=gb, event_count=n)
+                    for (c, d), (gb, n) in totals.items()
+                ],
+                batch_size=1000,
+            )
+        yield len(totals)
+
+
+def resync_usage_keys(keys):
+    """Overwrite the rollup rows for the given (customer_id, date) keys with recomputed totals"""
+    keys = set(keys)
+    if not keys:
+        return 0
+    customer_ids = {c for c, _ in keys}
+    days = {d for _, d in keys}
+    rows = (
+        UsageEvent.objects.filter(customer_id__in=customer_ids, date__in=days)
+        .values("customer_id", "date")
+        .annotate(total=Sum("gb_used"), n=Count("id"))
+        .order_by()
+    )
+    totals = {(r["customer_id"], r["date"]): (r["total"], r["n"]) for r in rows}
+    rollups = []
+    for customer_id, day in keys:
+        gb, n = totals.get((customer_id, day), (0.0, 0))
+        rollups.append(DailyUsageRollup(customer_id=customer_id, date=day, total_gb=gb, event_count=n))
+    DailyUsageRollup.objects.bulk_create(
+        rollups,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["customer", "date"],
+        update_fields=["total_gb", "event_count"],
+    )
+    return len(keys)
+
+
+def check_usage_rollup(chunk_size=REBUILD_CHUNK_SIZE):
+    """
+    Compare DailyUsageRollup with totals recomputed from UsageEvent.
+    Yields (customer_id, date, expected, actual) per mismatch; either side is None when missing.
+    """
+    for lo, hi in _customer_ranges(chunk_size):
+        expected, actual = _raw_totals(lo, hi), _rollup_totals(lo, hi)
+        for key in expected.keys() | actual.keys():
+            want, got = expected.get(key), actual.get(key)
+            if got is not None and got[1] == 0 and abs(got[0]) < FLOAT_TOLERANCE:
+                got = None  # every event of that day was deleted
+            if want is None or got is None:
+                if want != got:
+                    yield (*key, want, got)
+            elif want[1] != got[1] or abs(want[0] - got[0]) > FLOAT_TOLERANCE:
+                yield (*key, want, got)
+
+
+def usage_summary(subscriptions, start, end):
+    """
+    Daily series, totals and bill estimate per customer for a Subscription queryset,
+    in two queries however many customers it covers: subscriptions with customer and
+    plan joined, then one rollup read over the date range.
+    A customer with several subscriptions is summarized against the latest one.
+    """
+    latest = {}
+    for sub in subscriptions.select_related("customer", "plan").order_by("customer_id", "-id"):
+        latest.setdefault(sub.customer_id, sub)
+
+    daily = defaultdict(dict)
+    rows = DailyUsageRollup.objects.filter(
+        customer_id__in=list(latest), date__range=(start, end)
+    ).values_list("customer_id", "date", "total_gb")
+    for customer_id, day, gb in rows:
+        daily[customer_id][day] = gb
+
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    summaries = []
+    for customer_id, sub in latest.items():
+        series = daily.get(customer_id, {})
+        usage = [{"date": day.isoformat(), "gb_used": float(series.get(day, 0))} for day in days]
+        total_gb = sum(point["gb_used"] for point in usage)
+        summaries.append({
+            "customer_id": customer_id,
+            "customer": sub.customer.name,
+            "plan": sub.plan.name,
+            "monthly_price": sub.plan.monthly_price,
+            "usage": usage,
+            "total_gb": round(total_gb, 3),
+            "bill": estimate_bill(sub.plan.monthly_price, total_gb),
+        })
+    return summaries
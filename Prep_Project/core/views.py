@@ -1,64 +1,308 @@
+import gzip
+import io
 import json
-from django.http import JsonResponse
+import logging
+import time
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework import viewsets
 from rest_framework.decorators import api_view, permission_classes, authentication_classes, action
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from django.shortcuts import render, get_object_or_404
-from django.db.models import Count, Sum
+from django.shortcuts import render
+from django.db import connection
 from django.views.decorators.csrf import csrf_exempt
 from datetime import date, timedelta
 from rest_framework.authentication import BasicAuthentication
-import datetime
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
 from .models import (
     Site, Device, InventoryItem, Plan, Customer,
-    Subscription, UsageEvent, Alert, Bill
+    Subscription, UsageEvent, Alert, Bill, ChurnScore, DailyUsageRollup
 )
 from .serializers import (
     SiteSerializer, DeviceSerializer, InventoryItemSerializer, PlanSerializer,
     CustomerSerializer, SubscriptionSerializer, UsageEventSerializer, AlertSerializer,
     BillSerializer
 )
-from .churn import churn_score
+from .churn import churn_action, churn_payload, feature_frame, score_frame, store_scores
+from .buffering import buffer_stats, buffering_enabled, get_buffer
+from .churn_cache import cache_stats, get_churn, is_current, set_churn
+from .dashboard import dashboard_context
+from .billing import MAX_SETTLE_IDS, estimate_bill, settle_bills
+from .usage_rollup import usage_summary
+from .usage_import import FORMATS as IMPORT_FORMATS, import_usage
+from .exports import EXPORTS, FORMATS, export_chunks, gzip_chunks
+from .telemetry import ingest_telemetry, MAX_TELEMETRY_RECORDS
+from .metrics import metric_series
+
+logger = logging.getLogger(__name__)
+
+MAX_CHURN_BATCH = 10_000
+MAX_SUMMARY_CUSTOMERS = 10_000
+MAX_SUMMARY_DAYS = 92
+
+
+def _buffered(name, item, data):
+    """Queue a validated write for the write-behind flusher: 202, or 503 when the buffer is full"""
+    if not get_buffer(name).submit(item):
+        return Response({"error": "Ingestion buffer full, retry shortly"}, status=503, headers={"Retry-After": "1"})
+    return Response(data, status=202)
+
+
+def _is_id(value, model):
+    """A JSON value usable as a `model` primary key: an int (not a bool) within the column's range"""
+    if not isinstance(value, int) or isinstance(value, bool):
+        return False
+    low, high = connection.ops.integer_field_range(model._meta.pk.get_internal_type())
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+def _query_datetime(params, name):
+    """
+    ISO-8601 query parameter as an aware datetime (naive values are read in the current
+    timezone), or None when absent. Raises ValueError when it isn't a valid datetime.
+    """
+    raw = params.get(name)
+    if not raw:
+        return None
+    value = parse_datetime(raw)
+    if value is None:
+        raise ValueError(f"{name} is not an ISO-8601 datetime")
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def _int_list(values):
+    """values as a list of ints (digit strings accepted), or None if it isn't one; bools are refused"""
+    if not isinstance(values, list) or any(isinstance(v, bool) for v in values):
+        return None
+    try:
+        return [int(v) for v in values]
+    except (TypeError, ValueError):
+        return None
 
 
 # ----- API ViewSets -----
 class SiteViewSet(viewsets.ModelViewSet):
     queryset = Site.objects.all()
     serializer_class = SiteSerializer
+    cursor_ordering = ("id",)
 
 
 @method_decorator(csrf_exempt, name='dispatch')
 class DeviceViewSet(viewsets.ModelViewSet):
     queryset = Device.objects.all()
     serializer_class = DeviceSerializer
+    cursor_ordering = ("id",)
+    filter_allowlist = {
+        "site": "site",
+        "status": "status",
+        "type": "type",
+        "heartbeat_after": "last_heartbeat__gte",
+        "heartbeat_before": "last_heartbeat__lt",
+        "eol_before": "eol_date__lte",
+    }
+    ordering_allowlist = {
+        "id": ("id",),
+        "-id": ("-id",),
+        "identifier": ("identifier",),
+        # last_heartbeat is nullable, so it can't be a keyset; filter on it instead
+    }
+
+    # With BUFFERED_INGESTION, single-device PUT/PATCH is validated here and written
+    # behind by core.buffering (202 Accepted)
+    def update(self, request, *args, **kwargs):
+        if not buffering_enabled():
+            return super().update(request, *args, **kwargs)
+        instance = self.get_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=kwargs.pop("partial", False))
+        serializer.is_valid(raise_exception=True)
+        return _buffered("devices", (instance.pk, dict(serializer.validated_data)), {"id": instance.pk, "status": "queued"})
+
+    # Batch heartbeats + temperatures: one identifier lookup and a bulk_update per request
+    @action(detail=False, methods=['post'], url_path='telemetry')
+    def telemetry(self, request):
+        records = request.data.get("records") if isinstance(request.data, dict) else request.data
+        if not isinstance(records, list):
+            return Response({"error": "Expected a list of {identifier, ts, temp_c} records"}, status=400)
+        if len(records) > MAX_TELEMETRY_RECORDS:
+            return Response({"error": f"At most {MAX_TELEMETRY_RECORDS} records per request"}, status=413)
+
+        results = ingest_telemetry(records)
+        return Response({
+            "accepted": sum(1 for r in results if r["status"] == "ok"),
+            "results": results,
+        })
+
+    # Temperature history: ?start=&end= (ISO-8601, default last 24h) &step= (seconds, default 300)
+    @action(detail=True, methods=['get'], url_path='metrics')
+    def metrics(self, request, pk=None):
+        device = self.get_object()
+        try:
+            end = _query_datetime(request.query_params, "end") or timezone.now()
+            start = _query_datetime(request.query_params, "start") or end - timedelta(days=1)
+        except (ValueError, OverflowError):
+            return Response({"error": "start/end must be ISO-8601 datetimes"}, status=400)
+        if start >= end:
+            return Response({"error": "start must be before end"}, status=400)
+        try:
+            step = int(request.query_params.get("step", 300))
+        except ValueError:
+            step = 0
+        if step <= 0:
+            return Response({"error": "step must be a positive integer number of seconds"}, status=400)
+
+        resolution, points = metric_series(device.id, start, end, step)
+        return Response({
+            "device": device.identifier,
+            "resolution": resolution,
+            "points": points,
+        })
 
 class InventoryItemViewSet(viewsets.ModelViewSet):
     queryset = InventoryItem.objects.all()
     serializer_class = InventoryItemSerializer
+    cursor_ordering = ("id",)
 
 class PlanViewSet(viewsets.ModelViewSet):
     queryset = Plan.objects.all()
     serializer_class = PlanSerializer
+    cursor_ordering = ("id",)
 
 class CustomerViewSet(viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
+    cursor_ordering = ("id",)
 
 class SubscriptionViewSet(viewsets.ModelViewSet):
-    queryset = Subscription.objects.all()
+    queryset = Subscription.objects.select_related("plan")   # nested PlanSerializer
     serializer_class = SubscriptionSerializer
+    cursor_ordering = ("id",)
 
+@method_decorator(csrf_exempt, name='dispatch')
 class UsageEventViewSet(viewsets.ModelViewSet):
     queryset = UsageEvent.objects.all()
     serializer_class = UsageEventSerializer
+    cursor_ordering = ("date", "id")     # usage_date_id_idx
+    filter_allowlist = {
+        "customer": "customer",
+        "date": "date",
+        "date_after": "date__gte",
+        "date_before": "date__lte",
+    }
+    ordering_allowlist = {
+        "date": ("date", "id"),
+        "-date": ("-date", "-id"),
+    }
+
+    def create(self, request, *args, **kwargs):
+        if not buffering_enabled():
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return _buffered("usage", dict(serializer.validated_data), {"status": "queued"})
+
+    # Usage for many customers at once: customer_ids and/or city/plan filters, start/end dates
+    # (default last 7 days). GET takes query params (customer_ids comma separated), POST a JSON body.
+    @action(detail=False, methods=['get', 'post'], url_path='summary')
+    def summary(self, request):
+        params = request.data if request.method == "POST" else request.query_params
+        if not isinstance(params, dict):
+            return Response({"error": "Expected a JSON object"}, status=400)
+        raw_end, raw_start = params.get("end") or "", params.get("start") or ""
+        if not isinstance(raw_end, str) or not isinstance(raw_start, str):
+            return Response({"error": "start/end must be YYYY-MM-DD dates"}, status=400)
+        today = timezone.localdate()
+        try:
+            end = parse_date(raw_end) or today
+            start = parse_date(raw_start) or end - timedelta(days=6)
+        except ValueError:
+            return Response({"error": "start/end must be YYYY-MM-DD dates"}, status=400)
+        if start > end or (end - start).days >= MAX_SUMMARY_DAYS:
+            return Response({"error": f"Date range must be 1-{MAX_SUMMARY_DAYS} days"}, status=400)
+
+        ids = params.get("customer_ids")
+        if isinstance(ids, str):
+            ids = [i for i in ids.split(",") if i]
+        if ids is not None:
+            ids = _int_list(ids)
+            if ids is None or not all(_is_id(i, Customer) for i in ids):
+                return Response({"error": "customer_ids must be a list of integers"}, status=400)
+
+        subscriptions = Subscription.objects.all()
+        if ids is not None:
+            subscriptions = subscriptions.filter(customer_id__in=ids)
+        if params.get("city"):
+            subscriptions = subscriptions.filter(customer__city=params["city"])
+        if params.get("plan"):
+            plan = str(params["plan"])
+            if not plan.isdigit():
+                subscriptions = subscriptions.filter(plan__name=plan)
+            elif _is_id(int(plan), Plan):
+                subscriptions = subscriptions.filter(plan_id=int(plan))
+            else:
+                return Response({"error": "plan must be a plan id or name"}, status=400)
+        if ids is None and not (params.get("city") or params.get("plan")):
+            return Response({"error": "Pass customer_ids or a city/plan filter"}, status=400)
+        if ids is not None and len(ids) > MAX_SUMMARY_CUSTOMERS:
+            return Response({"error": f"At most {MAX_SUMMARY_CUSTOMERS} customer_ids per request"}, status=413)
+
+        if ids is None and subscriptions.values("customer_id").distinct()[:MAX_SUMMARY_CUSTOMERS + 1].count() > MAX_SUMMARY_CUSTOMERS:
+            return Response({"error": f"Filter matches more than {MAX_SUMMARY_CUSTOMERS} customers"}, status=413)
+
+        summaries = usage_summary(subscriptions, start, end)
+        found = {s["customer_id"] for s in summaries}
+        return Response({
+            "start": start,
+            "end": end,
+            "customers": summaries,
+            "missing": [i for i in ids if i not in found] if ids is not None else [],
+        })
+
+    # Bulk import: multipart upload with a `file` (CSV with a customer_id,date,gb_used header,
+    # or NDJSON; .gz is decompressed). Format comes from the `format` field or the file name.
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"error": "Upload the rows as a multipart 'file'"}, status=400)
+        name = upload.name or ""
+        fmt = request.data.get("format") or ("ndjson" if ".ndjson" in name or ".jsonl" in name else "csv")
+        if fmt not in IMPORT_FORMATS:
+            return Response({"error": f"format must be one of: {', '.join(IMPORT_FORMATS)}"}, status=400)
+
+        raw = gzip.GzipFile(fileobj=upload) if name.endswith(".gz") else upload
+        lines = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+        try:
+            result = import_usage(lines, fmt)
+        except (ValueError, OSError) as e:
+            return Response({"error": str(e)}, status=400)
+        return Response({
+            "inserted": result.inserted,
+            "rejected": result.rejected,
+            "errors": [{"line": n, "error": reason, "raw": raw_line} for n, reason, raw_line in result.errors[:100]],
+            "rows_per_sec": round(result.rows_per_sec),
+        })
 
 class AlertViewSet(viewsets.ModelViewSet):
     queryset = Alert.objects.all().order_by('-created_at')
     serializer_class = AlertSerializer
+    cursor_ordering = ("-created_at", "id")   # alert_created_id_idx
+    filter_allowlist = {
+        "status": "status",
+        "severity": "severity",
+        "type": "type",
+        "device": "device",
+        "customer": "customer",
+        "created_after": "created_at__gte",
+        "created_before": "created_at__lt",
+    }
+    ordering_allowlist = {
+        "-created_at": ("-created_at", "id"),
+        "created_at": ("created_at", "-id"),
+    }
 
 
 from rest_framework.permissions import AllowAny
@@ -66,12 +310,24 @@ from rest_framework.permissions import AllowAny
 class BillViewSet(viewsets.ModelViewSet):
     queryset = Bill.objects.all().order_by('-month')
     serializer_class = BillSerializer
+    cursor_ordering = ("-month", "id")   # bill_month_id_idx
+    filter_allowlist = {
+        "customer": "customer",
+        "status": "status",
+        "month": "month",
+        "month_after": "month__gte",
+        "month_before": "month__lte",
+    }
+    ordering_allowlist = {
+        "-month": ("-month", "id"),
+        "month": ("month", "-id"),
+    }
 
     def list(self, request, customer_id=None):
         if customer_id:
-            bills = Bill.objects.filter(customer_id=customer_id).order_by('-month')
+            bills = self.paginate_queryset(self.filter_queryset(Bill.objects.filter(customer_id=customer_id)))
             serializer = self.get_serializer(bills, many=True)
-            return Response(serializer.data)
+            return self.get_paginated_response(serializer.data)
         return super().list(request)
 
     # ⬇️ CSRF-free pay action (no SessionAuthentication)
@@ -83,64 +339,48 @@ class BillViewSet(viewsets.ModelViewSet):
         url_path='pay'
     )
     def pay(self, request, pk=None):
-        bill = self.get_object()
-        bill.status = "paid"
-        bill.save()
-        return Response({"message": f"Bill {bill.id} marked as paid"})
+        try:
+            bill_id = int(pk)
+        except ValueError:
+            bill_id = None
+        if not _is_id(bill_id, Bill):
+            return Response({"error": "Bill not found"}, status=404)
+        result = settle_bills([bill_id])
+        if result["not_found"]:
+            return Response({"error": "Bill not found"}, status=404)
+        if result["already_paid"]:
+            return Response({"message": f"Bill {bill_id} was already paid"})
+        return Response({"message": f"Bill {bill_id} marked as paid"})
+
+    # Gateway callbacks / settlement files: {"bill_ids": [...]} paid in one conditional UPDATE.
+    # Replays are safe: ids paid earlier come back under already_paid.
+    @action(
+        detail=False,
+        methods=['post'],
+        authentication_classes=[],
+        permission_classes=[AllowAny],
+        url_path='settle'
+    )
+    def settle(self, request):
+        ids = request.data.get("bill_ids") if isinstance(request.data, dict) else request.data
+        if not isinstance(ids, list) or not ids:
+            return Response({"error": "Expected a non-empty list of bill_ids"}, status=400)
+        if len(ids) > MAX_SETTLE_IDS:
+            return Response({"error": f"At most {MAX_SETTLE_IDS} bill_ids per request"}, status=413)
+        if not all(_is_id(i, Bill) for i in ids):
+            return Response({"error": "bill_ids must be integers"}, status=400)
+        return Response(settle_bills(ids))
 
 
 
 
 # ----- Pages -----
 def dashboard(request):
-    customers = Customer.objects.count()
-    devices = Device.objects.count()
-    alerts_open = Alert.objects.filter(status="open").count()
-    plans = Plan.objects.count()
-
-    alert_counts = Alert.objects.filter(status="open").values("severity").annotate(count=Count("id"))
-    severity_map = {"info": 0, "warning": 0, "critical": 0}
-    for row in alert_counts:
-        severity_map[row["severity"]] = row["count"]
-
-    plan_counts = Subscription.objects.values("plan__name").annotate(count=Count("id"))
-    plan_labels = [p["plan__name"] for p in plan_counts]
-    plan_values = [p["count"] for p in plan_counts]
-
-    today = datetime.date.today()
-    usage_labels, usage_values = [], []
-    for i in range(6, -1, -1):
-        day = today - datetime.timedelta(days=i)
-        usage_labels.append(day.strftime("%b %d"))
-        total_gb = UsageEvent.objects.filter(date=day).aggregate(Sum("gb_used"))["gb_used__sum"] or 0
-        usage_values.append(round(total_gb, 2))
-
-    recent_alerts = Alert.objects.filter(status="open").order_by("-created_at")[:10]
-
-    inventory = InventoryItem.objects.all()
-    inventory_labels = [item.name for item in inventory]
-    inventory_stock = [item.stock_on_hand for item in inventory]
-    inventory_reorder = [item.reorder_point for item in inventory]
-
-    devices_list = Device.objects.select_related("site").all()
-
-    context = {
-        "customers": customers,
-        "devices": devices,
-        "alerts_open": alerts_open,
-        "plans": plans,
-        "alert_data": list(severity_map.values()),
-        "plan_labels": plan_labels,
-        "plan_values": plan_values,
-        "usage_labels": usage_labels,
-        "usage_values": usage_values,
-        "recent_alerts": recent_alerts,
-        "inventory_labels": inventory_labels,
-        "inventory_stock": inventory_stock,
-        "inventory_reorder": inventory_reorder,
-        "devices_list": devices_list,
-    }
-    return render(request, "dashboard.html", context)
+    try:
+        page = int(request.GET.get("page", 1))
+    except ValueError:
+        page = 1
+    return render(request, "dashboard.html", dashboard_context(page))
 
 
 def portal_page(request):
@@ -197,31 +437,86 @@ def churn_api(request, id):
     if request.method != "GET":
         return JsonResponse({"error": "Only GET allowed"}, status=405)
 
-    customer = get_object_or_404(Customer, id=id)
+    payload, version = get_churn(id)
+    if payload is None:
+        payload = _build_churn_payload(id, version)
+        if payload is None:
+            return JsonResponse({"error": "Customer not found"}, status=404)
+        set_churn(id, payload, version)
+    return JsonResponse(payload)
+
+
+def _build_churn_payload(customer_id, version):
+    """churn_api response body, from ChurnScore or scored (and stored) live"""
+    # Precomputed by score_churn: a single indexed read, unless usage changed since
+    churn = ChurnScore.objects.select_related("customer").filter(customer_id=customer_id).first()
+    if churn is not None and is_current(churn.scored_at, version):
+        customer, score = churn.customer, churn.score
+    else:
+        read_at = timezone.now()
+        customer = Customer.objects.filter(id=customer_id).first()
+        if customer is None:
+            return None
+        frame = feature_frame(Customer.objects.filter(id=customer_id))
+        scores, _ = score_frame(frame)
+        frame["score"] = scores
+        store_scores(frame, read_at)
+        score = int(scores[0])
 
-    avg7, avg30 = 1.5, 5.0  # demo values
-    score = churn_score(customer, avg7, avg30)
+    return churn_payload(customer, score)
 
-    if score >= 70:
-        action = "Offer 20% discount coupon"
-    elif score >= 40:
-        action = "Send personalized SMS reminder"
-    else:
-        action = "Normal engagement"
 
-    return JsonResponse({
-        "customer": customer.name,
-        "city": customer.city,
-        "score": score,
-        "action": action
+@api_view(['GET'])
+def churn_cache_stats(request):
+    """Churn cache hit/miss counters"""
+    return Response(cache_stats())
+
+
+@api_view(['GET'])
+def ingest_buffer_stats(request):
+    """Write-behind buffer queue depths and flush latencies"""
+    return Response({"enabled": buffering_enabled(), "buffers": buffer_stats()})
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@authentication_classes([])   # no CSRF check
+def churn_scores_batch(request):
+    """Score many customers in one vectorized call: {"customer_ids": [...]}"""
+    ids = request.data.get("customer_ids") if isinstance(request.data, dict) else None
+    if not isinstance(ids, list) or not all(_is_id(i, Customer) for i in ids):
+        return Response({"error": "customer_ids must be a list of integers"}, status=400)
+    if len(ids) > MAX_CHURN_BATCH:
+        return Response({"error": f"At most {MAX_CHURN_BATCH} customer_ids per request"}, status=413)
+
+    started = time.perf_counter()
+    frame = feature_frame(Customer.objects.filter(id__in=ids))
+    features_done = time.perf_counter()
+    scores, source = score_frame(frame)
+    inference_ms = (time.perf_counter() - features_done) * 1000
+    total_ms = (time.perf_counter() - started) * 1000
+    logger.info("churn batch: %d customers, %s, inference %.1f ms, total %.1f ms", len(frame), source, inference_ms, total_ms)
+
+    found = set(frame["id"].tolist())
+    response = Response({
+        "source": source,
+        "scores": [
+            {"customer_id": cid, "score": score, "action": churn_action(score)}
+            for cid, score in zip(frame["id"].tolist(), scores.tolist())
+        ],
+        "missing": [i for i in ids if i not in found],
+        "inference_ms": round(inference_ms, 2),
     })
+    response["Server-Timing"] = f"features;dur={total_ms - inference_ms:.2f}, inference;dur={inference_ms:.2f}"
+    return response
+
 
 @api_view(['GET', 'POST'])
 @permission_classes([AllowAny])
 @authentication_classes([BasicAuthentication])   # ✅ no CSRF check
 def my_plan(request, customer_id):
     try:
-        sub = Subscription.objects.get(customer_id=customer_id)
+        sub = Subscription.objects.select_related("customer", "plan").get(customer_id=customer_id)
     except Subscription.DoesNotExist:
         return Response({"error": "Customer has no active subscription"}, status=404)
 
@@ -258,24 +553,25 @@ def my_plan(request, customer_id):
 def customer_usage(request, id):
     """Fetch usage + simple bill estimate"""
     try:
-        customer = Customer.objects.get(id=id)
-        subscription = Subscription.objects.get(customer=customer)
-        plan = subscription.plan
+        # One joined read instead of customer → subscription → plan lookups
+        subscription = Subscription.objects.select_related("customer", "plan").get(customer_id=id)
+        customer, plan = subscription.customer, subscription.plan
 
         today = date.today()
+        start = today - timedelta(days=6)
+        daily = dict(
+            DailyUsageRollup.objects.filter(customer=customer, date__range=(start, today))
+            .values_list("date", "total_gb")
+        )
         usage_list = []
         total_gb = 0
-        for i in range(6, -1, -1):
-            day = today - timedelta(days=i)
-            gb = UsageEvent.objects.filter(customer=customer, date=day).aggregate(Sum("gb_used"))["gb_used__sum"] or 0
+        for i in range(7):
+            day = start + timedelta(days=i)
+            gb = daily.get(day, 0)
             usage_list.append({"date": day.strftime("%b %d"), "gb_used": float(gb)})
             total_gb += gb
 
-        included_gb = 100
-        overage_rate = 10
-        bill = plan.monthly_price
-        if total_gb > included_gb:
-            bill += (total_gb - included_gb) * overage_rate
+        bill = estimate_bill(plan.monthly_price, total_gb)
 
         return Response({
             "customer": customer.name,
@@ -283,12 +579,40 @@ def customer_usage(request, id):
             "monthly_price": plan.monthly_price,
             "usage": usage_list,
             "total_gb": total_gb,
-            "bill": round(bill, 2)
+            "bill": bill
         })
-    except (Customer.DoesNotExist, Subscription.DoesNotExist):
+    except Subscription.DoesNotExist:
         return Response({"error": "Customer or subscription not found"}, status=404)
 
 
+def export_data(request, kind):
+    """
+    Stream a full table export: ?format=ndjson|csv, ?start=/&end= (YYYY-MM-DD, inclusive),
+    ?gzip=1 for a .gz download. Memory stays flat whatever the row count.
+    """
+    if request.method != "GET":
+        return JsonResponse({"error": "Only GET allowed"}, status=405)
+    if kind not in EXPORTS:
+        return JsonResponse({"error": f"Unknown export; choose one of {', '.join(EXPORTS)}"}, status=404)
+    fmt = request.GET.get("format", "ndjson")
+    if fmt not in FORMATS:
+        return JsonResponse({"error": f"format must be one of {', '.join(FORMATS)}"}, status=400)
+    try:
+        start = parse_date(request.GET.get("start", ""))
+        end = parse_date(request.GET.get("end", ""))
+    except ValueError:
+        return JsonResponse({"error": "start/end must be YYYY-MM-DD dates"}, status=400)
+
+    chunks = export_chunks(kind, fmt, start, end)
+    filename = f"{kind}.{fmt}"
+    content_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    if request.GET.get("gzip") in ("1", "true"):
+        chunks, filename, content_type = gzip_chunks(chunks), filename + ".gz", "application/gzip"
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
 @api_view(['GET'])
 def customer_bills(request, customer_id):
     """Fetch bills for a customer"""